@@ -1,12 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from app.models.user import User
 from app.models.classification_result import ClassificationResult
-from app.database.session import get_db
-from sqlalchemy.orm import Session
+from app.database.session import AsyncSessionLocal, get_async_db
+from app.core.config import settings
+from app.services.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from app.services.result_stats import result_stats
+from app.services.result_writer import result_writer
+from app.services import user_search
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import admin_required
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel
+import csv
+import io
+import json
 import logging
+import time
 
 # Cấu hình logging
 logger = logging.getLogger(__name__)
@@ -28,37 +40,193 @@ class UserRoleUpdate(BaseModel):
 
 router = APIRouter()
 
+EXPORT_FIELDS = ["id", "result", "confidence", "image_url", "class_id", "bounding_box", "source", "created_at"]
+
+
+# Số user đổi ít: cache ngắn hạn thay vì COUNT(*) mỗi lần dashboard poll
+_user_count_cache = {"value": None, "expires": 0.0}
+
+
+async def _total_users(db: AsyncSession) -> int:
+    now = time.monotonic()
+    if _user_count_cache["value"] is None or now >= _user_count_cache["expires"]:
+        _user_count_cache["value"] = await db.scalar(select(func.count()).select_from(User))
+        _user_count_cache["expires"] = now + settings.STATS_USER_COUNT_TTL
+    return _user_count_cache["value"]
+
 
 @router.get("/stats")
 @router.post("/stats")
-def get_stats(db: Session = Depends(get_db)):
+async def get_stats(db: AsyncSession = Depends(get_async_db)):
+    """
+    Dashboard statistics: totals, per-class counts with confidence histograms
+    (10 bins of 10%) and hourly/daily series, read from counters maintained as
+    results are persisted (no table scan).
+    """
+    stats = result_stats.snapshot()
     try:
-        total_users = db.query(User).count()
-        total_classifications = db.query(ClassificationResult).count()
-        return {
-            "total_users": total_users,
-            "total_classifications": total_classifications
-        }
+        total_users = await _total_users(db)
+        if not result_writer.running:
+            # Không ghi kết quả (RESULT_PERSIST_ENABLED=False): bộ đếm không được cập nhật
+            stats["total_classifications"] = await db.scalar(
+                select(func.count()).select_from(ClassificationResult))
+        return {"total_users": total_users, **stats}
     except Exception as e:
         logger.error(f"Error fetching stats: {str(e)}")
-        # Trả về dữ liệu mẫu khi có lỗi
+        # Trả về dữ liệu đang có khi có lỗi
         return {
-            "total_users": total_users,
-            "total_classifications": 0,
+            "total_users": _user_count_cache["value"] or 0,
+            **stats,
             "error": str(e)
         }
 
 
+def result_to_dict(row: ClassificationResult) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "result": row.result,
+        "confidence": row.confidence,
+        "image_url": row.image_url,
+        "class_id": row.class_id,
+        "bounding_box": row.bounding_box,
+        "source": row.source,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # created_at lưu dạng UTC không có timezone
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class ResultFilters:
+    """
+    Filters shared by /data and /data/export (query parameters).
+    """
+
+    def __init__(
+            self,
+            classification: Optional[List[str]] = Query(None, description="Class name(s), repeatable"),
+            min_confidence: Optional[float] = Query(None, ge=0, le=100),
+            max_confidence: Optional[float] = Query(None, ge=0, le=100),
+            since: Optional[datetime] = Query(None, description="created_at >= since (UTC)"),
+            until: Optional[datetime] = Query(None, description="created_at < until (UTC)"),
+            source: Optional[str] = Query(None, description="image, batch or camera"),
+    ):
+        self.classification = classification
+        self.min_confidence = min_confidence
+        self.max_confidence = max_confidence
+        self.since = _naive_utc(since)
+        self.until = _naive_utc(until)
+        self.source = source
+
+    def apply(self, query):
+        if self.classification:
+            query = query.where(ClassificationResult.result.in_(self.classification))
+        if self.min_confidence is not None:
+            query = query.where(ClassificationResult.confidence >= self.min_confidence)
+        if self.max_confidence is not None:
+            query = query.where(ClassificationResult.confidence <= self.max_confidence)
+        if self.since is not None:
+            query = query.where(ClassificationResult.created_at >= self.since)
+        if self.until is not None:
+            query = query.where(ClassificationResult.created_at < self.until)
+        if self.source:
+            query = query.where(ClassificationResult.source == self.source)
+        return query
+
+
+def _page_query(filters: ResultFilters, before_id: Optional[int], limit: int):
+    # Keyset: mới nhất trước, trang sau bắt đầu sau id cuối của trang trước (không OFFSET)
+    query = filters.apply(select(ClassificationResult))
+    if before_id is not None:
+        query = query.where(ClassificationResult.id < before_id)
+    return query.order_by(ClassificationResult.id.desc()).limit(limit)
+
+
 @router.get("/data")
 @router.post("/data")
-def get_classification_data(db: Session = Depends(get_db)):
+async def get_classification_data(
+        response: Response,
+        limit: int = Query(None, ge=1, le=1000, description="Rows per page"),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+        filters: ResultFilters = Depends(),
+        db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Classification results, newest first, one page at a time.
+
+    The body is a list of rows; when more rows exist, the ``X-Next-Cursor``
+    response header holds the cursor for the next page.
+    """
+    limit = limit or settings.ADMIN_PAGE_SIZE
     try:
-        classification_data = db.query(ClassificationResult).all()
-        return classification_data
+        before_id = decode_cursor(cursor)[0] if cursor else None
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # Lấy thêm một dòng để biết còn trang sau hay không
+        rows = (await db.scalars(_page_query(filters, before_id, limit + 1))).all()
     except Exception as e:
         logger.error(f"Error fetching classification data: {str(e)}")
         # Trả về danh sách rỗng khi có lỗi
         return []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].id)
+    return [result_to_dict(row) for row in rows]
+
+
+@router.get("/data/export")
+async def export_classification_data(
+        format: Literal["csv", "ndjson"] = Query("csv"),
+        filters: ResultFilters = Depends(),
+):
+    """
+    Stream every matching row as CSV or NDJSON, newest first.
+
+    Rows are read page by page (keyset, ADMIN_EXPORT_CHUNK_SIZE rows per query), so
+    memory stays bounded whatever the table size.
+    """
+    chunk_size = settings.ADMIN_EXPORT_CHUNK_SIZE
+
+    async def rows():
+        # Session riêng: sống theo response đang stream, không theo request handler
+        async with AsyncSessionLocal() as db:
+            before_id = None
+            while True:
+                page = (await db.scalars(_page_query(filters, before_id, chunk_size))).all()
+                if not page:
+                    return
+                yield [result_to_dict(row) for row in page]
+                if len(page) < chunk_size:
+                    return
+                before_id = page[-1].id
+                db.expunge_all()
+
+    async def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        async for page in rows():
+            writer.writerows(page)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # chỉ có header (không có dòng nào)
+
+    async def ndjson_lines():
+        async for page in rows():
+            yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in page)
+
+    if format == "csv":
+        return StreamingResponse(csv_lines(), media_type="text/csv", headers={
+            "Content-Disposition": 'attachment; filename="classification_results.csv"',
+        })
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
 
 
 @router.get("/admin-dashboard")
@@ -68,10 +236,10 @@ def admin_dashboard(user: dict = Depends(admin_required)):
 
 
 @router.get("/users", response_model=List[UserResponse])
-def get_all_users(db: Session = Depends(get_db)):
+async def get_all_users(db: AsyncSession = Depends(get_async_db)):
     """Get all users in the system"""
     try:
-        users = db.query(User).all()
+        users = (await db.scalars(select(User))).all()
         return users
     except Exception as e:
         logger.error(f"Error fetching users: {str(e)}")
@@ -83,35 +251,23 @@ def get_all_users(db: Session = Depends(get_db)):
 
 
 @router.get("/users/search", response_model=List[UserResponse])
-def search_users(
+async def search_users(
+        response: Response,
         search_term: str = Query(None, description="Search term for username or email"),
-        db: Session = Depends(get_db)
+        limit: int = Query(None, ge=1, le=100, description="Users per page"),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    """Search for users by username or email"""
+    """
+    Search users by username or email, best matches first: exact username,
+    username prefix, email prefix, then substring. Paged like /data (list body,
+    ``X-Next-Cursor`` header).
+    """
+    limit = limit or settings.ADMIN_SEARCH_PAGE_SIZE
     try:
-        if not search_term:
-            all_users = db.query(User).all()
-            logger.info(f"Returning all users: {len(all_users)} found")
-            return all_users
-
-        # In ra thông tin tìm kiếm để debug
-        logger.info(f"Searching for users with term: '{search_term}'")
-
-        # Tìm kiếm theo username hoặc email
-        users = db.query(User).filter(
-            (User.username.ilike(f"%{search_term}%")) |
-            (User.email.ilike(f"%{search_term}%"))
-        ).all()
-
-        # In ra kết quả tìm kiếm
-        logger.info(f"Search results for '{search_term}': {len(users)} users found")
-        if users:
-            for user in users:
-                logger.info(f"Found user: ID={user.id}, Username={user.username}, Email={user.email}")
-        else:
-            logger.info(f"No users found for search term: '{search_term}'")
-
-        return users
+        users, next_cursor = await user_search.search_users(db, search_term, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error searching users: {str(e)}")
         # Trả về danh sách mẫu khi có lỗi
@@ -122,30 +278,30 @@ def search_users(
         ]
         # Lọc danh sách mẫu theo search_term
         if search_term:
-            filtered_users = [u for u in mock_users if search_term.lower() in u.username.lower() or
-                              (u.email and search_term.lower() in u.email.lower())]
-            logger.info(f"Using mock data. Search results for '{search_term}': {len(filtered_users)} users found")
-            return filtered_users
-        logger.info(f"Using mock data. Returning all mock users: {len(mock_users)}")
+            return [u for u in mock_users if search_term.lower() in u.username.lower() or
+                    (u.email and search_term.lower() in u.email.lower())]
         return mock_users
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
 
 
 @router.put("/users/{user_id}/role", response_model=UserResponse)
-def set_user_role(
+async def set_user_role(
         user_id: int,
         role_update: UserRoleUpdate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """Update a user's role"""
     try:
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Update the user's role
         user.role = role_update.role
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
         return user
     except HTTPException as e:
@@ -159,20 +315,20 @@ def set_user_role(
 
 
 @router.delete("/users/{user_id}", response_model=dict)
-def delete_user(
+async def delete_user(
         user_id: int,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a user from the system"""
     try:
         # Kiểm tra xem người dùng có tồn tại không
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Kiểm tra xem có phải là admin duy nhất không
         if user.role == "admin":
-            admin_count = db.query(User).filter(User.role == "admin").count()
+            admin_count = await db.scalar(select(func.count()).select_from(User).where(User.role == "admin"))
             if admin_count <= 1:
                 raise HTTPException(
                     status_code=400,
@@ -181,8 +337,9 @@ def delete_user(
 
         # Xóa người dùng
         username = user.username  # Lưu tên người dùng để log
-        db.delete(user)
-        db.commit()
+        await db.delete(user)
+        await db.commit()
+        _user_count_cache["value"] = None
 
         logger.info(f"User deleted: ID={user_id}, Username={username}")
 
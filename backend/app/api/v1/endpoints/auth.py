@@ -2,33 +2,52 @@ from fastapi import APIRouter, Depends, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 from app.schemas.auth import Token
-from app.core.security import verify_password, create_access_token
+from app.core.security import create_access_token
 from app.core.config import settings
 from app import schemas, models
-from sqlalchemy.orm import Session
-from app.database.session import get_db
-from app.core.security import hash_password
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.session import get_async_db
+from app.services.password_hasher import PasswordHasherBusyError, password_hasher
 
 
 router = APIRouter()
 
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry later",
+        headers={"Retry-After": "1"},
+    )
+
+
 
 @router.post("/login/user", response_model=Token)
-def login_user(
+async def login_user(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Truy vấn user từ database
-    user = db.query(models.user.User).filter(models.user.User.username == form_data.username).first()
-    
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(models.user.User).where(models.user.User.username == form_data.username))
+
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        except PasswordHasherBusyError:
+            raise _busy()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+    if new_hash:
+        # Hash cũ dùng work factor khác BCRYPT_ROUNDS: lưu hash mới
+        user.hashed_password = new_hash
+        await db.commit()
+
     role = user.role
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -39,44 +58,53 @@ def login_user(
 
 
 @router.post("/register", response_model=schemas.auth.UserOut)
-def register(user_data: schemas.auth.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: schemas.auth.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    if db.query(models.user.User).filter(models.user.User.email == user_data.email).first():
+    if await db.scalar(select(models.user.User).where(models.user.User.email == user_data.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
 
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusyError:
+        raise _busy()
     new_user = models.user.User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=hash_password(user_data.password)
+        hashed_password=hashed_password
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/update-profile")
-def update_profile(
+async def update_profile(
     form_data: OAuth2PasswordRequestForm = Depends(),  # username + old_password
     new_password: str = Form(None),                    # optional                    # optional
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Lấy user từ DB
-    user = db.query(models.user.User).filter(models.user.User.username == form_data.username).first()
+    user = await db.scalar(select(models.user.User).where(models.user.User.username == form_data.username))
 
     if not user:
         raise HTTPException(status_code=404, detail="Không tìm thấy người dùng")
 
-    # Kiểm tra mật khẩu cũ
-    if not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=400, detail="Mật khẩu hiện tại không đúng")
-
-    # Cập nhật mật khẩu mới nếu có
-    if new_password:
-        user.hashed_password = hash_password(new_password)
-
-
-    db.commit()
-    db.refresh(user)
+    try:
+        # Kiểm tra mật khẩu cũ
+        verified, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        if not verified:
+            raise HTTPException(status_code=400, detail="Mật khẩu hiện tại không đúng")
+
+        # Cập nhật mật khẩu mới nếu có (nếu không, lưu hash mới của mật khẩu cũ khi cần)
+        if new_password:
+            new_hash = await password_hasher.hash(new_password)
+    except PasswordHasherBusyError:
+        raise _busy()
+    if new_hash:
+        user.hashed_password = new_hash
+
+    await db.commit()
+    await db.refresh(user)
 
     return user
\ No newline at end of file
@@ -1,96 +1,645 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.classifier import Classifier
-from app.services.video_processor import VideoProcessor
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from app.services.video_processor import VideoProcessor, FramePrefetcher
+from app.services.inference import inference_service, ModelNotReadyError
+from app.services.inference_executor import InferenceBusyError
+from app.services.profiles import UnknownProfileError
+from app.services.result_writer import result_writer
+from app.services import image_batch, rendering, ws_protocol
+from app.services.detection import DetectOptions, resolve_classes
+from app.services.camera_stream import LatestFrameSlot, FpsAdvisor
+from app.services.tracking import MotionGatedSession
+from app.core.config import settings
+from app.core.metrics import CAMERA_FRAMES, WEBSOCKET_CONNECTIONS, stage_timer
+import asyncio
+import json
+import logging
+import os
+from typing import List, Literal, Optional
+from urllib.parse import quote
 import tempfile
+import zipfile
 from PIL import Image
 import time
 import io
 from app.services import utils
-from datetime import datetime
-from fastapi import APIRouter, WebSocket
-import cv2
-import base64
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-import io
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
 import base64
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
-classifier = Classifier()
 video_processor = VideoProcessor(frame_skip=0)  # Set frame_skip to 1 to capture every frame for 60fps
 
 
+async def run_inference(image, profile: Optional[str] = None):
+    """
+    Classify one image/frame through the shared inference service.
+    """
+    return await inference_service.predict(image, profile)
+
+
+PROFILE_QUERY = Query(None, description="Inference profile (input size / precision / conf), see /classify/profiles")
+
+
+class DetectionQuery:
+    """
+    Per-request detection parameters (query parameters) shared by /analyze_image and /analyze_batch.
+    """
+
+    def __init__(
+            self,
+            detections: Optional[Literal["arrays", "objects"]] = Query(
+                None, description="Also return every box: arrays (parallel lists, compact) or objects (one per box)"),
+            conf: Optional[float] = Query(None, ge=0, le=1, description="Confidence threshold (default: profile)"),
+            iou: Optional[float] = Query(None, gt=0, le=1, description="NMS IoU threshold"),
+            max_det: Optional[int] = Query(None, ge=1, le=1000, description="Maximum boxes per image"),
+            classes: Optional[List[str]] = Query(None, description="Only these classes (names or ids), repeatable"),
+    ):
+        self.detections = detections
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.classes = classes
+
+    def options(self) -> Optional[DetectOptions]:
+        """
+        DetectOptions for this request, None when it uses the defaults (micro-batched path).
+        Raises HTTPException 400 for unknown classes.
+        """
+        if (self.detections, self.conf, self.iou, self.max_det, self.classes) == (None,) * 5:
+            return None
+        try:
+            classes = resolve_classes(self.classes, inference_service.class_names)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return DetectOptions(self.conf, self.iou, self.max_det, classes, self.detections)
+
+
+@router.get("/profiles")
+def list_profiles():
+    # Các profile inference mà deployment này phục vụ (profile đầu tiên là mặc định)
+    classifier = inference_service.classifier
+    profiles = getattr(classifier, "profiles", None) or {}
+    return {
+        "default": inference_service.default_profile if profiles else settings.INFERENCE_PROFILE,
+        "profiles": [profile.to_dict() for profile in profiles.values()],
+    }
+
+
 @router.post("/analyze_image")
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(
+        file: UploadFile = File(...),
+        profile: Optional[str] = PROFILE_QUERY,
+        mode: Optional[Literal["image", "json", "jpeg", "thumbnail"]] = Query(
+            None, description="image (JSON + annotated full-size base64 JPEG), json (result only), "
+                              "jpeg (annotated JPEG body, result in X-* headers), thumbnail (JSON + small image)"),
+        max_size: Optional[int] = Query(None, ge=32, le=4096, description="Longest side of the thumbnail"),
+        quality: Optional[int] = Query(None, ge=1, le=95, description="JPEG quality of the returned image"),
+        detection: DetectionQuery = Depends(),
+        tiled: Optional[bool] = Query(
+            None, description="Run the model on overlapping tiles (high-resolution images); "
+                              "default: when the longer side >= TILE_AUTO_MIN_SIDE"),
+        tile_size: Optional[int] = Query(None, ge=128, le=4096, description="Tile side in image pixels"),
+        tile_overlap: Optional[float] = Query(None, ge=0, le=0.9, description="Overlap between tiles (fraction)"),
+):
+    """
+    Classify one image. ``bounding_box`` is always in original image
+    coordinates; ``image_size`` ([width, height]) lets clients scale it onto
+    whatever they display. With ``?detections=`` every box is returned under
+    ``detections`` (and drawn on the returned image), not only the best one.
+    With ``?tiled=true`` small objects in large photos are detected at full
+    resolution, tile by tile (``tiles`` = number of tiles run).
+    """
+    mode = mode or settings.ANALYZE_IMAGE_DEFAULT_MODE
     contents = await file.read()
-    img = Image.open(io.BytesIO(contents)).convert("RGB")
 
-    # Dự đoán
-    result = classifier.predict_image(contents)
+    # Giải mã ảnh đúng một lần (OpenCV, ngoài event loop); cùng một ndarray dùng
+    # cho cả inference lẫn vẽ bbox. Nếu OpenCV không đọc được thì dùng PIL như cũ.
+    with stage_timer("analyze_image", "decode"):
+        frame = await asyncio.to_thread(utils.decode_image, contents) if settings.FAST_PREPROCESS else None
+        if frame is not None:
+            image_size = [frame.shape[1], frame.shape[0]]
+        else:
+            try:
+                img = Image.open(io.BytesIO(contents))
+            except (OSError, ValueError):
+                raise HTTPException(status_code=400, detail="Cannot decode image")
+            image_size = list(img.size)
+    if tiled is None:
+        tiled = 0 < settings.TILE_AUTO_MIN_SIDE <= max(image_size)
+
+    # Dự đoán (ảnh đã gửi trước đó được trả từ cache, không chạy lại model)
+    try:
+        with stage_timer("analyze_image", "inference"):
+            # Chưa load xong model thì predict_image trả 503, chưa cần tra tên class
+            options = detection.options() if inference_service.ready else None
+            if tiled:
+                result = await inference_service.predict_tiled(
+                    frame if frame is not None else img, profile, options, tile_size, tile_overlap)
+            else:
+                result = await inference_service.predict_image(contents, frame, profile, options)
+    except UnknownProfileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is still loading, please retry later",
+            headers={"Retry-After": "5"},
+        )
+    except InferenceBusyError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": "1"},
+        )
+
+    result_writer.record(result, "image", file.filename)
 
-    # Vẽ bbox + label lên ảnh
-    draw = ImageDraw.Draw(img)
     bbox = result.get('bounding_box', [])
-    if len(bbox) == 4:
-        x1, y1, x2, y2 = bbox
-        # Vẽ rectangle
-        draw.rectangle([x1, y1, x2, y2], outline='lime', width=3)
+    info = {
+        "classification": result["classification"],
+        "confidence": result["confidence"],
+        "bounding_box": bbox,
+        "image_size": image_size,
+    }
+    if "detections" in result:
+        info["detections"] = result["detections"]
+    if "tiles" in result:
+        info["tiles"] = result["tiles"]
+    if mode == "json":
+        # Chỉ kết quả: không vẽ, không mã hoá ảnh
+        return {"type": "info", "status": "success", "data": info}
 
-        # Chuẩn bị label
-        label = f"{result['classification']} ({result['confidence'] * 100:.1f}%)"
+    # Thumbnail: thu nhỏ ndarray trước rồi mới chuyển sang PIL / vẽ / mã hoá
+    size = (max_size or settings.THUMBNAIL_MAX_SIZE) if mode == "thumbnail" else None
+    with stage_timer("analyze_image", "encode"):
+        jpeg, rendered_size = await asyncio.to_thread(
+            rendering.render_annotated, frame if frame is not None else img, result, size, quality)
 
-        # Vẽ label (dùng font mặc định hoặc thêm font nếu cần)
-        draw.text((x1, y1 - 20), label, fill='lime')
+    if mode == "jpeg":
+        return Response(jpeg, media_type="image/jpeg", headers={
+            "X-Classification": quote(str(result["classification"])),
+            "X-Confidence": str(result["confidence"]),
+            "X-Bounding-Box": ",".join(str(v) for v in bbox),
+            "X-Image-Size": f"{image_size[0]},{image_size[1]}",
+            **({"X-Detections": str(result["detections"]["count"])} if "detections" in result else {}),
+        })
 
-    # Chuyển ảnh sang bytes để gửi về
-    buffered = io.BytesIO()
-    img.save(buffered, format="JPEG")
-    img_bytes = buffered.getvalue()
-    img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+    data = {"image_base64": base64.b64encode(jpeg).decode("utf-8"), **info}
+    if mode == "thumbnail":
+        data["thumbnail_size"] = list(rendered_size)
+    return {"type": "image_with_info", "status": "success", "data": data}
 
-    return {
-        "type": "image_with_info",
-        "status": "success",
-        "data": {
-            "image_base64": img_base64,
-            "classification": result["classification"],
-            "confidence": result["confidence"],
-            "bounding_box": bbox
-        }
-    }
+
+# ---------------------- Phân loại nhiều ảnh ----------------------
+
+async def spool_upload(file: UploadFile) -> tempfile.SpooledTemporaryFile:
+    """
+    Copy an upload into our own spooled temp file (in memory up to
+    UPLOAD_CHUNK_SIZE, then on disk). Needed when the body is read after the
+    handler returned: older FastAPI versions close UploadFiles at that point.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_CHUNK_SIZE)
+    try:
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await asyncio.to_thread(spooled.write, chunk)
+    except Exception:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
+@router.post("/analyze_batch")
+async def analyze_batch(
+        files: List[UploadFile] = File(..., description="Images and/or zip archives of images"),
+        batch_size: int = Query(None, ge=1, le=128, description="Images per model call"),
+        profile: Optional[str] = PROFILE_QUERY,
+        detection: DetectionQuery = Depends(),
+):
+    """
+    Classify many images (or zip archives of images) in one request.
+
+    Streams one NDJSON line per image (``{"type": "image", "index", "filename",
+    ...}`` with the same fields as ``analyze_image?mode=json``) as each model
+    batch completes, followed by a final ``{"type": "summary"}`` line. Images
+    are decoded in parallel and the next chunk is decoded while the current
+    one is on the model.
+    """
+    if not inference_service.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is still loading, please retry later",
+            headers={"Retry-After": "5"},
+        )
+    try:
+        profile = inference_service.resolve_profile(profile)
+    except UnknownProfileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    options = detection.options()
+
+    batch_size = batch_size or settings.ANALYZE_BATCH_SIZE
+    # Response stream chạy sau khi handler trả về: không dùng file.file của FastAPI (có thể đã bị đóng)
+    spooled = []
+    try:
+        for file in files:
+            spooled.append(await spool_upload(file))
+    except Exception:
+        for fileobj in spooled:
+            fileobj.close()
+        raise
+    uploads = [(file.filename or f"file{i}", fileobj) for i, (file, fileobj) in enumerate(zip(files, spooled))]
+    reader = image_batch.ChunkReader(image_batch.iter_upload_images(uploads), batch_size)
+
+    async def stream_results():
+        started = time.perf_counter()
+        errors = 0
+        next_chunk = None
+        try:
+            with stage_timer("analyze_batch", "decode"):
+                chunk = await asyncio.to_thread(reader.read_chunk)
+            while chunk:
+                # Giải mã chunk sau trong lúc chunk hiện tại chạy model
+                next_chunk = asyncio.create_task(asyncio.to_thread(reader.read_chunk))
+                valid = [item for item in chunk if item.error is None]
+                outputs = []
+                if valid:
+                    with stage_timer("analyze_batch", "inference"):
+                        outputs = await predict_frames_with_retry([item.frame for item in valid], profile, options)
+                results = dict(zip((item.index for item in valid), outputs))
+
+                lines = []
+                for item in chunk:
+                    line = {"type": "image", "index": item.index, "filename": item.filename}
+                    if item.error is not None:
+                        errors += 1
+                        line.update({"classification": "Error", "confidence": 0.0, "bounding_box": [],
+                                     "error": item.error})
+                    else:
+                        output = results[item.index]
+                        result_writer.record(output, "batch", item.filename)
+                        line.update({
+                            "classification": output["classification"],
+                            "confidence": output["confidence"],
+                            "bounding_box": output.get("bounding_box", []),
+                            "image_size": [item.frame.shape[1], item.frame.shape[0]],
+                        })
+                        if "detections" in output:
+                            line["detections"] = output["detections"]
+                        if "error" in output:
+                            errors += 1
+                            line["error"] = output["error"]
+                    lines.append(json.dumps(line))
+                yield "\n".join(lines) + "\n"
+
+                with stage_timer("analyze_batch", "decode"):
+                    chunk = await next_chunk
+
+            summary = {
+                "type": "summary",
+                "images": reader.count,
+                "errors": errors,
+                "truncated": reader.truncated,
+                "batch_size": batch_size,
+                "profile": profile,
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+            }
+            yield json.dumps(summary) + "\n"
+        except zipfile.BadZipFile as e:
+            yield json.dumps({"type": "summary", "images": reader.count, "errors": errors + 1,
+                              "error": f"Bad zip archive: {e}"}) + "\n"
+        finally:
+            # Client ngắt giữa chừng: đợi thread đang đọc chunk kế tiếp xong rồi mới đóng
+            if next_chunk is not None and not next_chunk.done():
+                await asyncio.gather(next_chunk, return_exceptions=True)
+            reader.close()
+            for fileobj in spooled:
+                fileobj.close()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+# ---------------------- Xử lý file video ----------------------
+
+async def save_upload_to_disk(file: UploadFile, suffix: str) -> str:
+    """
+    Copy an upload to a temp file chunk by chunk (never holding the whole video in memory).
+    """
+    temp_file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await asyncio.to_thread(temp_file.write, chunk)
+    except Exception:
+        temp_file.close()
+        os.unlink(temp_file.name)
+        raise
+    temp_file.close()
+    return temp_file.name
+
+
+async def predict_frames_with_retry(frames, profile: Optional[str] = None, options: Optional[DetectOptions] = None):
+    # Không thể trả 503 giữa chừng một response đang stream: chờ executor rảnh rồi thử lại
+    while True:
+        try:
+            return await inference_service.predict_many(frames, profile, options)
+        except InferenceBusyError:
+            await asyncio.sleep(0.05)
+
+
+@router.post("/analyze_video")
+async def analyze_video(
+        file: UploadFile = File(...),
+        stride: int = Query(None, ge=1, description="Classify one frame out of every N"),
+        batch_size: int = Query(None, ge=1, le=64, description="Frames per model call"),
+        profile: Optional[str] = PROFILE_QUERY,
+):
+    """
+    Classify a video file and stream one NDJSON line per analysed frame while
+    processing, followed by a final ``{"type": "summary"}`` line.
+    """
+    if not inference_service.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is still loading, please retry later",
+            headers={"Retry-After": "5"},
+        )
+    try:
+        profile = inference_service.resolve_profile(profile)
+    except UnknownProfileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stride = stride or settings.VIDEO_FRAME_STRIDE
+    batch_size = batch_size or settings.VIDEO_BATCH_SIZE
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    video_path = await save_upload_to_disk(file, suffix)
+
+    fps = await asyncio.to_thread(VideoProcessor.video_fps, video_path)
+    if fps <= 0 and await asyncio.to_thread(video_processor.extract_first_frame, video_path) is None:
+        os.unlink(video_path)
+        raise HTTPException(status_code=400, detail="Cannot read video file")
+
+    async def stream_results():
+        processor = VideoProcessor(frame_skip=stride - 1)
+        prefetcher = FramePrefetcher(processor, video_path, prefetch=settings.VIDEO_PREFETCH_FRAMES).start()
+        started = time.perf_counter()
+        processed = 0
+        try:
+            while True:
+                # Lấy cả batch trong một lần nhảy sang thread, frame được giải mã sẵn ở thread nền
+                batch = await asyncio.to_thread(prefetcher.next_batch, batch_size)
+                if not batch:
+                    break
+                with stage_timer("analyze_video", "inference"):
+                    outputs = await predict_frames_with_retry([frame for frame, _ in batch], profile)
+                lines = []
+                for (_, frame_number), output in zip(batch, outputs):
+                    lines.append(json.dumps({
+                        "type": "frame",
+                        "frame": frame_number,
+                        "timestamp": round(frame_number / fps, 3) if fps > 0 else None,
+                        "classification": output["classification"],
+                        "confidence": output["confidence"],
+                        "bounding_box": output.get("bounding_box", []),
+                    }))
+                processed += len(batch)
+                yield "\n".join(lines) + "\n"
+
+            summary = {
+                "type": "summary",
+                "frames_processed": processed,
+                "stride": stride,
+                "profile": profile,
+                "fps": fps,
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+            }
+            if prefetcher.error is not None:
+                summary["error"] = str(prefetcher.error)
+            yield json.dumps(summary) + "\n"
+        finally:
+            # Khi client ngắt, generator bị huỷ: dọn dẹp đồng bộ trước mọi await
+            prefetcher.stop()
+            os.unlink(video_path)
+            await asyncio.to_thread(prefetcher.close)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 
 # ---------------------- Xử lý video từ camera ----------------------
 
 @router.websocket("/ws/camera")
-async def websocket_camera(websocket: WebSocket):
-    print("WebSocket connection started")
-    await websocket.accept()
-    try:
+async def websocket_camera(
+        websocket: WebSocket,
+        protocol: str = "text",
+        hints: bool = False,
+        motion: Optional[bool] = None,
+        profile: Optional[str] = None,
+):
+    """
+    Camera stream. Text messages carry a base64 frame and get a JSON reply (old clients).
+
+    Binary mode is negotiated with ``?protocol=binary`` or the ``tomato.binary.v1``
+    subprotocol: the server first sends a JSON "hello" with the class table, then
+    binary messages (sequence id + JPEG/WebP bytes) get fixed-size binary replies
+    (see app/services/ws_protocol.py).
+
+    Receiving and inference run as separate tasks with "latest frame wins":
+    frames that arrive while the previous one is still being classified replace
+    each other and only the newest is processed. Binary clients (and text clients
+    with ``?hints=true``) periodically get ``{"type": "fps_hint"}`` messages with
+    the send rate the server can keep up with.
+
+    With ``?motion=true`` (default CAMERA_MOTION_GATING) the detector only runs on
+    keyframes or when the frame changed enough; other frames reuse the last result
+    with the box moved by an optical-flow tracker (see app/services/tracking.py).
+
+    ``?profile=`` picks an inference profile (e.g. "balanced" for a lower input size).
+    """
+    logger.info("WebSocket connection started", extra={"client": str(websocket.client)})
+    if profile is not None and inference_service.ready:
+        try:
+            inference_service.resolve_profile(profile)
+        except UnknownProfileError as e:
+            logger.warning("WebSocket rejected: %s", e)
+            await websocket.close(code=1008)
+            return
+    requested = websocket.scope.get("subprotocols", [])
+    subprotocol = ws_protocol.SUBPROTOCOL if ws_protocol.SUBPROTOCOL in requested else None
+    binary = protocol == ws_protocol.PROTOCOL_NAME or subprotocol is not None
+    send_hints = binary or hints
+
+    await websocket.accept(subprotocol=subprotocol)
+    if binary:
+        await websocket.send_json(ws_protocol.hello_message(inference_service.class_names))
+
+    slot = LatestFrameSlot()
+    fps_advisor = FpsAdvisor(max_fps=settings.CAMERA_MAX_FPS)
+    stats = {"frames": 0, "bytes_in": 0, "bytes_out": 0, "inferred": 0}
+    persist_every = settings.RESULT_PERSIST_CAMERA_EVERY
+    gating = settings.CAMERA_MOTION_GATING if motion is None else motion
+    session = MotionGatedSession(
+        keyframe_interval=settings.MOTION_KEYFRAME_INTERVAL,
+        motion_threshold=settings.MOTION_THRESHOLD,
+    ) if gating else None
+
+    async def send_bytes(reply: bytes):
+        stats["bytes_out"] += len(reply)
+        await websocket.send_bytes(reply)
+
+    async def send_json(payload: dict):
+        text = json.dumps(payload)
+        stats["bytes_out"] += len(text)
+        await websocket.send_text(text)
+
+    async def receive_loop():
         while True:
-            # Nhận frame base64 từ client (định dạng chuỗi)
-            data = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                # Binary: seq id + ảnh gốc, không cần base64
+                stats["bytes_in"] += len(message["bytes"])
+                try:
+                    seq, frame_bytes = ws_protocol.decode_frame(message["bytes"])
+                except ws_protocol.ProtocolError:
+                    seq, frame_bytes = 0, b""
+                item = (seq, frame_bytes)
+            else:
+                # Frame base64 (định dạng chuỗi): chỉ giải mã khi frame này thực sự được xử lý
+                data = message.get("text") or ""
+                stats["bytes_in"] += len(data)
+                item = (None, data)
+            if slot.put(item):
+                CAMERA_FRAMES.labels(outcome="dropped").inc()
 
-            # Giải mã base64 thành bytes
-            frame_bytes = base64.b64decode(data)
+    async def inference_loop():
+        last_hint = time.monotonic()
+        while True:
+            seq, payload = await slot.get()
+            started = time.perf_counter()
 
-            # Chuyển bytes thành numpy array (để OpenCV xử lý)
-            nparr = np.frombuffer(frame_bytes, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            with stage_timer("camera", "decode"):
+                frame_bytes = payload if seq is not None else base64.b64decode(payload)
+                # Chuyển bytes thành numpy array (để OpenCV xử lý)
+                frame = utils.decode_image(frame_bytes)
+            stats["frames"] += 1
 
-            # Xử lý frame với model classification (bạn convert frame cho phù hợp)
-            result = classifier.predict_frame(frame)
+            # Xử lý frame với model classification
+            status = None
+            if frame is None:
+                result = {"classification": "Error", "confidence": 0.0, "bounding_box": [],
+                          "error": "Cannot decode frame"}
+                outcome = "error"
+            else:
+                gray = session.prepare(frame) if session is not None else None
+                if session is not None and not session.needs_inference(gray):
+                    # Frame gần như không đổi: dùng lại kết quả keyframe, dịch box theo tracker
+                    result = session.track(gray)
+                    outcome = "tracked"
+                else:
+                    try:
+                        with stage_timer("camera", "inference"):
+                            result = await run_inference(frame, profile)
+                        if session is not None and "error" not in result:
+                            result = session.on_keyframe(gray, result)
+                        outcome = "inferred"
+                        # Chỉ lưu mẫu 1 trong N frame để không ghi DB theo tốc độ camera
+                        if persist_every and stats["inferred"] % persist_every == 0:
+                            result_writer.record(result, "camera")
+                        stats["inferred"] += 1
+                    except ModelNotReadyError:
+                        status, outcome = ws_protocol.STATUS_LOADING, "loading"
+                    except UnknownProfileError:
+                        status, outcome = ws_protocol.STATUS_ERROR, "error"
+                    except InferenceBusyError:
+                        # Hàng đợi đầy: báo client bỏ frame này thay vì dồn thêm việc
+                        status, outcome = ws_protocol.STATUS_BUSY, "busy"
 
-            # Gửi lại kết quả classification dạng JSON
-            await websocket.send_json({
-                "classification": result["classification"],
-                "confidence": result["confidence"],
-                "bounding_box": result.get("bounding_box", [])
-            })
+            with stage_timer("camera", "encode"):
+                if seq is not None:
+                    if status is not None:
+                        await send_bytes(ws_protocol.encode_status(seq, status))
+                    else:
+                        await send_bytes(ws_protocol.encode_result(seq, result))
+                elif status is not None:
+                    await send_json({"status": ws_protocol.STATUS_NAMES[status]})
+                else:
+                    # Gửi lại kết quả classification dạng JSON
+                    reply = {
+                        "classification": result["classification"],
+                        "confidence": result["confidence"],
+                        "bounding_box": result.get("bounding_box", [])
+                    }
+                    if "keyframe" in result:
+                        reply["keyframe"] = result["keyframe"]
+                    await send_json(reply)
+            CAMERA_FRAMES.labels(outcome=outcome).inc()
+
+            if status is None:
+                fps_advisor.observe(time.perf_counter() - started)
+            now = time.monotonic()
+            if send_hints and now - last_hint >= settings.CAMERA_FPS_HINT_INTERVAL:
+                last_hint = now
+                hint = {"type": "fps_hint", "fps": fps_advisor.fps, "dropped": slot.dropped}
+                if session is not None:
+                    hint["keyframe_ratio"] = round(session.keyframe_ratio, 3)
+                await send_json(hint)
+
+    connections = WEBSOCKET_CONNECTIONS.labels(endpoint="camera")
+    connections.inc()
+    receiver = asyncio.create_task(receive_loop())
+    worker = asyncio.create_task(inference_loop())
+    try:
+        done, pending = await asyncio.wait({receiver, worker}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.warning("WebSocket error: %s", e)
     finally:
-        await websocket.close()
+        connections.dec()
+        receiver.cancel()
+        worker.cancel()
+        fields = {"mode": "binary" if binary else "text", "dropped": slot.dropped, **stats}
+        if session is not None:
+            fields["keyframe_ratio"] = round(session.keyframe_ratio, 3)
+        logger.info("WebSocket closed", extra=fields)
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
+
 
+@router.get("/stats/cache")
+def cache_stats():
+    # hit/miss/eviction của cache kết quả
+    return inference_service.cache.stats()
 
 
+@router.get("/stats/persistence")
+def persistence_stats():
+    # Hàng đợi ghi kết quả xuống DB: đang chờ / đã ghi / bị bỏ
+    return result_writer.stats()
+
+
+@router.get("/stats/batching")
+def batching_stats():
+    # Histogram batch size / thời gian chờ trong queue để tinh chỉnh BATCH_MAX_WAIT_MS
+    if not inference_service.ready:
+        return {"enabled": settings.BATCHING_ENABLED, **inference_service.status()}
+    return {
+        "enabled": settings.BATCHING_ENABLED,
+        **inference_service.batcher.stats(),
+        "profiles": {
+            name: batcher.stats() for name, batcher in inference_service.batchers.items()
+            if batcher is not inference_service.batcher
+        },
+        "executor": inference_service.executor.stats(),
+    }
@@ -1,33 +1,237 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
 from app.core.config import settings
+from app.core.metrics import REGISTRY, Gauge
 
+# Thuộc tính có sẵn của LogRecord; mọi thứ khác truyền qua ``extra`` là field có cấu trúc
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
 
-# Cấu hình logger
-def get_logger(name: str) -> logging.Logger:
-    # Tạo một logger mới với tên là name
-    logger = logging.getLogger(name)
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_worker_handlers: List[logging.Handler] = []  # handler ghi trực tiếp trong process worker
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Classic text line followed by the structured fields as ``key=value``.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line (for log shippers).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller: when the queue is full the record
+    is dropped and counted instead of raising or waiting.
+    """
 
-    # Thiết lập mức log mặc định là DEBUG
-    logger.setLevel(logging.DEBUG)
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
 
-    # Cấu hình format của log
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    formatter = logging.Formatter(log_format)
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
-    # Cấu hình stream handler để ghi log ra console
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-    # Cấu hình file handler để ghi log vào file (tuỳ chọn)
+def _output_handlers(log_format: Optional[str] = None) -> List[logging.Handler]:
+    formatter = (
+        JsonFormatter() if (log_format or settings.LOG_FORMAT) == "json"
+        else KeyValueFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
     if settings.DEBUG:
         # Nếu DEBUG = True, ghi log vào file app.log
-        file_handler = logging.FileHandler("app.log")
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(logging.FileHandler("app.log"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _configure_root(handlers: List[logging.Handler], level: Optional[Union[int, str]]) -> None:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, DroppingQueueHandler) or handler in _worker_handlers:
+            root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level or settings.LOG_LEVEL)
+    # uvicorn gắn handler riêng; cho nó đi qua handler chung để không in trùng
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+
+def setup_logging(level: Optional[str] = None, log_format: Optional[str] = None, force: bool = False) -> None:
+    """
+    Route all ``app`` / uvicorn logging through one bounded queue drained by a
+    background thread, so a log call on the event loop is just a queue put.
+
+    Idempotent: later calls are no-ops unless ``force`` is set.
+    """
+    global _listener, _queue_handler, _worker_handlers
+    with _setup_lock:
+        if (_listener is not None or _worker_handlers) and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+
+        handlers = _output_handlers(log_format)
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+        _configure_root([_queue_handler], level)
+        _worker_handlers = []
+
+
+def setup_worker_logging(level: Optional[Union[int, str]] = None, log_format: Optional[str] = None) -> None:
+    """
+    Logging for a worker process (inference pool): records are written by the
+    handlers directly. A forked child has the parent's queue handler but not
+    the listener thread draining it, so without this its logs would be lost.
+    """
+    global _listener, _queue_handler, _worker_handlers, _setup_lock
+    # Lock/queue có thể đang bị thread khác của process cha giữ lúc fork: không dùng lại
+    _setup_lock = threading.Lock()
+    _listener = None
+    _queue_handler = None
+    handlers = _output_handlers(log_format)
+    _configure_root(handlers, level)
+    _worker_handlers = handlers
+
+
+def _after_fork_in_child() -> None:
+    if _listener is not None:
+        setup_worker_logging(logging.getLogger().level)
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def shutdown_logging() -> None:
+    """
+    Flush the queue and stop the background thread.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Logger for ``name``; handlers live on the root logger (set up once), never on the returned logger.
+    """
+    setup_logging()
+    return logging.getLogger(name)
+
+
+class LogSampler:
+    """
+    Rate/sampling control for per-frame log events.
+
+    For each key, an event is let through once every ``every`` calls and at
+    most once per ``interval`` seconds (either limit may be 0 = off). ``allow``
+    returns None for suppressed events, otherwise the number of events
+    suppressed since the last one that was logged.
+
+    Usage::
+
+        suppressed = sampler.allow("camera.frame")
+        if suppressed is not None:
+            logger.debug("Frame classified", extra={"suppressed": suppressed, ...})
+    """
+
+    def __init__(self, every: int = 0, interval: float = 0.0):
+        self.every = max(0, every)
+        self.interval = max(0.0, interval)
+        self._state: Dict[str, list] = {}  # key -> [số lần gọi, số lần bị bỏ, lần log cuối]
+        self._lock = threading.Lock()
+
+    def allow(self, key: str = "") -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = [0, 0, float("-inf")]
+            state[0] += 1
+            if self.every and (state[0] - 1) % self.every:
+                state[1] += 1
+                return None
+            if self.interval and now - state[2] < self.interval:
+                state[1] += 1
+                return None
+            suppressed, state[1], state[2] = state[1], 0, now
+            return suppressed
+
+
+# Sampler dùng chung cho log theo từng ảnh/frame
+frame_sampler = LogSampler(every=settings.LOG_SAMPLE_EVERY, interval=settings.LOG_SAMPLE_INTERVAL)
+
+
+def log_sampled(logger: logging.Logger, key: str, level: int, msg: str, *args, **fields) -> None:
+    """
+    Log a per-frame event through ``frame_sampler``; cheap when the level is disabled or the event is sampled out.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    suppressed = frame_sampler.allow(key)
+    if suppressed is None:
+        return
+    logger.log(level, msg, *args, extra={**fields, "suppressed": suppressed})
 
-    return logger
 
+REGISTRY.register(Gauge(
+    "log_records_dropped", "Log records dropped because the logging queue was full", fn=dropped_records,
+))
 
-# Khởi tạo logger cho ứng dụng
-logger = get_logger(__name__)
+logger = logging.getLogger(__name__)
@@ -0,0 +1,381 @@
+import bisect
+import contextvars
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+class _LabeledMetric(ABC):
+    """
+    Shared label handling: a metric declared with ``labelnames`` holds one child
+    per label combination, created on first use by ``labels(**values)``.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_LabeledMetric"] = {}
+        self._children_lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self) -> "_LabeledMetric":
+        """
+        Unlabeled metric of the same kind holding one label combination.
+        """
+
+    def labels(self, **values) -> "_LabeledMetric":
+        if set(values) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(values)}")
+        key = tuple(str(values[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self) -> Iterator[Tuple[Dict[str, str], "_LabeledMetric"]]:
+        if not self.labelnames:
+            yield {}, self
+            return
+        for key, child in list(self._children.items()):
+            yield dict(zip(self.labelnames, key)), child
+
+    @abstractmethod
+    def _render_samples(self, labels: Dict[str, str]) -> List[str]:
+        """
+        Exposition lines of this series, with ``labels`` attached.
+        """
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        for labels, series in self._series():
+            lines += series._render_samples(labels)
+        return lines
+
+
+class Counter(_LabeledMetric):
+    """
+    Monotonically increasing count.
+    """
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.description)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _render_samples(self, labels: Dict[str, str]) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(self._value)}"]
+
+
+class Gauge(_LabeledMetric):
+    """
+    Value that goes up and down; with ``fn`` it is read from a callback at render time.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, description, labelnames)
+        self.fn = fn
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.description)
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def _render_samples(self, labels: Dict[str, str]) -> List[str]:
+        value = self.value
+        return [f"{self.name}{_format_labels(labels)} {'NaN' if value != value else _format_value(value)}"]
+
+
+class Histogram(_LabeledMetric):
+    """
+    Thread-safe histogram with fixed upper bounds (cumulative like Prometheus).
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # phần tử cuối là +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.description, self.buckets)
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        """
+        Observe the duration of the ``with`` block in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        Return cumulative bucket counts, sum and count.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total_count = self._count
+
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + [float("inf")], counts):
+            running += count
+            cumulative.append({"le": "+Inf" if bound == float("inf") else bound, "count": running})
+
+        return {
+            "buckets": cumulative,
+            "sum": total_sum,
+            "count": total_count,
+            "mean": total_sum / total_count if total_count else 0.0,
+        }
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile (0..1) from bucket counts, returning the bucket upper bound.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total_count = self._count
+        if total_count == 0:
+            return 0.0
+        target = q * total_count
+        running = 0
+        for bound, count in zip(self.buckets + [float("inf")], counts):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def _render_samples(self, labels: Dict[str, str]) -> List[str]:
+        snapshot = self.snapshot()
+        lines = []
+        for bucket in snapshot["buckets"]:
+            le = bucket["le"] if bucket["le"] == "+Inf" else _format_value(bucket["le"])
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {bucket['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {snapshot['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Named collection of metrics rendered together in the Prometheus text format.
+
+    Registering a metric under a name that already exists replaces the old one
+    (e.g. when the inference service recreates its batchers).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _LabeledMetric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _LabeledMetric) -> _LabeledMetric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_LabeledMetric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------------------- Metric dùng chung ----------------------
+# Lưu ý: với INFERENCE_EXECUTOR=process, các stage bên trong model chạy ở process
+# worker nên không có trong inference_stage_seconds; thời gian inference nhìn từ
+# request vẫn có trong request_stage_seconds{stage="inference"}.
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by method, route and status code", ("method", "route", "status"),
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is fully sent",
+    labelnames=("method", "route"),
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled",
+))
+REQUEST_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "request_stage_duration_seconds", "Time spent per stage (decode, inference, encode...) of an endpoint",
+    labelnames=("endpoint", "stage"),
+))
+INFERENCE_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "inference_stage_duration_seconds",
+    "Time per model stage (prepare_input, model_preprocess, forward, nms, format) per call",
+    labelnames=("stage",),
+))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Database statement latency by route and SQL operation",
+    labelnames=("route", "operation"),
+))
+WEBSOCKET_CONNECTIONS = REGISTRY.register(Gauge(
+    "websocket_connections", "Open websocket connections", ("endpoint",),
+))
+CAMERA_FRAMES = REGISTRY.register(Counter(
+    "camera_frames_total", "Camera frames by outcome (inferred, tracked, dropped, busy, loading, error)",
+    ("outcome",),
+))
+
+_current_scope: contextvars.ContextVar = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def route_label(scope: Optional[dict]) -> str:
+    """
+    Route template (``/admin/users/{user_id}``) instead of the raw path to keep label cardinality low.
+    """
+    if not scope:
+        return "none"
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    return scope.get("root_path", "") + path
+
+
+@contextmanager
+def stage_timer(endpoint: str, stage: str):
+    """
+    Time one stage of an endpoint into request_stage_duration_seconds.
+    """
+    with REQUEST_STAGE_SECONDS.labels(endpoint=endpoint, stage=stage).time():
+        yield
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting HTTP requests, their latency and how many are in flight.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = route_label(scope)
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=route).observe(elapsed)
+            HTTP_REQUESTS.labels(method=scope["method"], route=route, status=status["code"]).inc()
+            _current_scope.reset(token)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Time every SQL statement of a SQLAlchemy engine, labeled with the current HTTP route.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_started"].pop()
+        operation = statement.split(None, 1)[0].upper() if statement else "UNKNOWN"
+        DB_QUERY_SECONDS.labels(route=route_label(_current_scope.get()), operation=operation).observe(
+            time.perf_counter() - started
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("metrics_query_started"):
+            conn.info["metrics_query_started"].pop()
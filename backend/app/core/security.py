@@ -1,27 +1,29 @@
 from datetime import datetime, timedelta
 from typing import Union
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from app.core.config import settings  # Lấy các cấu hình từ file config (chẳng hạn như SECRET_KEY)
+from app.services.password_hasher import password_hasher
+from app.services.token_cache import verified_claims
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
-# Sử dụng Passlib để mã hóa và kiểm tra mật khẩu
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Sử dụng Passlib để mã hóa và kiểm tra mật khẩu (bcrypt, work factor BCRYPT_ROUNDS).
+# Endpoint async dùng password_hasher.hash/verify (executor riêng), hai hàm dưới chạy ngay tại thread gọi.
+pwd_context = password_hasher.context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login/user")
 
 # Cấu hình cho JWT
 SECRET_KEY = settings.SECRET_KEY  # Key bí mật để tạo JWT
-ALGORITHM = "HS256"  # Thuật toán mã hóa JWT
-ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Thời gian hết hạn của token (ở đây là 30 phút)
+ALGORITHM = settings.ALGORITHM  # Thuật toán mã hóa JWT
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES  # Thời gian hết hạn của token (phút)
 
 # Hàm mã hóa mật khẩu
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash_sync(password)
 
 # Hàm kiểm tra mật khẩu
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify_sync(plain_password, hashed_password)
 
 # Hàm tạo JWT (trả về access token)
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None) -> str:
@@ -34,11 +36,10 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Hàm giải mã JWT và xác minh tính hợp lệ của nó
+# Hàm giải mã JWT và xác minh tính hợp lệ của nó (chữ ký và exp), claims đã xác minh được cache
 def verify_access_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload if payload["exp"] >= datetime.utcnow() else None
+        return verified_claims(token)
     except JWTError:
         return None
 
@@ -55,7 +56,7 @@ def get_user_from_token(token: str) -> dict:
 
 def admin_required(token: str = Depends(oauth2_scheme)):
     user = get_user_from_token(token)
-    if not user or user["role"] != "admin":
+    if not user or user.get("role") != "admin":
         raise HTTPException(    
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to perform this action"
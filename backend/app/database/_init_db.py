@@ -1,6 +1,50 @@
-from app.database.session import engine
+from sqlalchemy import inspect, text
+
+from app.database.session import engine, is_sqlite
 from app.models.base import Base
-from app.models import user, classification_result
+from app.models import user, classification_result, classification_stat  # noqa: F401  (đăng ký các bảng vào Base.metadata)
+
+# Tên index hiện có, kể cả index theo biểu thức (lower(...)) mà inspector của SQLAlchemy bỏ qua
+_INDEX_NAME_QUERIES = {
+    "sqlite": "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table",
+    "mysql": "SELECT DISTINCT index_name FROM information_schema.statistics "
+             "WHERE table_schema = DATABASE() AND table_name = :table",
+}
+
+
+def _index_names(conn, table_name):
+    query = _INDEX_NAME_QUERIES.get(conn.dialect.name)
+    if query is None:
+        return {index["name"] for index in inspect(conn).get_indexes(table_name)}
+    return {row[0] for row in conn.execute(text(query), {"table": table_name})}
+
+
+def _upgrade_tables():
+    # create_all không sửa bảng đã có: thêm các cột nullable và index mới vào bảng cũ
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                quote = engine.dialect.identifier_preparer.quote
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+            existing_indexes = _index_names(conn, table.name)
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+
 
 def _init_db():
     Base.metadata.create_all(bind=engine)
+    _upgrade_tables()
+    if is_sqlite(str(engine.url)):
+        from app.services.user_search import ensure_sqlite_trigram_index
+
+        with engine.begin() as conn:
+            ensure_sqlite_trigram_index(conn)
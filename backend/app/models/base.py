@@ -1,3 +1,4 @@
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import declarative_base
 
+# Base dùng chung cho mọi model (app.database.session.Base là cùng một đối tượng)
 Base = declarative_base()
@@ -1,9 +1,22 @@
-from sqlalchemy import Column, Integer, String, Float
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Float
 from app.database.session import Base
 
 class ClassificationResult(Base):
     __tablename__ = "classification_results"
     id = Column(Integer, primary_key=True, index=True)
-    result = Column(String)
+    result = Column(String(100))
     confidence = Column(Float)
-    image_url = Column(String)
+    image_url = Column(String(512))  # tên file upload (không lưu ảnh)
+    class_id = Column(Integer, nullable=True)
+    bounding_box = Column(String(64), nullable=True)  # "x1,y1,x2,y2"
+    source = Column(String(16), nullable=True)  # image / batch / camera
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+
+    # Phân trang keyset theo id giảm dần, lọc theo class / thời gian / confidence (/admin/data)
+    __table_args__ = (
+        Index("ix_classification_results_result_id", "result", "id"),
+        Index("ix_classification_results_created_at_id", "created_at", "id"),
+        Index("ix_classification_results_confidence", "confidence"),
+    )
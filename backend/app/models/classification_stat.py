@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, Float, Integer, String, UniqueConstraint
+from app.database.session import Base
+
+class ClassificationStat(Base):
+    """
+    Rolled-up counters of classification_results per class and hour/day bucket
+    (kept up to date incrementally, see app/services/result_stats.py).
+    """
+    __tablename__ = "classification_stats"
+    id = Column(Integer, primary_key=True)
+    period = Column(String(8), nullable=False)  # "hour" / "day" / "undated" (kết quả cũ không có thời gian)
+    bucket_start = Column(DateTime, nullable=False)
+    result = Column(String(100), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    histogram = Column(String(128), nullable=False, default="")  # số kết quả theo từng khoảng 10% confidence
+
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", "result", name="uq_classification_stats_bucket"),
+    )
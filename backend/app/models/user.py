@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String, func
 from sqlalchemy.orm import relationship
 from app.database.session import Base
 from sqlalchemy.orm import Session
@@ -9,10 +9,17 @@ class User(Base):
     __tablename__ = "user"  # Tên bảng trong cơ sở dữ liệu
 
     id = Column(Integer, primary_key=True, index=True)  # ID người dùng
-    username = Column(String, unique=True, index=True, nullable=False)  # Tên người dùng
-    email = Column(String, unique=True, index=True, nullable=False)  # Email người dùng
-    hashed_password = Column(String, nullable=False)  # Mật khẩu đã mã hóa
-    role = Column(String, default=False)
+    username = Column(String(100), unique=True, index=True, nullable=False)  # Tên người dùng
+    email = Column(String(255), unique=True, index=True, nullable=False)  # Email người dùng
+    hashed_password = Column(String(255), nullable=False)  # Mật khẩu đã mã hóa
+    role = Column(String(20), default=False)
+
+
+# Tìm kiếm user (/admin/users/search): tìm theo tiền tố không phân biệt hoa thường dùng index trên lower(),
+# tìm chuỗi con trên MySQL dùng FULLTEXT (SQLite không có, dùng cách quét có giới hạn)
+Index("ix_user_username_lower", func.lower(User.username))
+Index("ix_user_email_lower", func.lower(User.email))
+Index("ix_user_fulltext", User.username, User.email, mysql_prefix="FULLTEXT").ddl_if(dialect="mysql")
 
 
 def get_user_by_username(db: Session, username: str):
@@ -0,0 +1,339 @@
+import ast
+import logging
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.core.metrics import INFERENCE_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_MODEL_PREPROCESS_SECONDS = INFERENCE_STAGE_SECONDS.labels(stage="model_preprocess")
+_FORWARD_SECONDS = INFERENCE_STAGE_SECONDS.labels(stage="forward")
+_NMS_SECONDS = INFERENCE_STAGE_SECONDS.labels(stage="nms")
+
+ModelInput = Union[np.ndarray, Image.Image]
+
+
+@dataclass
+class Detections:
+    """
+    Detections for one image as plain arrays, in the coordinates of the image given to the backend.
+    """
+    boxes: np.ndarray  # (N, 4) float32, xyxy
+    scores: np.ndarray  # (N,) float32, 0..1
+    class_ids: np.ndarray  # (N,) int32
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.zeros((0, 4), np.float32), np.zeros((0,), np.float32), np.zeros((0,), np.int32))
+
+
+def to_bgr_array(image: ModelInput) -> np.ndarray:
+    """
+    ndarray inputs are already BGR; PIL images (RGB) are converted.
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    return np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+
+
+def letterbox(
+        image: np.ndarray, size: int, stride: int = 0, color: int = 114
+) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize keeping aspect ratio and pad to a ``size`` x ``size`` square, or with
+    ``stride`` > 0 only up to the next multiple of ``stride`` (rectangular input,
+    fewer pixels to run through the model).
+
+    Returns the padded image, the resize ratio and the (left, top) padding.
+    """
+    height, width = image.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    target_width, target_height = size, size
+    if stride:
+        target_width = -(-new_width // stride) * stride
+        target_height = -(-new_height // stride) * stride
+    pad_x, pad_y = (target_width - new_width) / 2, (target_height - new_height) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color, color, color))
+    return padded, ratio, (left, top)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float, metric: str = "iou") -> np.ndarray:
+    """
+    Greedy non-maximum suppression; returns kept indices sorted by score.
+
+    ``metric="ios"`` measures overlap as intersection over the smaller box, so a
+    box cut off by a tile border is suppressed by the full box that contains it.
+    """
+    if len(boxes) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        if metric == "ios":
+            overlap = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        else:
+            overlap = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[overlap <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def batched_nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_threshold: float,
+                metric: str = "iou") -> np.ndarray:
+    """
+    Class-aware NMS: boxes of different classes never suppress each other.
+    """
+    if len(boxes) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    offsets = class_ids.astype(np.float32)[:, None] * (boxes.max() + 1.0)
+    return nms(boxes + offsets, scores, iou_threshold, metric)
+
+
+class InferenceBackend(ABC):
+    """
+    Runtime that turns a list of prepared images into Detections.
+    """
+    name = "base"
+    names: Dict[int, str] = {}
+    precision = "fp32"
+
+    @abstractmethod
+    def predict(
+            self,
+            images: List[ModelInput],
+            imgsz: int = 640,
+            conf: float = 0.25,
+            iou: float = 0.7,
+            max_det: int = 300,
+            classes: Optional[Sequence[int]] = None,
+    ) -> List[Detections]:
+        """
+        ``classes`` keeps only those class ids (applied before NMS).
+        """
+
+    def share_memory(self) -> None:
+        """
+        Prepare the backend to be inherited by forked worker processes.
+        """
+
+
+class TorchBackend(InferenceBackend):
+    """
+    ultralytics YOLO on torch (the original behaviour).
+    """
+    name = "torch"
+
+    def __init__(self, model_path: str, precision: str = "fp32"):
+        import torch
+        from ultralytics import YOLO  # import muộn: ultralytics nặng, chỉ cần khi load model
+        self.model = YOLO(model_path)
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model.to(self.device)
+        self.names = dict(self.model.names)
+        # fp16 chỉ có lợi (và được hỗ trợ) trên GPU
+        self.half = precision == "fp16" and self.device.type == "cuda"
+        if precision == "fp16" and not self.half:
+            logger.warning("fp16 needs CUDA, running %s in fp32", model_path)
+        self.precision = "fp16" if self.half else "fp32"
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.7, max_det=300, classes=None):
+        results = self.model(images, imgsz=imgsz, conf=conf, iou=iou, max_det=max_det, half=self.half,
+                             classes=list(classes) if classes else None, verbose=False)
+        if results:
+            # ultralytics đo sẵn từng giai đoạn (ms trung bình mỗi ảnh của batch)
+            speed = results[0].speed
+            _MODEL_PREPROCESS_SECONDS.observe(speed.get("preprocess", 0.0) * len(results) / 1000.0)
+            _FORWARD_SECONDS.observe(speed.get("inference", 0.0) * len(results) / 1000.0)
+            _NMS_SECONDS.observe(speed.get("postprocess", 0.0) * len(results) / 1000.0)
+        outputs = []
+        for result in results:
+            if result.boxes is None or len(result.boxes) == 0:
+                outputs.append(Detections.empty())
+                continue
+            # Một lần chuyển sang CPU cho cả tensor [N, 6] thay vì lấy từng phần tử
+            data = result.boxes.data.cpu().numpy()
+            outputs.append(Detections(
+                boxes=data[:, :4].astype(np.float32),
+                scores=data[:, 4].astype(np.float32),
+                class_ids=data[:, 5].astype(np.int32),
+            ))
+        return outputs
+
+    def share_memory(self) -> None:
+        """
+        Fuse once here (instead of lazily in each worker, which would allocate
+        fused copies per worker) and move the tensors to shared memory.
+        """
+        if self.device.type != "cpu":
+            return
+        self.model.fuse()
+        self.model.model.share_memory()
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    ONNX Runtime (CPU) with its own letterbox pre-processing, decoding and NMS.
+
+    ``models/best.pt`` is exported to ONNX (dynamic batch/shape) next to the
+    weights the first time, or again when the .pt file is newer than the .onnx.
+    With ``precision="int8"`` that model is additionally quantized (dynamic,
+    weights to uint8) into ``best.int8.onnx``.
+    The runtime session is created lazily in the process that uses it, so it is
+    safe to construct this backend before forking inference workers.
+    """
+    name = "onnx"
+
+    def __init__(self, model_path: str, onnx_path: Optional[str] = None, precision: str = "fp32"):
+        self.model_path = model_path
+        self.onnx_path = onnx_path or os.path.splitext(model_path)[0] + ".onnx"
+        if model_path.endswith(".onnx"):
+            self.onnx_path = model_path
+        elif self._is_stale(self.onnx_path, model_path):
+            self._export()
+        if precision == "fp16":
+            logger.warning("fp16 is not used on ONNX Runtime CPU, running %s in fp32", model_path)
+        self.precision = "int8" if precision == "int8" else "fp32"
+        if self.precision == "int8":
+            fp32_path = self.onnx_path
+            self.onnx_path = os.path.splitext(fp32_path)[0] + ".int8.onnx"
+            if self._is_stale(self.onnx_path, fp32_path):
+                self._quantize(fp32_path)
+        self.names, self.stride = self._read_metadata()
+        self._session = None
+        self._session_pid = None
+
+    @staticmethod
+    def _is_stale(path: str, source: str) -> bool:
+        if not os.path.exists(path):
+            return True
+        return os.path.getmtime(source) > os.path.getmtime(path)
+
+    def _export(self) -> None:
+        from ultralytics import YOLO
+        logger.info("Exporting %s to ONNX", self.model_path)
+        exported = YOLO(self.model_path).export(format="onnx", dynamic=True, simplify=False, verbose=False)
+        if os.path.abspath(exported) != os.path.abspath(self.onnx_path):
+            os.replace(exported, self.onnx_path)
+
+    def _quantize(self, fp32_path: str) -> None:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info("Quantizing %s to int8", fp32_path)
+        quantize_dynamic(fp32_path, self.onnx_path, weight_type=QuantType.QUInt8)
+
+    def _read_metadata(self) -> Tuple[Dict[int, str], int]:
+        # Đọc metadata bằng onnx (không tạo session ORT trong process cha)
+        import onnx
+        model = onnx.load(self.onnx_path, load_external_data=False)
+        metadata = {prop.key: prop.value for prop in model.metadata_props}
+        if "names" not in metadata:
+            raise ValueError(f"ONNX model {self.onnx_path} has no class names metadata")
+        names = {int(k): v for k, v in ast.literal_eval(metadata["names"]).items()}
+        return names, int(metadata.get("stride", 32))
+
+    @property
+    def session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = settings.INFERENCE_THREADS_PER_WORKER or max(
+                1, (os.cpu_count() or 1) // max(1, settings.INFERENCE_WORKERS)
+            )
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = ort.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+            self._session_pid = os.getpid()
+        return self._session
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.7, max_det=300, classes=None):
+        if not images:
+            return []
+        with _MODEL_PREPROCESS_SECONDS.time():
+            arrays = [to_bgr_array(image) for image in images]
+            # Như ultralytics: batch cùng kích thước thì chỉ pad tới bội số của stride,
+            # khác kích thước thì pad thành hình vuông imgsz x imgsz
+            same_shape = len({array.shape for array in arrays}) == 1
+            stride = self.stride if same_shape else 0
+            blobs, metas = [], []
+            for array in arrays:
+                padded, ratio, pad = letterbox(array, imgsz, stride)
+                blobs.append(padded[:, :, ::-1].transpose(2, 0, 1))  # BGR HWC -> RGB CHW
+                metas.append((ratio, pad, array.shape[:2]))
+            batch = np.ascontiguousarray(np.stack(blobs), dtype=np.float32) / 255.0
+
+        session = self.session
+        with _FORWARD_SECONDS.time():
+            output = session.run(None, {session.get_inputs()[0].name: batch})[0]
+        with _NMS_SECONDS.time():
+            return [
+                self._postprocess(prediction, meta, conf, iou, max_det, classes)
+                for prediction, meta in zip(output, metas)
+            ]
+
+    def _postprocess(self, prediction: np.ndarray, meta, conf: float, iou: float, max_det: int,
+                     classes: Optional[Sequence[int]] = None) -> Detections:
+        ratio, (pad_x, pad_y), (height, width) = meta
+        if prediction.shape[-1] == 6 and prediction.shape[0] != 4 + len(self.names):
+            # Model end-to-end (đã có NMS): [max_det, 6] = x1, y1, x2, y2, score, class
+            mask = prediction[:, 4] >= conf
+            if classes:
+                mask &= np.isin(prediction[:, 5].astype(np.int32), classes)
+            prediction = prediction[mask][:max_det]
+            boxes, scores, class_ids = prediction[:, :4], prediction[:, 4], prediction[:, 5].astype(np.int32)
+        else:
+            # YOLOv8/11/12: [4 + nc, anchors] = cx, cy, w, h, điểm từng class
+            prediction = prediction.T
+            class_scores = prediction[:, 4:]
+            class_ids = class_scores.argmax(axis=1).astype(np.int32)
+            scores = class_scores[np.arange(len(class_scores)), class_ids]
+            mask = scores >= conf
+            if classes:
+                mask &= np.isin(class_ids, classes)
+            prediction, scores, class_ids = prediction[mask], scores[mask], class_ids[mask]
+            cx, cy, w, h = prediction[:, 0], prediction[:, 1], prediction[:, 2], prediction[:, 3]
+            boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+            keep = batched_nms(boxes, scores, class_ids, iou)[:max_det]
+            boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+        # Bỏ padding + scale letterbox để về toạ độ của ảnh đầu vào
+        boxes = (boxes - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / ratio
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        return Detections(boxes.astype(np.float32), scores.astype(np.float32), class_ids)
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_backend(name: str, model_path: str, precision: str = "fp32") -> InferenceBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    if precision == "int8" and name != OnnxBackend.name:
+        # Torch không có int8 hiệu quả cho YOLO trên CPU: dùng model ONNX đã lượng tử hoá
+        logger.info("int8 precision runs on the onnx backend")
+        name = OnnxBackend.name
+    return BACKENDS[name](model_path, precision=precision)
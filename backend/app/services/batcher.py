@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.metrics import REGISTRY, Histogram
+from app.services.inference_executor import InferenceBusyError
+
+logger = logging.getLogger(__name__)
+
+BatchFn = Callable[[List[Any]], List[Any]]
+Runner = Callable[[BatchFn, List[Any]], Awaitable[List[Any]]]
+
+
+async def _run_in_default_executor(fn: BatchFn, items: List[Any]) -> List[Any]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, fn, items)
+
+
+class MicroBatcher:
+    """
+    Collect concurrent inference requests into small batches.
+
+    Callers ``await submit(item)``; a background task waits up to ``max_wait_ms``
+    after the first pending item (or until ``max_batch_size`` items are queued),
+    calls ``batch_fn`` once with the whole list and resolves every caller with
+    its own element of the returned list.
+
+    Up to ``max_concurrency`` batches run at once; while all are busy new items
+    keep accumulating, so batches grow under load. When ``max_queue`` items are
+    already waiting, ``submit`` raises InferenceBusyError instead of queueing.
+    """
+
+    def __init__(
+            self,
+            batch_fn: BatchFn,
+            max_batch_size: int = 16,
+            max_wait_ms: float = 10.0,
+            runner: Optional[Runner] = None,
+            max_concurrency: int = 1,
+            max_queue: int = 0,
+            name: str = "inference",
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.runner = runner or _run_in_default_executor
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue  # 0 = không giới hạn
+        self.name = name
+
+        self.batch_size_histogram = REGISTRY.register(Histogram(
+            f"{name}_batch_size",
+            "Number of items per executed batch",
+            [1, 2, 4, 8, 16, 32, 64],
+        ))
+        self.queue_wait_histogram = REGISTRY.register(Histogram(
+            f"{name}_batch_queue_wait_seconds",
+            "Time an item waited in the batch queue before its batch started",
+            [0.001, 0.0025, 0.005, 0.01, 0.015, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
+        ))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight = set()
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue one item and wait for its result.
+        """
+        self._ensure_worker()
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            raise InferenceBusyError("Batch queue is full")
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Lấy ngay những item đã có sẵn trong queue
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+            except asyncio.CancelledError:
+                # Batcher đóng giữa lúc gom batch: trả item về queue để close() báo lỗi cho caller
+                for entry in batch:
+                    self._queue.put_nowait(entry)
+                raise
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            # Chờ có slot trống trước khi gom batch để batch lớn dần khi tải cao
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.ensure_future(self._execute(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._on_batch_done)
+
+    def _on_batch_done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        self._slots.release()
+
+    async def _execute(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        items = []
+        for item, future, enqueued in batch:
+            self.queue_wait_histogram.observe(started - enqueued)
+            items.append(item)
+        self.batch_size_histogram.observe(len(items))
+
+        try:
+            results = await self.runner(self.batch_fn, items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"batch_fn returned {len(results)} results for {len(items)} items"
+                )
+        except BaseException as e:
+            # CancelledError (pool bị shutdown, batcher đóng) không phải Exception nhưng
+            # vẫn phải trả lỗi cho mọi caller, nếu không request treo mãi
+            if isinstance(e, Exception):
+                logger.exception("Batch of %d items failed", len(items))
+                error = e
+            else:
+                logger.warning("Batch of %d items was interrupted: %r", len(items), e)
+                error = RuntimeError(f"Inference batch was interrupted: {e!r}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            # Client có thể đã huỷ (ví dụ websocket đóng) trong lúc chờ
+            if not future.done():
+                future.set_result(result)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_concurrency": self.max_concurrency,
+            "batches_in_flight": len(self._inflight),
+            "queue_depth": self.queue_depth,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+            "queue_wait_p99_seconds": self.queue_wait_histogram.quantile(0.99),
+        }
+
+    async def close(self) -> None:
+        """
+        Stop the background task and fail every item still waiting in the queue
+        with ModelNotReadyError, so callers get an answer instead of hanging.
+        """
+        from app.services.inference import ModelNotReadyError  # import muộn: inference import batcher
+
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(ModelNotReadyError("Inference is shutting down"))
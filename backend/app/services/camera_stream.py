@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Optional
+
+
+class LatestFrameSlot:
+    """
+    Single-slot mailbox with "latest frame wins" semantics.
+
+    ``put`` never blocks: a frame that was not picked up yet is replaced by the
+    newer one (and counted as dropped), so the consumer always works on the
+    freshest frame and latency can't build up behind a fast sender.
+    """
+
+    def __init__(self):
+        self._item: Optional[Any] = None
+        self._has_item = False
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item: Any) -> bool:
+        """
+        Store ``item``; return True if it replaced a frame that was never processed.
+        """
+        replaced = self._has_item
+        if replaced:
+            self.dropped += 1
+        self._item = item
+        self._has_item = True
+        self._event.set()
+        return replaced
+
+    async def get(self) -> Any:
+        while not self._has_item:
+            self._event.clear()
+            await self._event.wait()
+        item = self._item
+        self._item = None
+        self._has_item = False
+        self._event.clear()
+        return item
+
+
+class FpsAdvisor:
+    """
+    Suggest a client send rate from the observed per-frame processing time (EMA).
+    """
+
+    def __init__(self, max_fps: float = 30.0, min_fps: float = 1.0, alpha: float = 0.2):
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+
+    def observe(self, seconds: float) -> None:
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = self.alpha * seconds + (1 - self.alpha) * self.latency
+
+    @property
+    def fps(self) -> float:
+        if not self.latency:
+            return self.max_fps
+        return round(max(self.min_fps, min(self.max_fps, 1.0 / self.latency)), 1)
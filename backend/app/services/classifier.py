@@ -1,65 +1,176 @@
-import torch
+import cv2
 import numpy as np
 from PIL import Image
-from typing import Dict, Union, List
-from .utils import preprocess_image  # Bạn cần đảm bảo hàm này trả về ảnh định dạng phù hợp (PIL hoặc ndarray)
-from ultralytics import YOLO
+from typing import Dict, Optional, Union, List, Tuple
+from .utils import preprocess_image_scaled, decode_image, resize_to_model
+from .backends import Detections, InferenceBackend, create_backend, to_bgr_array
+from .detection import DetectOptions, format_detections
+from .profiles import InferenceProfile, UnknownProfileError, enabled_profile_names, get_profile
+from .tiling import detect_tiled
+from app.core.config import settings
+from app.core.metrics import INFERENCE_STAGE_SECONDS
+from app.core.logger import log_sampled
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+_PREPARE_SECONDS = INFERENCE_STAGE_SECONDS.labels(stage="prepare_input")
+_FORMAT_SECONDS = INFERENCE_STAGE_SECONDS.labels(stage="format")
+
 
 class Classifier:
-    def __init__(self, model_path='models/best.pt'):
+    def __init__(self, model_path='models/best.pt', backend: Optional[str] = None,
+                 profiles: Optional[List[str]] = None):
         """
-        Initialize classifier with YOLOv8 model.
+        Initialize classifier with a YOLO model on the configured inference backend
+        (``settings.INFERENCE_BACKEND``: "torch" or "onnx").
+
+        ``profiles`` lists the inference profiles to serve (first = default);
+        by default the ones enabled in settings. One backend is loaded per
+        precision those profiles need.
         """
+        backend = backend or settings.INFERENCE_BACKEND
         try:
+            if profiles is None:
+                self.profiles = {name: get_profile(name) for name in enabled_profile_names()}
+            else:
+                self.profiles = {name: get_profile(name, enabled_only=False) for name in profiles}
+            self.default_profile = next(iter(self.profiles.values()))
+
             # Get the absolute path to the model file
             current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
             model_path = os.path.join(current_dir, model_path)
-            print(f"Loading model from: {model_path}")
-            self.model = YOLO(model_path)
+            logger.info("Loading model from %s", model_path, extra={"backend": backend})
+            self.backends: Dict[str, InferenceBackend] = {}
+            for profile in self.profiles.values():
+                if profile.precision not in self.backends:
+                    self.backends[profile.precision] = create_backend(backend, model_path, profile.precision)
+            self.backend = self.backends[self.default_profile.precision]
+            # Định danh phiên bản model (đổi file weights hoặc backend => cache kết quả bị xoá)
+            stat = os.stat(model_path)
+            self.version = f"{backend}:{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
         except Exception as e:
-            print(f"Failed to load model: {e}")
+            logger.exception("Failed to load model")
             raise e
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model.to(self.device)
 
-    def predict_image(self, image: Union[bytes, str, Image.Image]) -> Dict[str, Union[str, float, List[int]]]:
+    def get_profile(self, name: Optional[str] = None) -> InferenceProfile:
         """
-        Predict classification for a single image.
+        Resolve one of the loaded profiles (None = default).
         """
-        try:
-            processed_image = preprocess_image(image)
-            results = self.model(processed_image)
-            result = results[0]
-
-            if not result.boxes or len(result.boxes.cls) == 0:
-                print("Không phát hiện đối tượng.")
-                return {
-                    "classification": "Không xác định",
-                    "confidence": 0.0,
-                    "bounding_box": []
-                }
+        if name is None:
+            return self.default_profile
+        if name not in self.profiles:
+            raise UnknownProfileError(f"Unknown inference profile '{name}', available: {list(self.profiles)}")
+        return self.profiles[name]
 
-            # Lấy box có độ tin cậy cao nhất
-            best_idx = result.boxes.conf.argmax()
-            cls_id = int(result.boxes.cls[best_idx])
-            confidence = float(result.boxes.conf[best_idx])
-            box = result.boxes.xyxy[best_idx].tolist()  # [x1, y1, x2, y2]
+    @property
+    def names(self) -> Dict[int, str]:
+        return self.backend.names
 
-            class_name = self.model.names[cls_id]
+    @property
+    def class_names(self) -> List[str]:
+        """
+        Class names ordered by class id.
+        """
+        return [self.names[i] for i in sorted(self.names)]
 
-            output = {
-                "classification": class_name,
-                "confidence": round(confidence * 100, 2),  # %
-                "bounding_box": [int(round(x)) for x in box]
+    def share_memory(self) -> None:
+        """
+        Prepare the loaded weights to be shared with forked worker processes.
+        """
+        for backend in self.backends.values():
+            backend.share_memory()
+
+    def _infer(self, images: List[Union[np.ndarray, Image.Image]], profile: InferenceProfile,
+               options: Optional[DetectOptions] = None) -> List[Detections]:
+        options = options or DetectOptions()
+        return self.backends[profile.precision].predict(
+            images,
+            imgsz=profile.imgsz,
+            conf=options.conf if options.conf is not None else profile.conf,
+            iou=options.iou if options.iou is not None else settings.MODEL_IOU,
+            max_det=options.max_det or settings.MODEL_MAX_DET,
+            classes=options.classes,
+        )
+
+    def _format_result(self, detections: Detections, scale: float = 1.0,
+                       options: Optional[DetectOptions] = None) -> Dict[str, Union[str, float, List[int]]]:
+        """
+        Convert one image's detections into the response dict (highest-confidence box,
+        plus every box under ``detections`` when ``options.layout`` is set).
+
+        ``scale`` is the resize factor applied before inference; boxes are divided
+        by it so they refer to the image the caller passed in.
+        """
+        with _FORMAT_SECONDS.time():
+            output = self._format_best(detections, scale)
+            if options is not None and options.layout is not None:
+                output["detections"] = format_detections(detections, self.names, scale, options.layout)
+            return output
+
+    def _format_best(self, detections: Detections, scale: float) -> Dict[str, Union[str, float, List[int]]]:
+        if len(detections) == 0:
+            return {
+                "classification": "Không xác định",
+                "confidence": 0.0,
+                "bounding_box": []
             }
 
-            print(f"[predict_image] Kết quả: {output}")
+        # Lấy box có độ tin cậy cao nhất
+        best_idx = int(detections.scores.argmax())
+        cls_id = int(detections.class_ids[best_idx])
+        confidence = float(detections.scores[best_idx])
+        box = detections.boxes[best_idx].tolist()  # [x1, y1, x2, y2]
+
+        class_name = self.names[cls_id]
+
+        return {
+            "classification": class_name,
+            "class_id": cls_id,
+            "confidence": round(confidence * 100, 2),  # %
+            "bounding_box": [int(round(x / scale)) for x in box]
+        }
+
+    def _prepare_input(self, image: Union[bytes, str, Image.Image, np.ndarray],
+                       imgsz: int = 640) -> Tuple[Union[np.ndarray, Image.Image], float]:
+        """
+        Prepare one input for the model and return it with its resize scale.
+
+        Fast path: bytes are decoded once with OpenCV and ndarrays (BGR, as produced
+        by cv2) are resized once to the model input size, then passed to the model
+        as-is. Anything else, or bytes OpenCV can't decode, goes through the PIL
+        ``preprocess_image`` fallback.
+        """
+        with _PREPARE_SECONDS.time():
+            if settings.FAST_PREPROCESS:
+                array = image if isinstance(image, np.ndarray) else None
+                if isinstance(image, (bytes, bytearray)):
+                    array = decode_image(bytes(image))
+                if array is not None:
+                    return resize_to_model(array, imgsz)
+            elif isinstance(image, np.ndarray):
+                # ndarray từ OpenCV là BGR, PIL cần RGB
+                image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            return preprocess_image_scaled(image, imgsz)
+
+    def predict_image(self, image: Union[bytes, str, Image.Image], profile: Optional[str] = None,
+                      options: Optional[DetectOptions] = None) -> Dict[str, Union[str, float, List[int]]]:
+        """
+        Predict classification for a single image.
+        """
+        profile = self.get_profile(profile)
+        try:
+            processed_image, scale = self._prepare_input(image, profile.imgsz)
+            results = self._infer([processed_image], profile, options)
+            output = self._format_result(results[0], scale, options)
+
+            log_sampled(logger, "predict_image", logging.DEBUG, "predict_image result",
+                        classification=output["classification"], confidence=output["confidence"])
             return output
 
         except Exception as e:
-            print(f"[predict_image] Lỗi: {str(e)}")
+            log_sampled(logger, "predict_image.error", logging.WARNING, "predict_image failed: %s", e)
             return {
                 "classification": "Error",
                 "confidence": 0.0,
@@ -67,42 +178,23 @@ class Classifier:
                 "error": str(e)
             }
 
-    def predict_frame(self, frame: np.ndarray) -> Dict[str, Union[str, float, List[int]]]:
+    def predict_frame(self, frame: np.ndarray, profile: Optional[str] = None,
+                      options: Optional[DetectOptions] = None) -> Dict[str, Union[str, float, List[int]]]:
         """
-        Predict classification for a video frame (ndarray).
+        Predict classification for a video frame (BGR ndarray, as decoded by OpenCV).
         """
+        profile = self.get_profile(profile)
         try:
-            image = Image.fromarray(frame)
-            results = self.model(image)
-            result = results[0]
-
-            if not result.boxes or len(result.boxes.cls) == 0:
-                print("Không phát hiện đối tượng.")
-                return {
-                    "classification": "Không xác định",
-                    "confidence": 0.0,
-                    "bounding_box": []
-                }
-
-            # Lấy box có độ tin cậy cao nhất
-            best_idx = result.boxes.conf.argmax()
-            cls_id = int(result.boxes.cls[best_idx])
-            confidence = float(result.boxes.conf[best_idx])
-            box = result.boxes.xyxy[best_idx].tolist()
-
-            class_name = self.model.names[cls_id]
+            processed_frame, scale = self._prepare_input(frame, profile.imgsz)
+            results = self._infer([processed_frame], profile, options)
+            output = self._format_result(results[0], scale, options)
 
-            output = {
-                "classification": class_name,
-                "confidence": round(confidence * 100, 2),  # %
-                "bounding_box": [int(round(x)) for x in box]
-            }
-
-            print(f"[predict_frame] Kết quả: {output}")
+            log_sampled(logger, "predict_frame", logging.DEBUG, "predict_frame result",
+                        classification=output["classification"], confidence=output["confidence"])
             return output
 
         except Exception as e:
-            print(f"[predict_frame] Lỗi: {e}")
+            log_sampled(logger, "predict_frame.error", logging.WARNING, "predict_frame failed: %s", e)
             return {
                 "classification": "Error",
                 "confidence": 0.0,
@@ -110,38 +202,94 @@ class Classifier:
                 "error": str(e)
             }
 
-    def batch_predict(self, images: List[Union[bytes, str, Image.Image]]) -> List[Dict[str, Union[str, float]]]:
+    def predict_tiled(self, image: Union[bytes, Image.Image, np.ndarray], profile: Optional[str] = None,
+                      options: Optional[DetectOptions] = None, tile_size: Optional[int] = None,
+                      overlap: Optional[float] = None) -> Dict[str, Union[str, float, List[int]]]:
         """
-        Predict multiple images.
+        Predict a high-resolution image tile by tile (see ``tiling.detect_tiled``);
+        same result dict as predict_image plus ``tiles``, the number of tiles run.
         """
+        profile = self.get_profile(profile)
         try:
-            processed_images = [preprocess_image(img) for img in images]
+            frame = decode_image(bytes(image)) if isinstance(image, (bytes, bytearray)) else to_bgr_array(image)
+            if frame is None:
+                raise ValueError("Cannot decode image")
+            detections, tiles = detect_tiled(
+                lambda tiles: self._infer(tiles, profile, options), frame, tile_size, overlap,
+                max_det=(options.max_det if options is not None else None) or settings.MODEL_MAX_DET,
+            )
+            output = self._format_result(detections, 1.0, options)
+            output["tiles"] = tiles
 
-            results = self.model(processed_images)
-            outputs = []
+            log_sampled(logger, "predict_tiled", logging.DEBUG, "predict_tiled result",
+                        classification=output["classification"], confidence=output["confidence"], tiles=tiles)
+            return output
 
-            for result in results:
-                if not result.boxes or len(result.boxes.cls) == 0:
-                    outputs.append({"classification": "Không xác định", "confidence": 0.0})
-                    continue
+        except Exception as e:
+            log_sampled(logger, "predict_tiled.error", logging.WARNING, "predict_tiled failed: %s", e)
+            return {
+                "classification": "Error",
+                "confidence": 0.0,
+                "bounding_box": [],
+                "error": str(e)
+            }
 
-                cls_id = int(result.boxes.cls[0])
-                confidence = float(result.boxes.conf[0])
-                class_name = self.model.names[cls_id]
+    def predict_batch(self, images: List[Union[bytes, str, Image.Image, np.ndarray]],
+                      profile: Optional[str] = None,
+                      options: Optional[DetectOptions] = None) -> List[Dict[str, Union[str, float, List[int]]]]:
+        """
+        Run a single batched forward pass and return one predict_image-style dict per input.
 
-                output = {
-                    "classification": class_name,
-                    "confidence": round(confidence, 2)
+        Inputs that fail to preprocess get an error dict without failing the whole batch.
+        """
+        profile = self.get_profile(profile)
+        outputs: List[Dict] = [None] * len(images)
+        prepared = []
+        scales = []
+        positions = []
+        for i, image in enumerate(images):
+            try:
+                processed_image, scale = self._prepare_input(image, profile.imgsz)
+                prepared.append(processed_image)
+                scales.append(scale)
+                positions.append(i)
+            except Exception as e:
+                outputs[i] = {
+                    "classification": "Error",
+                    "confidence": 0.0,
+                    "bounding_box": [],
+                    "error": str(e)
                 }
-                outputs.append(output)
-                print(f"[batch_predict] Kết quả: {output}")
 
-            return outputs
+        if prepared:
+            try:
+                results = self._infer(prepared, profile, options)
+                for i, result, scale in zip(positions, results, scales):
+                    outputs[i] = self._format_result(result, scale, options)
+            except Exception as e:
+                log_sampled(logger, "predict_batch.error", logging.WARNING, "predict_batch failed: %s", e)
+                for i in positions:
+                    outputs[i] = {
+                        "classification": "Error",
+                        "confidence": 0.0,
+                        "bounding_box": [],
+                        "error": str(e)
+                    }
 
-        except Exception as e:
-            print(f"[batch_predict] Lỗi: {e}")
-            return [{
-                "classification": "Error",
-                "confidence": 0.0,
-                "error": str(e)
-            }]
+        log_sampled(logger, "predict_batch", logging.DEBUG, "predict_batch done", batch_size=len(images))
+        return outputs
+
+    def batch_predict(self, images: List[Union[bytes, str, Image.Image, np.ndarray]],
+                      profile: Optional[str] = None,
+                      chunk_size: Optional[int] = None,
+                      options: Optional[DetectOptions] = None) -> List[Dict[str, Union[str, float, List[int]]]]:
+        """
+        Predict any number of images, ``chunk_size`` (default BATCH_MAX_SIZE) per forward pass.
+
+        Returns one predict_image-style dict per input, in order.
+        """
+        chunk_size = max(1, chunk_size or settings.BATCH_MAX_SIZE)
+        outputs = []
+        for start in range(0, len(images), chunk_size):
+            outputs += self.predict_batch(images[start:start + chunk_size], profile, options)
+        return outputs
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.backends import Detections
+
+LAYOUTS = ("arrays", "objects")
+
+
+@dataclass(frozen=True)
+class DetectOptions:
+    """
+    Per-request detection parameters (None = the profile / settings default).
+
+    ``conf``, ``iou``, ``max_det`` and ``classes`` are passed to the model, so
+    filtered-out classes and low-confidence boxes never reach NMS. With
+    ``layout`` set, every box is returned under ``detections`` ("arrays":
+    parallel lists, "objects": one dict per box), not only the best one.
+    """
+    conf: Optional[float] = None
+    iou: Optional[float] = None
+    max_det: Optional[int] = None
+    classes: Optional[Tuple[int, ...]] = None
+    layout: Optional[str] = None
+
+    def __post_init__(self):
+        if self.layout is not None and self.layout not in LAYOUTS:
+            raise ValueError(f"Unknown detections layout '{self.layout}', expected one of {LAYOUTS}")
+
+    @property
+    def key(self) -> str:
+        # Dùng trong khoá cache kết quả
+        return f"{self.conf}:{self.iou}:{self.max_det}:{self.classes}:{self.layout}"
+
+
+def resolve_classes(values: Optional[Iterable[str]], class_names: List[str]) -> Optional[Tuple[int, ...]]:
+    """
+    Class ids for ``values`` given as names or ids; ValueError for unknown ones.
+    """
+    if not values:
+        return None
+    ids = set()
+    for value in values:
+        for item in str(value).split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if item in class_names:
+                ids.add(class_names.index(item))
+            elif item.isdigit() and int(item) < len(class_names):
+                ids.add(int(item))
+            else:
+                raise ValueError(f"Unknown class '{item}', available: {class_names}")
+    return tuple(sorted(ids)) or None
+
+
+def format_detections(detections: Detections, names: Dict[int, str], scale: float = 1.0,
+                      layout: str = "arrays") -> Dict[str, Any]:
+    """
+    Every box of one image, highest confidence first, boxes divided by ``scale``
+    (back to the caller's image coordinates).
+
+    Conversion is done on whole arrays: one rounding/cast per column and a
+    single ``tolist`` each, instead of per-element indexing.
+    """
+    order = np.argsort(-detections.scores, kind="stable")
+    boxes = np.rint(detections.boxes[order] / scale).astype(np.int32).tolist()
+    confidences = np.round(detections.scores[order].astype(np.float64) * 100, 2).tolist()
+    class_ids = detections.class_ids[order].tolist()
+    if layout == "objects":
+        return {
+            "count": len(class_ids),
+            "boxes": [
+                {"classification": names[cls_id], "class_id": cls_id, "confidence": confidence, "bounding_box": box}
+                for cls_id, confidence, box in zip(class_ids, confidences, boxes)
+            ],
+        }
+    return {
+        "count": len(class_ids),
+        "names": {cls_id: names[cls_id] for cls_id in sorted(set(class_ids))},
+        "class_ids": class_ids,
+        "confidences": confidences,
+        "boxes": boxes,
+    }
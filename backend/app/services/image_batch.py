@@ -0,0 +1,109 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from .utils import decode_image
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+@dataclass
+class BatchItem:
+    """
+    One image of a bulk upload: its name (``archive.zip/dir/a.jpg`` for zip
+    entries), the decoded BGR frame, or the reason it could not be used.
+    """
+    index: int
+    filename: str
+    frame: Optional[np.ndarray] = None
+    error: Optional[str] = None
+
+
+def _is_image_name(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _read_limited(fileobj: BinaryIO, max_bytes: int) -> Optional[bytes]:
+    data = fileobj.read(max_bytes + 1)
+    return None if len(data) > max_bytes else data
+
+
+def iter_upload_images(uploads: Iterable[Tuple[str, BinaryIO]],
+                       max_bytes: Optional[int] = None) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """
+    Yield ``(filename, bytes, error)`` for every image in the uploads, lazily.
+
+    Each upload is a ``(filename, file object)`` pair; zip archives are
+    expanded entry by entry (non-image entries and macOS metadata skipped), so
+    only one image is held in memory at a time. Files larger than ``max_bytes``
+    yield ``(filename, None, error)``.
+    """
+    max_bytes = max_bytes or settings.ANALYZE_BATCH_MAX_IMAGE_BYTES
+    for filename, fileobj in uploads:
+        fileobj.seek(0)
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    if info.is_dir() or name.startswith("__MACOSX/") or not _is_image_name(name):
+                        continue
+                    label = f"{filename}/{name}"
+                    # Kiểm tra kích thước khai báo trước khi giải nén (chống zip bomb)
+                    if info.file_size > max_bytes:
+                        yield label, None, "File too large"
+                        continue
+                    with archive.open(info) as entry:
+                        data = _read_limited(entry, max_bytes)
+                    yield (label, data, None) if data is not None else (label, None, "File too large")
+            continue
+        fileobj.seek(0)
+        data = _read_limited(fileobj, max_bytes)
+        yield (filename, data, None) if data is not None else (filename, None, "File too large")
+
+
+class ChunkReader:
+    """
+    Reads an upload iterator in chunks and decodes each chunk in parallel.
+
+    ``read_chunk`` is blocking (file I/O + OpenCV decode, both release the
+    GIL): call it from a worker thread. Not thread-safe; call it sequentially.
+    """
+
+    def __init__(self, images: Iterator[Tuple[str, Optional[bytes], Optional[str]]],
+                 chunk_size: int, max_images: Optional[int] = None, workers: Optional[int] = None):
+        self.images = images
+        self.chunk_size = max(1, chunk_size)
+        self.max_images = max_images or settings.ANALYZE_BATCH_MAX_IMAGES
+        self.count = 0
+        self.truncated = False
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers or settings.ANALYZE_BATCH_DECODE_WORKERS), thread_name_prefix="decode",
+        )
+
+    def read_chunk(self) -> List[BatchItem]:
+        raw = []
+        for filename, data, error in self.images:
+            if self.count >= self.max_images:
+                self.truncated = True
+                break
+            raw.append((self.count, filename, data, error))
+            self.count += 1
+            if len(raw) >= self.chunk_size:
+                break
+        frames = self._pool.map(lambda item: decode_image(item[2]) if item[2] else None, raw)
+
+        chunk = []
+        for (index, filename, data, error), frame in zip(raw, frames):
+            if error is None and frame is None:
+                error = "Cannot decode image"
+            chunk.append(BatchItem(index, filename, frame, error))
+        return chunk
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,280 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY, Gauge
+from app.services.batcher import MicroBatcher
+from app.services.detection import DetectOptions
+from app.services.inference_executor import InferenceExecutor, process_predict_batch, process_predict_tiled
+from app.services.profiles import UnknownProfileError
+from app.services.result_cache import ResultCache, content_hash, perceptual_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotReadyError(RuntimeError):
+    """
+    Raised when inference is requested before the model finished loading and warming up.
+    """
+
+
+class InferenceService:
+    """
+    Owns the classifier, the inference executor and the micro-batchers (one per
+    inference profile, so a batch never mixes input sizes or precisions).
+
+    Nothing is loaded at import time: ``start()`` is called from the FastAPI
+    lifespan, loads the model in a background thread, runs one warm-up inference
+    per worker and only then reports ready.
+    """
+
+    def __init__(self, classifier_factory: Optional[Callable[[], Any]] = None):
+        self.classifier_factory = classifier_factory
+        self.classifier = None
+        self.executor: Optional[InferenceExecutor] = None
+        self.batcher: Optional[MicroBatcher] = None  # batcher của profile mặc định
+        self.batchers: Dict[str, MicroBatcher] = {}
+        self.batch_fn: Optional[Callable] = None
+        self.state = "not_started"  # not_started -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.cache = ResultCache(
+            max_entries=settings.RESULT_CACHE_SIZE,
+            ttl_seconds=settings.RESULT_CACHE_TTL,
+            phash_distance=settings.RESULT_CACHE_PHASH_DISTANCE,
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def _create_classifier(self):
+        if self.classifier_factory is not None:
+            return self.classifier_factory()
+        # Import muộn để việc import app không phải kéo theo ultralytics
+        from app.services.classifier import Classifier
+        return Classifier()
+
+    def _load(self) -> None:
+        self.classifier = self._create_classifier()
+        self.executor = InferenceExecutor(
+            kind=settings.INFERENCE_EXECUTOR,
+            max_workers=settings.INFERENCE_WORKERS,
+            max_queue=settings.INFERENCE_QUEUE_SIZE,
+            classifier=self.classifier,
+            threads_per_worker=settings.INFERENCE_THREADS_PER_WORKER,
+            pin_cpus=settings.INFERENCE_PIN_CPUS,
+        )
+        if settings.INFERENCE_EXECUTOR == "process":
+            # Fork các worker ngay sau khi load model, trước khi có request nào
+            self.executor.start()
+            # Ở chế độ process, model nằm trong các process worker nên phải dùng hàm picklable
+            self.batch_fn = process_predict_batch
+        else:
+            self.batch_fn = self.classifier.predict_batch
+        self.cache.set_version(getattr(self.classifier, "version", "unknown"))
+        self.batcher = self._create_batcher(self.default_profile)
+        self.batchers = {self.default_profile: self.batcher}
+
+    @property
+    def profile_names(self) -> List[str]:
+        """
+        Profiles served by the loaded classifier, the default first.
+        """
+        profiles = getattr(self.classifier, "profiles", None)
+        return list(profiles) if profiles else ["default"]
+
+    @property
+    def default_profile(self) -> str:
+        return self.profile_names[0]
+
+    def resolve_profile(self, profile: Optional[str]) -> str:
+        """
+        Name of the profile to use (None = default); UnknownProfileError if not served.
+        """
+        if profile is None:
+            return self.default_profile
+        if profile not in self.profile_names:
+            raise UnknownProfileError(f"Unknown inference profile '{profile}', available: {self.profile_names}")
+        return profile
+
+    def _batch_fn_for(self, profile: str, options: Optional[DetectOptions] = None) -> Callable:
+        if options is not None:
+            return functools.partial(self.batch_fn, profile=profile, options=options)
+        if profile == self.default_profile:
+            return self.batch_fn
+        # partial của hàm module-level vẫn picklable cho chế độ process
+        return functools.partial(self.batch_fn, profile=profile)
+
+    def _create_batcher(self, profile: str) -> MicroBatcher:
+        return MicroBatcher(
+            self._batch_fn_for(profile),
+            max_batch_size=settings.BATCH_MAX_SIZE,
+            max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+            runner=self.executor.run,
+            max_concurrency=settings.INFERENCE_WORKERS,
+            max_queue=settings.INFERENCE_QUEUE_SIZE,
+            name="inference" if profile == self.default_profile else f"inference_{profile}",
+        )
+
+    def _batcher_for(self, profile: str) -> MicroBatcher:
+        if profile not in self.batchers:
+            self.batchers[profile] = self._create_batcher(profile)
+        return self.batchers[profile]
+
+    async def _warm_up(self) -> None:
+        frame = np.zeros((640, 640, 3), dtype=np.uint8)
+        # Mỗi worker chạy ít nhất một lần với mỗi profile để khởi tạo predictor trước khi nhận traffic
+        results = []
+        for profile in self.profile_names:
+            results += await asyncio.gather(*(
+                self.executor.run(self._batch_fn_for(profile), [frame]) for _ in range(self.executor.max_workers)
+            ))
+        for result in results:
+            if "error" in result[0]:
+                raise RuntimeError(f"Warm-up inference failed: {result[0]['error']}")
+
+    async def start(self, started_at: Optional[float] = None) -> None:
+        """
+        Load and warm up the model; ``started_at`` (perf_counter) marks process start
+        so the reported cold start covers imports too.
+        """
+        self.state = "loading"
+        t0 = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._load)
+            t1 = time.perf_counter()
+            await self._warm_up()
+            t2 = time.perf_counter()
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.exception("Model startup failed")
+            return
+
+        self.timings = {
+            "model_load_seconds": round(t1 - t0, 3),
+            "warmup_seconds": round(t2 - t1, 3),
+            "cold_start_seconds": round(t2 - (started_at if started_at is not None else t0), 3),
+        }
+        self.state = "ready"
+        logger.info("Model ready: %s", self.timings)
+
+    async def predict(self, image, profile: Optional[str] = None,
+                      options: Optional[DetectOptions] = None) -> Dict[str, Any]:
+        """
+        Classify one image/frame off the event loop, through the micro-batcher when enabled.
+
+        Requests with their own detection ``options`` skip the micro-batcher (a
+        batch runs with one set of NMS parameters) and go to the executor directly.
+
+        Raises ModelNotReadyError before startup finished, UnknownProfileError for
+        a profile this deployment doesn't serve and InferenceBusyError when the
+        inference queue is full.
+        """
+        if not self.ready:
+            raise ModelNotReadyError(f"Model is {self.state}")
+        profile = self.resolve_profile(profile)
+        if options is not None:
+            return (await self.executor.run(self._batch_fn_for(profile, options), [image]))[0]
+        if settings.BATCHING_ENABLED:
+            return await self._batcher_for(profile).submit(image)
+        results = await self.executor.run(self._batch_fn_for(profile), [image])
+        return results[0]
+
+    async def predict_image(self, data: bytes, image: Optional[np.ndarray] = None,
+                            profile: Optional[str] = None, options: Optional[DetectOptions] = None) -> Dict[str, Any]:
+        """
+        Classify uploaded image bytes, answering repeated (or, with perceptual
+        hashing, near-identical) images from the result cache.
+
+        ``image`` is the already decoded BGR array if the caller has one; it is
+        used as the model input and for the perceptual hash.
+        """
+        if not self.cache.enabled:
+            return await self.predict(image if image is not None else data, profile, options)
+        if not self.ready:
+            raise ModelNotReadyError(f"Model is {self.state}")
+
+        profile = self.resolve_profile(profile)
+        # Kết quả phụ thuộc profile (kích thước input, precision, conf) và tham số detection của request
+        scope = profile if options is None else f"{profile}:{options.key}"
+        key = f"{scope}:{content_hash(data)}"
+        phash = size = None
+        if self.cache.phash_distance > 0 and image is not None:
+            phash = perceptual_hash(image)
+            size = (image.shape[1], image.shape[0])
+        result = self.cache.get(key, phash, size, scope)
+        if result is not None:
+            return result
+
+        result = await self.predict(image if image is not None else data, profile, options)
+        self.cache.put(key, result, phash, size, scope)
+        return result
+
+    async def predict_many(self, images: List[Any], profile: Optional[str] = None,
+                           options: Optional[DetectOptions] = None) -> List[Dict[str, Any]]:
+        """
+        Classify an already-formed batch in a single executor job (no micro-batching).
+        """
+        if not self.ready:
+            raise ModelNotReadyError(f"Model is {self.state}")
+        return await self.executor.run(self._batch_fn_for(self.resolve_profile(profile), options), list(images))
+
+    async def predict_tiled(self, image, profile: Optional[str] = None, options: Optional[DetectOptions] = None,
+                            tile_size: Optional[int] = None, overlap: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Classify one high-resolution image tile by tile, as a single executor job
+        (its tiles are already batched, so it bypasses the micro-batcher).
+        """
+        if not self.ready:
+            raise ModelNotReadyError(f"Model is {self.state}")
+        profile = self.resolve_profile(profile)
+        fn = process_predict_tiled if settings.INFERENCE_EXECUTOR == "process" else self.classifier.predict_tiled
+        return await self.executor.run(
+            functools.partial(fn, profile=profile, options=options, tile_size=tile_size, overlap=overlap), image)
+
+    @property
+    def class_names(self) -> List[str]:
+        return self.classifier.class_names if self.classifier is not None else []
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Items waiting in the micro-batchers plus jobs queued or running in the executor.
+        """
+        waiting = sum(batcher.queue_depth for batcher in self.batchers.values())
+        return waiting + (self.executor.pending if self.executor is not None else 0)
+
+    def status(self) -> Dict[str, Any]:
+        status = {"status": self.state, **self.timings}
+        if self.error:
+            status["error"] = self.error
+        return status
+
+    async def shutdown(self) -> None:
+        for batcher in self.batchers.values():
+            await batcher.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+inference_service = InferenceService()
+
+REGISTRY.register(Gauge(
+    "inference_queue_depth", "Images waiting in the batch queues plus executor jobs queued or running",
+    fn=lambda: inference_service.queue_depth,
+))
+REGISTRY.register(Gauge(
+    "result_cache_entries", "Results currently held in the analyze_image result cache",
+    fn=lambda: inference_service.cache.stats()["size"],
+))
+REGISTRY.register(Gauge(
+    "inference_model_ready", "1 once the model is loaded and warmed up",
+    fn=lambda: 1.0 if inference_service.ready else 0.0,
+))
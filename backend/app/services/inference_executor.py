@@ -0,0 +1,233 @@
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBusyError(RuntimeError):
+    """
+    Raised when the inference queue is full and new work is rejected.
+    """
+
+
+# ---------------------- Hàm chạy trong process worker ----------------------
+# Với "fork", parent gán _process_classifier trước khi tạo pool nên các worker
+# thừa hưởng model đã load (copy-on-write). Nếu không fork được, mỗi worker
+# tự load model trong initializer.
+_process_classifier = None
+
+
+def _configure_worker_threads(num_threads: int, worker_counter, pin_cpus: bool) -> None:
+    """
+    Pin torch intra-op threads (and optionally CPU affinity) for this worker.
+    """
+    import torch
+    torch.set_num_threads(num_threads)
+
+    if pin_cpus and worker_counter is not None and hasattr(os, "sched_setaffinity"):
+        with worker_counter.get_lock():
+            index = worker_counter.value
+            worker_counter.value += 1
+        cpus = sorted(os.sched_getaffinity(0))
+        slots = max(1, len(cpus) // num_threads)
+        start = (index % slots) * num_threads
+        os.sched_setaffinity(0, cpus[start:start + num_threads])
+
+
+def _init_forked_worker(num_threads: int, worker_counter, pin_cpus: bool) -> None:
+    _configure_worker_threads(num_threads, worker_counter, pin_cpus)
+
+
+def _init_process_worker(model_path: str, num_threads: int, worker_counter, pin_cpus: bool) -> None:
+    global _process_classifier
+    # Process mới (spawn) chưa cấu hình logging; process fork đã được chỉnh lại ở app.core.logger
+    from app.core.logger import setup_worker_logging
+    setup_worker_logging()
+    _configure_worker_threads(num_threads, worker_counter, pin_cpus)
+    from app.services.classifier import Classifier
+    _process_classifier = Classifier(model_path)
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+def process_predict_batch(images: List[Any], profile: Optional[str] = None, options=None) -> List[Dict[str, Any]]:
+    """
+    Module-level (picklable) entry point used when INFERENCE_EXECUTOR=process.
+    """
+    if options is not None:
+        return _process_classifier.predict_batch(images, profile, options)
+    if profile is None:
+        return _process_classifier.predict_batch(images)
+    return _process_classifier.predict_batch(images, profile)
+
+
+def process_predict_tiled(image: Any, profile: Optional[str] = None, options=None,
+                          tile_size: Optional[int] = None, overlap: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Picklable entry point for tiled inference when INFERENCE_EXECUTOR=process.
+    """
+    return _process_classifier.predict_tiled(image, profile, options, tile_size, overlap)
+
+
+class InferenceExecutor:
+    """
+    Dedicated pool for model inference, separate from FastAPI's default threadpool.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more may wait;
+    anything beyond that is rejected immediately with InferenceBusyError so callers
+    can answer 503 instead of piling up work.
+
+    In ``process`` mode the pool is supervised: if a worker dies the pool is
+    re-forked from the parent (which still holds the model) and the job is retried once.
+    """
+
+    def __init__(
+            self,
+            kind: str = "thread",
+            max_workers: int = 1,
+            max_queue: int = 64,
+            model_path: str = "models/best.pt",
+            classifier=None,
+            threads_per_worker: int = 0,
+            pin_cpus: bool = False,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.model_path = model_path
+        self.classifier = classifier
+        # 0 = tự chia đều số core cho các worker
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.max_workers)
+        self.pin_cpus = pin_cpus
+        self.restarts = 0
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+
+    @property
+    def uses_fork(self) -> bool:
+        return (
+            self.kind == "process"
+            and self.classifier is not None
+            and "fork" in multiprocessing.get_all_start_methods()
+        )
+
+    def _create_pool(self) -> Executor:
+        if self.kind == "thread":
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+
+        worker_counter = multiprocessing.Value("i", 0) if self.pin_cpus else None
+        if self.uses_fork:
+            global _process_classifier
+            _process_classifier = self.classifier
+            self.classifier.share_memory()
+            # Đóng băng các object hiện có để GC trong worker không chạm vào
+            # (và copy) các trang bộ nhớ của model
+            gc.collect()
+            gc.freeze()
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_forked_worker,
+                initargs=(self.threads_per_worker, worker_counter, self.pin_cpus),
+            )
+
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_process_worker,
+            initargs=(self.model_path, self.threads_per_worker, worker_counter, self.pin_cpus),
+        )
+
+    @property
+    def pool(self) -> Executor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+            return self._pool
+
+    def start(self) -> None:
+        """
+        Create the pool and start every worker eagerly (forks happen before any traffic).
+        """
+        pool = self.pool
+        if self.kind == "process":
+            pids = {f.result() for f in [pool.submit(_noop) for _ in range(self.max_workers * 2)]}
+            logger.info(
+                "Started %d inference workers (fork=%s, torch threads/worker=%d): %s",
+                self.max_workers, self.uses_fork, self.threads_per_worker, sorted(pids),
+            )
+
+    def _restart_pool(self, broken: Executor) -> None:
+        with self._pool_lock:
+            # Mọi job đang chờ trên pool hỏng đều nhận BrokenProcessPool: chỉ job đầu tiên
+            # thay pool, các job sau chạy lại luôn trên pool mới
+            if self._pool is not broken:
+                return
+            logger.error("Inference worker died, restarting process pool")
+            self._pool = None
+            self.restarts += 1
+        # Không huỷ future của các job khác: chúng tự lỗi BrokenProcessPool rồi chạy lại
+        broken.shutdown(wait=False)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise InferenceBusyError("Inference queue is full")
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run ``fn(*args)`` in the inference pool and await the result.
+        """
+        self._reserve()
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self.pool
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                self._restart_pool(pool)
+                return await loop.run_in_executor(self.pool, fn, *args)
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "threads_per_worker": self.threads_per_worker,
+            "fork": self.uses_fork,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
@@ -1,11 +1,12 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.services.token_cache import verified_claims
 from typing import Optional
 
 # Cấu hình JWT
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Thời gian hết hạn của token (tính bằng phút)
+ALGORITHM = settings.ALGORITHM
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES  # Thời gian hết hạn của token (tính bằng phút)
 
 
 # Hàm tạo access token
@@ -32,11 +33,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 # Hàm giải mã token và lấy payload
 def decode_access_token(token: str) -> dict:
     """
-    Giải mã JWT và trả về payload.
+    Giải mã JWT và trả về payload (token đã xác minh được cache tới khi hết hạn).
     """
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return verified_claims(token)
     except JWTError:
         raise JWTError("Token is invalid or expired")
 
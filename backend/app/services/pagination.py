@@ -0,0 +1,28 @@
+import base64
+import json
+from typing import Any, List
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised when a pagination cursor can't be decoded.
+    """
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Opaque cursor for keyset pagination: the sort key of the last row returned.
+    """
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int = 1) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}")
+    return values
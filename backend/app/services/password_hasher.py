@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_SECONDS = REGISTRY.register(Histogram(
+    "password_hash_seconds", "Time of one bcrypt hash or verification", labelnames=("operation",),
+))
+PASSWORD_HASH_REJECTED = REGISTRY.register(Counter(
+    "password_hash_rejected_total", "Hash/verify requests rejected because the hasher queue was full",
+))
+
+
+class PasswordHasherBusyError(RuntimeError):
+    """
+    Raised when the password hashing queue is full and new work is rejected.
+    """
+
+
+def make_context(rounds: int) -> CryptContext:
+    # min = max = rounds: hash với work factor khác cấu hình hiện tại bị coi là cần hash lại
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds,
+    )
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing/verification on a dedicated, size-limited thread pool.
+
+    bcrypt releases the GIL, so ``max_workers`` threads use up to that many
+    cores, and a burst of logins waits here instead of in FastAPI's default
+    threadpool. At most ``max_queue`` more jobs may wait; beyond that
+    PasswordHasherBusyError is raised so endpoints can answer 503.
+    """
+
+    def __init__(self, rounds: Optional[int] = None, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None):
+        self.rounds = rounds or settings.BCRYPT_ROUNDS
+        self.context = make_context(self.rounds)
+        self.max_workers = max(1, max_workers or settings.PASSWORD_HASH_WORKERS)
+        self.max_queue = max(0, max_queue if max_queue is not None else settings.PASSWORD_HASH_QUEUE_SIZE)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._pool
+
+    def _timed(self, operation: str, fn: Callable, *args) -> Any:
+        with PASSWORD_HASH_SECONDS.labels(operation=operation).time():
+            return fn(*args)
+
+    async def _run(self, operation: str, fn: Callable, *args) -> Any:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                PASSWORD_HASH_REJECTED.inc()
+                raise PasswordHasherBusyError("Password hashing queue is full")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, self._timed, operation, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    # ---------------------- Đồng bộ (script, code cũ) ----------------------
+
+    def hash_sync(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify_sync(self, password: str, hashed: str) -> bool:
+        return self.context.verify(password, hashed)
+
+    # ---------------------- Async (endpoint) ----------------------
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run("verify", self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify ``password``; when it matches a hash made with another work
+        factor (or scheme), also return the new hash to store.
+        """
+        return await self._run("verify", self.context.verify_and_update, password, hashed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+password_hasher = PasswordHasher()
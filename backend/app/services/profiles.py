@@ -0,0 +1,82 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+PRECISIONS = ("fp32", "fp16", "int8")
+
+
+class UnknownProfileError(ValueError):
+    """
+    Raised when a request names an inference profile that is not defined or not enabled.
+    """
+
+
+@dataclass(frozen=True)
+class InferenceProfile:
+    """
+    How the model is run: input size, numeric precision and confidence threshold.
+
+    ``fp16`` only applies on CUDA (the torch backend falls back to fp32 on CPU);
+    ``int8`` runs a dynamically quantized ONNX model on ONNX Runtime.
+    """
+    name: str
+    imgsz: int = 640
+    precision: str = "fp32"
+    conf: float = 0.25
+
+    def __post_init__(self):
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{self.precision}', expected one of {PRECISIONS}")
+        if self.imgsz % 32:
+            raise ValueError(f"imgsz must be a multiple of 32, got {self.imgsz}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def builtin_profiles() -> Dict[str, InferenceProfile]:
+    """
+    ``full`` is the baseline (MODEL_INPUT_SIZE / MODEL_CONF in fp32) the others are compared to.
+    """
+    return {
+        "full": InferenceProfile("full", settings.MODEL_INPUT_SIZE, "fp32", settings.MODEL_CONF),
+        "balanced": InferenceProfile("balanced", 416, "fp32", settings.MODEL_CONF),
+        "fast": InferenceProfile("fast", 320, "int8", settings.MODEL_CONF),
+    }
+
+
+def all_profiles() -> Dict[str, InferenceProfile]:
+    """
+    Built-in profiles plus the ones defined (or overridden) in INFERENCE_PROFILES.
+    """
+    profiles = builtin_profiles()
+    for name, overrides in settings.INFERENCE_PROFILES.items():
+        base = profiles.get(name, InferenceProfile(name)).to_dict()
+        base.update(overrides)
+        base["name"] = name
+        profiles[name] = InferenceProfile(**base)
+    return profiles
+
+
+def enabled_profile_names() -> List[str]:
+    """
+    Profiles this deployment serves: the default one first, then the ones
+    requests may pick with ``?profile=``.
+    """
+    names = [settings.INFERENCE_PROFILE]
+    names += [name for name in settings.INFERENCE_PROFILES_ENABLED if name not in names]
+    return names
+
+
+def get_profile(name: Optional[str] = None, enabled_only: bool = True) -> InferenceProfile:
+    """
+    Resolve a profile name (None = the deployment default).
+    """
+    name = name or settings.INFERENCE_PROFILE
+    profiles = all_profiles()
+    if name not in profiles or (enabled_only and name not in enabled_profile_names()):
+        raise UnknownProfileError(
+            f"Unknown inference profile '{name}', available: {enabled_profile_names()}"
+        )
+    return profiles[name]
@@ -0,0 +1,104 @@
+import base64
+import io
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.core.config import settings
+
+RESPONSE_MODES = ("image", "json", "jpeg", "thumbnail")
+
+
+def scale_box(bbox: List[int], factor: float) -> List[int]:
+    return [int(round(v * factor)) for v in bbox]
+
+
+def make_thumbnail(image: Union[Image.Image, np.ndarray], max_size: int) -> Tuple[Union[Image.Image, np.ndarray], float]:
+    """
+    Downscale so the longer side is at most ``max_size``; returns the image
+    (same type as given) and the factor (thumbnail / original) to map boxes onto it.
+    """
+    width, height = image.size if isinstance(image, Image.Image) else (image.shape[1], image.shape[0])
+    factor = min(1.0, max_size / max(width, height))
+    if factor >= 1.0:
+        return image, 1.0
+    size = (max(1, int(round(width * factor))), max(1, int(round(height * factor))))
+    if isinstance(image, np.ndarray):
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA), factor
+    return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0), factor
+
+
+def to_pil(image: Union[Image.Image, np.ndarray]) -> Image.Image:
+    """
+    RGB PIL image from a PIL image or a BGR ndarray (as decoded by OpenCV).
+    """
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def result_boxes(result: Dict[str, Any]) -> List[Tuple[str, float, List[int]]]:
+    """
+    (class name, confidence, box) of every box in ``result``: all of
+    ``detections`` when present (either layout), else the best box.
+    """
+    detections = result.get("detections")
+    if detections is None:
+        bbox = result.get("bounding_box") or []
+        return [(result["classification"], result["confidence"], bbox)] if len(bbox) == 4 else []
+    if "names" in detections:
+        names = detections["names"]
+        return [(names[cls_id], confidence, box) for cls_id, confidence, box in
+                zip(detections["class_ids"], detections["confidences"], detections["boxes"])]
+    return [(box["classification"], box["confidence"], box["bounding_box"]) for box in detections["boxes"]]
+
+
+def draw_result(img: Image.Image, result: Dict[str, Any], factor: float = 1.0) -> Image.Image:
+    """
+    Draw the result's boxes and labels on ``img``; ``factor`` maps the boxes
+    (given in original image coordinates) onto ``img``.
+    """
+    boxes = result_boxes(result)
+    if not boxes:
+        return img
+    draw = ImageDraw.Draw(img)
+    width = max(1, int(round(3 * min(1.0, factor * 2))))
+    for name, confidence, bbox in boxes:
+        x1, y1, x2, y2 = scale_box(bbox, factor)
+        # Vẽ rectangle
+        draw.rectangle([x1, y1, x2, y2], outline="lime", width=width)
+        # confidence đã là phần trăm
+        draw.text((x1, max(0, y1 - 20)), f"{name} ({confidence:.1f}%)", fill="lime")
+    return img
+
+
+def encode_jpeg(img: Image.Image, quality: Optional[int] = None) -> bytes:
+    buffered = io.BytesIO()
+    img.save(buffered, format="JPEG", quality=quality or settings.RESPONSE_JPEG_QUALITY)
+    return buffered.getvalue()
+
+
+def render_annotated(image: Union[Image.Image, np.ndarray], result: Dict[str, Any], max_size: Optional[int] = None,
+                     quality: Optional[int] = None) -> Tuple[bytes, Tuple[int, int]]:
+    """
+    Annotated JPEG of ``image`` (PIL or BGR ndarray). With ``max_size`` it is
+    downscaled first, so color conversion, drawing and encoding only touch the
+    small image. Returns the bytes and the size of the encoded image.
+    """
+    factor = 1.0
+    if max_size:
+        image, factor = make_thumbnail(image, max_size)
+    img = to_pil(image)
+    draw_result(img, result, factor)
+    return encode_jpeg(img, quality), img.size
+
+
+def annotate_image(img: Union[Image.Image, np.ndarray], result: Dict[str, Any], max_size: Optional[int] = None,
+                   quality: Optional[int] = None) -> str:
+    """
+    Draw the result's box and label on ``img`` and return it as a base64 JPEG.
+    """
+    data, _ = render_annotated(img, result, max_size, quality)
+    return base64.b64encode(data).decode("utf-8")
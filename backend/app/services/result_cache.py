@@ -0,0 +1,209 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.metrics import REGISTRY, Counter
+
+RESULT_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "result_cache_lookups_total", "Result cache lookups (hit, phash_hit = near-duplicate, miss)", ("outcome",),
+))
+RESULT_CACHE_REMOVALS = REGISTRY.register(Counter(
+    "result_cache_removals_total", "Entries dropped from the result cache (evicted, expired)", ("reason",),
+))
+RESULT_CACHE_INVALIDATIONS = REGISTRY.register(Counter(
+    "result_cache_invalidations_total", "Times the whole result cache was cleared (model version change)",
+))
+_HIT = RESULT_CACHE_LOOKUPS.labels(outcome="hit")
+_PHASH_HIT = RESULT_CACHE_LOOKUPS.labels(outcome="phash_hit")
+_MISS = RESULT_CACHE_LOOKUPS.labels(outcome="miss")
+_EVICTED = RESULT_CACHE_REMOVALS.labels(reason="evicted")
+_EXPIRED = RESULT_CACHE_REMOVALS.labels(reason="expired")
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Exact cache key for encoded image bytes.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def perceptual_hash(image: np.ndarray) -> int:
+    """
+    64-bit difference hash (dHash) of a BGR or grayscale image.
+
+    Near-identical photos (re-encoded, slightly resized, small noise) get hashes
+    that differ in only a few bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+Size = Tuple[int, int]  # width, height của ảnh đã tạo ra kết quả
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    scope: str
+    phash: Optional[int]
+    size: Optional[Size]
+    result: Dict[str, Any]
+
+
+def _scale_box(box, sx: float, sy: float):
+    return [int(round(v * s)) for v, s in zip(box, (sx, sy, sx, sy))]
+
+
+def rescale_result(result: Dict[str, Any], source: Optional[Size], target: Optional[Size]) -> Dict[str, Any]:
+    """
+    Copy of ``result`` with its boxes (``bounding_box`` and every box under
+    ``detections``) moved from a ``source``-sized image onto a ``target``-sized
+    one; without both sizes the boxes are dropped (classification only).
+    """
+    result = dict(result)
+    if not source or not target:
+        if result.get("bounding_box"):
+            result["bounding_box"] = []
+        result.pop("detections", None)
+        return result
+    sx, sy = target[0] / source[0], target[1] / source[1]
+    if result.get("bounding_box"):
+        result["bounding_box"] = _scale_box(result["bounding_box"], sx, sy)
+    detections = result.get("detections")
+    if detections:
+        boxes = [
+            {**box, "bounding_box": _scale_box(box["bounding_box"], sx, sy)} if isinstance(box, dict)
+            else _scale_box(box, sx, sy)
+            for box in detections["boxes"]
+        ]
+        result["detections"] = {**detections, "boxes": boxes}
+    return result
+
+
+class ResultCache:
+    """
+    Bounded LRU + TTL cache of classification results.
+
+    Entries are keyed by the exact content hash; when ``phash_distance`` > 0 a
+    miss on the exact key falls back to the closest perceptual hash within that
+    Hamming distance, among entries of the same ``scope`` only (everything the
+    result depends on besides the image, e.g. the profile). A near-duplicate may have another size than the image it
+    matched, so on such a hit the box is rescaled from the stored ``size`` to
+    the requested one. All entries belong to one model ``version``; switching
+    versions clears the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0, phash_distance: int = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.phash_distance = phash_distance
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def set_version(self, version: str) -> None:
+        """
+        Drop every entry when the model version changes.
+        """
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                    RESULT_CACHE_INVALIDATIONS.inc()
+                self._entries.clear()
+                self.version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            RESULT_CACHE_INVALIDATIONS.inc()
+
+    def get(self, key: str, phash: Optional[int] = None, size: Optional[Size] = None,
+            scope: str = "") -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    _HIT.inc()
+                    return dict(entry.result)
+                del self._entries[key]
+                self.expirations += 1
+                _EXPIRED.inc()
+
+            if phash is not None and self.phash_distance > 0:
+                best_key, best_distance = None, self.phash_distance + 1
+                for candidate_key, candidate in self._entries.items():
+                    # Ảnh gần giống nhưng khác profile/tham số thì kết quả khác: bỏ qua
+                    if candidate.scope != scope or candidate.phash is None or candidate.expires_at <= now:
+                        continue
+                    distance = hamming_distance(phash, candidate.phash)
+                    if distance < best_distance:
+                        best_key, best_distance = candidate_key, distance
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.phash_hits += 1
+                    _PHASH_HIT.inc()
+                    best = self._entries[best_key]
+                    # Ảnh gần giống có thể khác kích thước: box theo toạ độ ảnh hiện tại
+                    return rescale_result(best.result, best.size, size)
+
+            self.misses += 1
+            _MISS.inc()
+            return None
+
+    def put(self, key: str, result: Dict[str, Any], phash: Optional[int] = None,
+            size: Optional[Size] = None, scope: str = "") -> None:
+        # Không cache kết quả lỗi
+        if not self.enabled or "error" in result:
+            return
+        with self._lock:
+            self._entries[key] = _Entry(time.monotonic() + self.ttl, scope, phash, size, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                _EVICTED.inc()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.phash_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "version": self.version,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "phash_distance": self.phash_distance,
+            "hits": self.hits,
+            "phash_hits": self.phash_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.phash_hits) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BINS = 10  # khoảng 10% confidence
+
+BucketKey = Tuple[str, datetime, str]  # (period, bucket_start, result)
+# Kết quả cũ không có created_at: chỉ tính vào tổng, không vào chuỗi theo giờ/ngày
+UNDATED = ("undated", datetime(1970, 1, 1))
+
+
+def _bin(confidence: float) -> int:
+    return min(HISTOGRAM_BINS - 1, max(0, int(confidence // (100 / HISTOGRAM_BINS))))
+
+
+def hour_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class Counts:
+    """
+    Count, confidence sum and confidence histogram of one class in one bucket.
+    """
+    __slots__ = ("count", "confidence_sum", "histogram")
+
+    def __init__(self, count: int = 0, confidence_sum: float = 0.0, histogram: Optional[List[int]] = None):
+        self.count = count
+        self.confidence_sum = confidence_sum
+        self.histogram = histogram or [0] * HISTOGRAM_BINS
+
+    def add(self, confidence: float) -> None:
+        self.count += 1
+        self.confidence_sum += confidence
+        self.histogram[_bin(confidence)] += 1
+
+    def merge(self, other: "Counts") -> None:
+        self.count += other.count
+        self.confidence_sum += other.confidence_sum
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_confidence": round(self.confidence_sum / self.count, 2) if self.count else 0.0,
+            "confidence_histogram": list(self.histogram),
+        }
+
+
+class ResultStats:
+    """
+    Classification statistics maintained incrementally.
+
+    ``observe`` is called with the rows the result writer just persisted and
+    updates in-memory counters (total and per class, hourly and daily buckets)
+    in O(rows). The same increments accumulate as deltas that ``rollup``
+    adds to the ``classification_stats`` table every ``rollup_interval``
+    seconds, so ``load`` can rebuild the counters after a restart without
+    scanning ``classification_results``. Reading (``snapshot``) never
+    touches the database.
+    """
+
+    def __init__(self, rollup_interval: Optional[float] = None, hourly_retention: Optional[int] = None):
+        self.rollup_interval = rollup_interval if rollup_interval is not None else settings.STATS_ROLLUP_INTERVAL
+        self.hourly_retention = hourly_retention or settings.STATS_HOURLY_RETENTION_HOURS
+        self.totals: Dict[str, Counts] = {}
+        self.buckets: Dict[BucketKey, Counts] = {}
+        self._pending: Dict[BucketKey, Counts] = {}
+        self._last_rollup = time.monotonic()
+        self._lock = threading.Lock()
+
+    # ---------------------- Cập nhật ----------------------
+
+    def _add(self, key: BucketKey, confidence: float) -> None:
+        for target in (self.buckets, self._pending):
+            counts = target.get(key)
+            if counts is None:
+                counts = target[key] = Counts()
+            counts.add(confidence)
+
+    def observe(self, rows: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            for row in rows:
+                result = row["result"]
+                confidence = float(row.get("confidence") or 0.0)
+                created_at = row.get("created_at")
+                totals = self.totals.get(result)
+                if totals is None:
+                    totals = self.totals[result] = Counts()
+                totals.add(confidence)
+                if created_at is None:
+                    self._add((*UNDATED, result), confidence)
+                    continue
+                self._add(("hour", hour_start(created_at), result), confidence)
+                self._add(("day", day_start(created_at), result), confidence)
+
+    def _prune(self) -> None:
+        cutoff = hour_start(datetime.utcnow()) - timedelta(hours=self.hourly_retention)
+        for key in [key for key in self.buckets if key[0] == "hour" and key[1] < cutoff]:
+            del self.buckets[key]
+
+    # ---------------------- Đọc ----------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Totals, per-class counts/histograms and hourly/daily series (oldest first).
+        """
+        with self._lock:
+            self._prune()
+            series: Dict[str, Dict[datetime, Dict[str, Counts]]] = {"hour": {}, "day": {}}
+            for (period, start, result), counts in self.buckets.items():
+                if period in series:
+                    series[period].setdefault(start, {})[result] = counts
+            by_class = {result: counts.to_dict() for result, counts in sorted(self.totals.items())}
+            periods = {
+                period: [
+                    {
+                        "start": start.isoformat(),
+                        "count": sum(counts.count for counts in per_class.values()),
+                        "by_class": {result: counts.count for result, counts in sorted(per_class.items())},
+                    }
+                    for start, per_class in sorted(buckets.items())
+                ]
+                for period, buckets in series.items()
+            }
+        return {
+            "total_classifications": sum(item["count"] for item in by_class.values()),
+            "by_class": by_class,
+            "hourly": periods["hour"],
+            "daily": periods["day"],
+        }
+
+    # ---------------------- Lưu bền ----------------------
+
+    def rollup_if_due(self, session_factory: Callable[[], Any]) -> None:
+        if time.monotonic() - self._last_rollup >= self.rollup_interval:
+            self.rollup(session_factory)
+
+    def rollup(self, session_factory: Callable[[], Any]) -> None:
+        """
+        Add the deltas observed since the last rollup to ``classification_stats``.
+        """
+        from sqlalchemy import select
+        from app.models.classification_stat import ClassificationStat
+
+        self._last_rollup = time.monotonic()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with session_factory() as db:
+                for (period, start, result), delta in pending.items():
+                    row = db.scalars(select(ClassificationStat).where(
+                        ClassificationStat.period == period,
+                        ClassificationStat.bucket_start == start,
+                        ClassificationStat.result == result,
+                    ).with_for_update()).first()
+                    if row is None:
+                        row = ClassificationStat(period=period, bucket_start=start, result=result,
+                                                 count=0, confidence_sum=0.0, histogram="")
+                        db.add(row)
+                    counts = _parse_counts(row.count, row.confidence_sum, row.histogram)
+                    counts.merge(delta)
+                    row.count, row.confidence_sum = counts.count, counts.confidence_sum
+                    row.histogram = ",".join(str(v) for v in counts.histogram)
+                cutoff = hour_start(datetime.utcnow()) - timedelta(hours=self.hourly_retention)
+                db.query(ClassificationStat).filter(
+                    ClassificationStat.period == "hour", ClassificationStat.bucket_start < cutoff,
+                ).delete(synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            logger.warning("Stats rollup failed, retrying later: %s", e)
+            # Trả delta về để lần rollup sau ghi lại
+            with self._lock:
+                for key, delta in pending.items():
+                    self._pending.setdefault(key, Counts()).merge(delta)
+
+    def load(self, session_factory: Callable[[], Any]) -> None:
+        """
+        Rebuild the counters from ``classification_stats``; on first run (no
+        rollups yet) backfill them once from ``classification_results``.
+        """
+        from sqlalchemy import func, select
+        from app.models.classification_stat import ClassificationStat
+
+        self._last_rollup = time.monotonic()
+        with session_factory() as db:
+            has_rollups = db.scalar(select(func.count()).select_from(ClassificationStat)) > 0
+            if not has_rollups:
+                self._backfill(db)
+                return
+            rows = db.scalars(select(ClassificationStat)).all()
+
+        with self._lock:
+            self.totals, self.buckets, self._pending = {}, {}, {}
+            for row in rows:
+                counts = _parse_counts(row.count, row.confidence_sum, row.histogram)
+                self.buckets[(row.period, row.bucket_start, row.result)] = counts
+                if row.period in ("day", UNDATED[0]):
+                    self.totals.setdefault(row.result, Counts()).merge(counts)
+            self._prune()
+
+    def _backfill(self, db, chunk_size: int = 5000) -> None:
+        # Một lần duy nhất: đọc bảng kết quả theo keyset, tổng hợp trong Python (không phụ thuộc dialect)
+        from sqlalchemy import select
+        from app.models.classification_result import ClassificationResult
+
+        columns = (ClassificationResult.id, ClassificationResult.result,
+                   ClassificationResult.confidence, ClassificationResult.created_at)
+        last_id, total = 0, 0
+        while True:
+            page = db.execute(select(*columns).where(ClassificationResult.id > last_id)
+                              .order_by(ClassificationResult.id).limit(chunk_size)).all()
+            if not page:
+                break
+            self.observe({"result": row.result or "", "confidence": row.confidence,
+                          "created_at": row.created_at} for row in page)
+            last_id = page[-1].id
+            total += len(page)
+        if total:
+            logger.info("Backfilled classification stats from %d stored results", total)
+
+
+def _parse_counts(count: int, confidence_sum: float, histogram: str) -> Counts:
+    values = [int(v) for v in histogram.split(",")] if histogram else []
+    if len(values) != HISTOGRAM_BINS:
+        values = [0] * HISTOGRAM_BINS
+    return Counts(count or 0, confidence_sum or 0.0, values)
+
+
+result_stats = ResultStats()
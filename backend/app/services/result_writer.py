@@ -0,0 +1,178 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY, Counter, Gauge, Histogram
+from app.services.result_stats import ResultStats, result_stats
+
+logger = logging.getLogger(__name__)
+
+RESULTS_PERSISTED = REGISTRY.register(Counter(
+    "classification_results_persisted_total", "Classification results written to the database",
+))
+RESULTS_DROPPED = REGISTRY.register(Counter(
+    "classification_results_dropped_total", "Classification results not persisted (queue_full, write_error)",
+    ("reason",),
+))
+FLUSH_SECONDS = REGISTRY.register(Histogram(
+    "classification_results_flush_seconds", "Time of one bulk insert of classification results",
+))
+
+
+def result_row(result: Dict[str, Any], source: str, image_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    ``classification_results`` row for one predict_image-style result.
+    """
+    bbox = result.get("bounding_box") or []
+    return {
+        "result": str(result.get("classification", ""))[:100],
+        "confidence": float(result.get("confidence", 0.0)),
+        "class_id": result.get("class_id"),
+        "bounding_box": ",".join(str(int(v)) for v in bbox) if bbox else None,
+        "image_url": image_url[:512] if image_url else None,
+        "source": source,
+        "created_at": datetime.utcnow(),
+    }
+
+
+class ResultWriter:
+    """
+    Write-behind persistence of classification results.
+
+    ``record`` only puts a row dict on a bounded queue (never blocks, never
+    touches the database); a background thread drains it and writes with one
+    bulk INSERT per ``batch_size`` rows or every ``interval`` seconds,
+    whichever comes first. Rows that don't fit in the queue, or whose insert
+    failed, are dropped and counted. ``stop`` flushes what is left.
+
+    Persisted rows are also fed to ``result_stats`` (whose rollups run on the same
+    thread), so statistics only count what actually reached the database.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None,
+                 batch_size: Optional[int] = None, interval: Optional[float] = None,
+                 max_queue: Optional[int] = None, result_stats: Optional[ResultStats] = None):
+        self.session_factory = session_factory
+        self.result_stats = result_stats
+        self.batch_size = max(1, batch_size or settings.RESULT_WRITE_BATCH_SIZE)
+        self.interval = interval if interval is not None else settings.RESULT_WRITE_INTERVAL
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue or settings.RESULT_WRITE_QUEUE_SIZE)
+        self.persisted = 0
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        if self.session_factory is None:
+            # Import muộn: import app không kéo theo engine database
+            from app.database.session import SessionLocal
+            self.session_factory = SessionLocal
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, result: Dict[str, Any], source: str, image_url: Optional[str] = None) -> bool:
+        """
+        Queue one result for persistence; returns False if it was not queued.
+        Results carrying an ``error`` are not persisted.
+        """
+        if self._thread is None or "error" in result:
+            return False
+        try:
+            self.queue.put_nowait(result_row(result, source, image_url))
+        except queue.Full:
+            self._drop(1, "queue_full")
+            return False
+        return True
+
+    def _drop(self, count: int, reason: str) -> None:
+        self.dropped += count
+        RESULTS_DROPPED.labels(reason=reason).inc(count)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        # Chờ tối đa ``interval`` cho tới khi đủ một lô
+        rows: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.interval
+        while len(rows) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                rows.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        from sqlalchemy import insert
+        from app.models.classification_result import ClassificationResult
+
+        try:
+            with FLUSH_SECONDS.time():
+                with self.session_factory() as db:
+                    # executemany: một câu INSERT nhiều dòng thay vì từng ORM object
+                    db.execute(insert(ClassificationResult), rows)
+                    db.commit()
+        except Exception as e:
+            logger.warning("Persisting %d classification results failed: %s", len(rows), e)
+            self._drop(len(rows), "write_error")
+            return
+        self.persisted += len(rows)
+        RESULTS_PERSISTED.inc(len(rows))
+        if self.result_stats is not None:
+            self.result_stats.observe(rows)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            rows = self._take_batch()
+            if rows:
+                self._write(rows)
+            if self.result_stats is not None:
+                self.result_stats.rollup_if_due(self.session_factory)
+        # Dừng: ghi nốt phần còn lại trong hàng đợi
+        while True:
+            rows = []
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                break
+            self._write(rows)
+        if self.result_stats is not None:
+            self.result_stats.rollup(self.session_factory)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop the writer thread after flushing the queued rows.
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self.queue.qsize(),
+            "persisted": self.persisted,
+            "dropped": self.dropped,
+        }
+
+
+result_writer = ResultWriter(result_stats=result_stats)
+
+REGISTRY.register(Gauge(
+    "classification_results_queued", "Classification results waiting to be written",
+    fn=lambda: result_writer.queue.qsize(),
+))
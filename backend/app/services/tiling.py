@@ -0,0 +1,90 @@
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import INFERENCE_STAGE_SECONDS
+from app.services.backends import Detections, batched_nms
+
+_TILE_MERGE_SECONDS = INFERENCE_STAGE_SECONDS.labels(stage="tile_merge")
+
+Tile = Tuple[int, int, int, int]  # x1, y1, x2, y2 trong ảnh gốc
+PredictFn = Callable[[List[np.ndarray]], List[Detections]]
+
+
+def _starts(length: int, tile_size: int, step: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    # Tile cuối căn sát mép ảnh (không có tile bị pad)
+    return sorted(set(range(0, length - tile_size, step)) | {length - tile_size})
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: float) -> List[Tile]:
+    """
+    Overlapping ``tile_size`` squares covering a ``width`` x ``height`` image,
+    row by row; neighbours share ``overlap`` (fraction) of the tile size.
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+    step = max(1, int(round(tile_size * (1 - overlap))))
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _starts(height, tile_size, step)
+        for x in _starts(width, tile_size, step)
+    ]
+
+
+def merge_detections(parts: Sequence[Detections], offsets: Sequence[Tuple[int, int]],
+                     threshold: float, max_det: Optional[int] = None) -> Detections:
+    """
+    Shift each part's boxes by its (x, y) offset and run one class-aware NMS
+    over all of them. Overlap is intersection over the smaller box: an object
+    cut by a tile border leaves a partial box inside the full one from the
+    neighbouring tile, with a low IoU but an intersection over smaller close to 1.
+    """
+    with _TILE_MERGE_SECONDS.time():
+        parts = [(part, offset) for part, offset in zip(parts, offsets) if len(part)]
+        if not parts:
+            return Detections.empty()
+        boxes = np.concatenate([
+            part.boxes + np.array([x, y, x, y], dtype=np.float32) for part, (x, y) in parts
+        ])
+        scores = np.concatenate([part.scores for part, _ in parts])
+        class_ids = np.concatenate([part.class_ids for part, _ in parts])
+        keep = batched_nms(boxes, scores, class_ids, threshold, metric="ios")
+        if max_det:
+            keep = keep[:max_det]
+        return Detections(boxes[keep], scores[keep], class_ids[keep])
+
+
+def detect_tiled(predict: PredictFn, image: np.ndarray, tile_size: Optional[int] = None,
+                 overlap: Optional[float] = None, batch_size: Optional[int] = None,
+                 include_full: Optional[bool] = None, threshold: Optional[float] = None,
+                 max_det: Optional[int] = None) -> Tuple[Detections, int]:
+    """
+    Run ``predict`` on overlapping tiles of ``image`` (BGR ndarray) and merge
+    the boxes into original image coordinates.
+
+    Tiles are views into ``image`` (no copies) and go to the model
+    ``batch_size`` at a time. With ``include_full`` the whole image, downscaled
+    by the model as usual, is added to the first batch so objects larger than
+    a tile are still found. Returns the merged detections and the tile count.
+    """
+    tile_size = tile_size or settings.TILE_SIZE
+    overlap = settings.TILE_OVERLAP if overlap is None else overlap
+    batch_size = max(1, batch_size or settings.TILE_BATCH_SIZE)
+    include_full = settings.TILE_INCLUDE_FULL_IMAGE if include_full is None else include_full
+    threshold = settings.TILE_MERGE_THRESHOLD if threshold is None else threshold
+
+    height, width = image.shape[:2]
+    grid = tile_grid(width, height, tile_size, overlap)
+    inputs = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in grid]
+    offsets = [(x1, y1) for x1, y1, _, _ in grid]
+    if include_full and len(grid) > 1:
+        inputs.insert(0, image)
+        offsets.insert(0, (0, 0))
+
+    parts: List[Detections] = []
+    for start in range(0, len(inputs), batch_size):
+        parts += predict(inputs[start:start + batch_size])
+    return merge_detections(parts, offsets, threshold, max_det), len(grid)
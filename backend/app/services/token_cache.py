@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from jose import jwt
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY, Counter
+
+TOKEN_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "auth_token_cache_lookups_total", "Verified-token cache lookups (hit, miss)", ("result",),
+))
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified JWT claims, keyed by the token string.
+
+    An entry lives until the token's ``exp`` (capped at ``ttl`` seconds, so a
+    changed SECRET_KEY or a revoked signing setup is picked up), then the
+    token is verified again. Only successfully verified tokens are cached,
+    so invalid tokens can't evict valid ones.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = max_size if max_size is not None else settings.AUTH_TOKEN_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else settings.AUTH_TOKEN_CACHE_TTL
+        self._entries: OrderedDict = OrderedDict()  # token -> (claims, hết hạn lúc)
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            claims, expires = entry
+            if time.time() >= expires:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        expires = time.time() + self.ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires = min(expires, float(claims["exp"]))
+        with self._lock:
+            self._entries[token] = (claims, expires)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+def verified_claims(token: str) -> Dict[str, Any]:
+    """
+    Claims of ``token`` after signature and expiry checks, from the cache
+    when possible. Raises JWTError for an invalid or expired token.
+    """
+    claims = token_cache.get(token)
+    if claims is not None:
+        TOKEN_CACHE_LOOKUPS.labels(result="hit").inc()
+        return claims
+    TOKEN_CACHE_LOOKUPS.labels(result="miss").inc()
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    token_cache.put(token, claims)
+    return claims
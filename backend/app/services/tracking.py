@@ -0,0 +1,138 @@
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+
+def to_analysis_gray(frame: np.ndarray, width: int = 160) -> np.ndarray:
+    """
+    Downscale a BGR frame to a small blurred grayscale image for motion analysis.
+    """
+    height, frame_width = frame.shape[:2]
+    small_height = max(1, int(round(height * width / frame_width)))
+    small = cv2.resize(frame, (width, small_height), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    return cv2.GaussianBlur(gray, (5, 5), 0)
+
+
+def motion_score(previous: np.ndarray, current: np.ndarray) -> float:
+    """
+    Mean absolute difference of two analysis images, normalised to 0..1.
+    """
+    return float(cv2.absdiff(previous, current).mean()) / 255.0
+
+
+class BoxTracker:
+    """
+    Carry a bounding box forward between keyframes with sparse Lucas-Kanade flow.
+
+    Feature points inside the box are tracked frame to frame on the small
+    analysis images and the box is shifted by their median displacement.
+    When too few points survive, the box is simply kept where it was.
+    """
+
+    def __init__(self, min_points: int = 4):
+        self.min_points = min_points
+        self.box: Optional[np.ndarray] = None  # [x1, y1, x2, y2] trên ảnh analysis
+        self._points: Optional[np.ndarray] = None
+
+    def reset(self, gray: np.ndarray, box: Optional[np.ndarray]) -> None:
+        self.box = box
+        self._points = None
+        if box is None:
+            return
+        x1, y1, x2, y2 = [int(v) for v in box]
+        mask = np.zeros_like(gray)
+        mask[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = 255
+        self._points = cv2.goodFeaturesToTrack(gray, maxCorners=30, qualityLevel=0.01, minDistance=3, mask=mask)
+
+    def update(self, previous: np.ndarray, current: np.ndarray) -> Optional[np.ndarray]:
+        if self.box is None or self._points is None or len(self._points) < self.min_points:
+            return self.box
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(previous, current, self._points, None)
+        if moved is None:
+            return self.box
+        good = status.reshape(-1) == 1
+        if good.sum() < self.min_points:
+            return self.box
+        dx, dy = np.median((moved[good] - self._points[good]).reshape(-1, 2), axis=0)
+        self.box = self.box + np.array([dx, dy, dx, dy], dtype=np.float32)
+        self._points = moved[good].reshape(-1, 1, 2)
+        return self.box
+
+
+class MotionGatedSession:
+    """
+    Decide per frame whether the detector has to run.
+
+    The detector runs on keyframes: the first frame, every ``keyframe_interval``
+    frames, or whenever the motion score against the last keyframe reaches
+    ``motion_threshold``. In between, the last result is reused and its box is
+    moved with a BoxTracker.
+
+    Usage::
+
+        gray = session.prepare(frame)
+        if session.needs_inference(gray):
+            result = session.on_keyframe(gray, classify(frame))
+        else:
+            result = session.track(gray)
+    """
+
+    def __init__(self, keyframe_interval: int = 10, motion_threshold: float = 0.02, analysis_width: int = 160):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.motion_threshold = motion_threshold
+        self.analysis_width = analysis_width
+        self.tracker = BoxTracker()
+        self.frames = 0
+        self.keyframes = 0
+        self._scale = 1.0  # kích thước frame gốc / kích thước ảnh analysis
+        self._keyframe_gray: Optional[np.ndarray] = None
+        self._previous_gray: Optional[np.ndarray] = None
+        self._last_result: Optional[Dict[str, Any]] = None
+        self._since_keyframe = 0
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        self.frames += 1
+        self._scale = frame.shape[1] / self.analysis_width
+        return to_analysis_gray(frame, self.analysis_width)
+
+    def needs_inference(self, gray: np.ndarray) -> bool:
+        if self._keyframe_gray is None or self._last_result is None:
+            return True
+        if gray.shape != self._keyframe_gray.shape:
+            return True
+        if self._since_keyframe + 1 >= self.keyframe_interval:
+            return True
+        return motion_score(self._keyframe_gray, gray) >= self.motion_threshold
+
+    def on_keyframe(self, gray: np.ndarray, result: Dict[str, Any]) -> Dict[str, Any]:
+        self.keyframes += 1
+        self._since_keyframe = 0
+        self._keyframe_gray = gray
+        self._previous_gray = gray
+        self._last_result = result
+        bbox = result.get("bounding_box") or []
+        box = np.array(bbox, dtype=np.float32) / self._scale if len(bbox) == 4 else None
+        self.tracker.reset(gray, box)
+        return {**result, "keyframe": True}
+
+    def track(self, gray: np.ndarray) -> Dict[str, Any]:
+        self._since_keyframe += 1
+        box = self.tracker.update(self._previous_gray, gray)
+        self._previous_gray = gray
+        result = {**self._last_result, "keyframe": False}
+        if box is not None:
+            result["bounding_box"] = [int(round(v * self._scale)) for v in box]
+        return result
+
+    @property
+    def keyframe_ratio(self) -> float:
+        return self.keyframes / self.frames if self.frames else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "keyframe_ratio": round(self.keyframe_ratio, 3),
+        }
@@ -0,0 +1,162 @@
+import logging
+import re
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, func, literal_column, not_, null, or_, select, table, text, true
+
+from app.models.user import User
+from app.services.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Tìm chuỗi con chỉ khi từ khoá đủ dài (ngắn hơn thì gần như khớp mọi user; trigram cũng cần >= 3 ký tự)
+CONTAINS_MIN_LENGTH = 3
+_FULLTEXT_OPERATORS = re.compile(r"[^\w]+")
+
+# SQLite: bảng FTS5 trigram (external content trên bảng user, đồng bộ bằng trigger) cho tìm chuỗi con
+SQLITE_TRIGRAM_TABLE = "user_search"
+_SQLITE_TRIGRAM_DDL = [
+    f"""CREATE VIRTUAL TABLE {SQLITE_TRIGRAM_TABLE} USING fts5(
+        username, email, content='user', content_rowid='id', tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_TRIGRAM_TABLE}_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO {SQLITE_TRIGRAM_TABLE}(rowid, username, email) VALUES (new.id, new.username, new.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_TRIGRAM_TABLE}_ad AFTER DELETE ON "user" BEGIN
+        INSERT INTO {SQLITE_TRIGRAM_TABLE}({SQLITE_TRIGRAM_TABLE}, rowid, username, email)
+        VALUES ('delete', old.id, old.username, old.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_TRIGRAM_TABLE}_au AFTER UPDATE ON "user" BEGIN
+        INSERT INTO {SQLITE_TRIGRAM_TABLE}({SQLITE_TRIGRAM_TABLE}, rowid, username, email)
+        VALUES ('delete', old.id, old.username, old.email);
+        INSERT INTO {SQLITE_TRIGRAM_TABLE}(rowid, username, email) VALUES (new.id, new.username, new.email);
+    END""",
+    f"INSERT INTO {SQLITE_TRIGRAM_TABLE}({SQLITE_TRIGRAM_TABLE}) VALUES ('rebuild')",  # index các user đã có
+]
+sqlite_trigram = False  # bảng trigram đã sẵn sàng (ensure_sqlite_trigram_index)
+
+
+def ensure_sqlite_trigram_index(conn) -> bool:
+    """
+    Create the SQLite trigram index for substring search if missing. Returns
+    False when this SQLite build has no FTS5 trigram tokenizer (< 3.34): search
+    then falls back to scanning.
+    """
+    global sqlite_trigram
+    exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                          {"name": SQLITE_TRIGRAM_TABLE}).first()
+    if not exists:
+        try:
+            with conn.begin_nested():
+                for statement in _SQLITE_TRIGRAM_DDL:
+                    conn.execute(text(statement))
+        except Exception as e:
+            logger.warning("SQLite trigram index unavailable, user search falls back to scanning: %s", e)
+            sqlite_trigram = False
+            return False
+    sqlite_trigram = True
+    return True
+
+
+class Tier(NamedTuple):
+    where: Any
+    key: Optional[Any]  # cột sắp xếp trước id (None = chỉ theo id)
+    source: Optional[Any] = None  # FROM khác bảng user (join với bảng index)
+    id_column: Any = User.id  # cột id dùng để sắp xếp/keyset (cùng giá trị với User.id)
+
+
+def _prefix_range(column, prefix: str):
+    # lower(col) >= 'ab' AND lower(col) < 'ac': dùng được index trên lower(col), không cần escape LIKE
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def _contains_tier(term: str, dialect: str, exclude) -> Optional[Tier]:
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import match
+
+        # FULLTEXT (ix_user_fulltext) khớp theo từ: "+john* +doe*" cho "john.doe"
+        words = [word for word in _FULLTEXT_OPERATORS.split(term) if word]
+        if not words:
+            return None
+        against = " ".join(f"+{word}*" for word in words)
+        return Tier(and_(match(User.username, User.email, against=against).in_boolean_mode(), exclude), None)
+    if dialect == "sqlite" and sqlite_trigram:
+        # Đi từ bảng trigram theo rowid: FTS5 trả kết quả theo thứ tự rowid, dừng ngay khi đủ LIMIT
+        fts = table(SQLITE_TRIGRAM_TABLE, literal_column("rowid"))
+        rowid = literal_column(f"{SQLITE_TRIGRAM_TABLE}.rowid")
+        phrase = '"' + term.replace('"', '""') + '"'
+        return Tier(and_(literal_column(SQLITE_TRIGRAM_TABLE).op("MATCH")(phrase), exclude), None,
+                    source=fts.join(User, User.id == rowid), id_column=rowid)
+    # Không có index cho chuỗi con: quét, dừng khi đủ LIMIT
+    contains = or_(func.instr(func.lower(User.username), term) > 0, func.instr(func.lower(User.email), term) > 0)
+    return Tier(and_(contains, exclude), None)
+
+
+def search_tiers(term: str, dialect: str) -> List[Tier]:
+    """
+    Match tiers for ``term``, best first: exact username, username prefix,
+    email prefix, then substring (full-text on MySQL). Each tier excludes the
+    users already matched by an earlier one.
+    """
+    term = term.strip().lower()
+    if not term:
+        return [Tier(true(), None)]
+    username, email = func.lower(User.username), func.lower(User.email)
+    username_prefix = _prefix_range(username, term)
+    email_prefix = _prefix_range(email, term)
+    tiers = [
+        Tier(username == term, None),
+        Tier(and_(username_prefix, username != term), username),
+        Tier(and_(email_prefix, not_(username_prefix)), email),
+    ]
+    if len(term) >= CONTAINS_MIN_LENGTH:
+        contains = _contains_tier(term, dialect, and_(not_(username_prefix), not_(email_prefix)))
+        if contains is not None:
+            tiers.append(contains)
+    return tiers
+
+
+def _tier_query(tier: Tier, after: Optional[Tuple[Any, int]], limit: int):
+    # Chọn kèm giá trị khoá sắp xếp do DB tính (lower() của SQLite khác str.lower() với ký tự ngoài ASCII)
+    query = select(User, tier.key if tier.key is not None else null()).where(tier.where)
+    if tier.source is not None:
+        query = query.select_from(tier.source)
+    if tier.key is None:
+        if after is not None:
+            query = query.where(tier.id_column > after[1])
+        return query.order_by(tier.id_column).limit(limit)
+    if after is not None:
+        key, last_id = after
+        query = query.where(or_(tier.key > key, and_(tier.key == key, tier.id_column > last_id)))
+    return query.order_by(tier.key, tier.id_column).limit(limit)
+
+
+async def search_users(db, term: Optional[str], limit: int, cursor: Optional[str] = None):
+    """
+    One page of users matching ``term``, ranked by tier.
+
+    Returns ``(users, next_cursor)``; ``next_cursor`` is None on the last page.
+    Raises InvalidCursorError for a cursor that doesn't belong to this search.
+    """
+    tiers = search_tiers(term or "", db.bind.dialect.name)
+    start, after = 0, None
+    if cursor:
+        start, key, last_id = decode_cursor(cursor, size=3)
+        if not isinstance(start, int) or not 0 <= start < len(tiers) or not isinstance(last_id, int):
+            raise InvalidCursorError(f"Invalid cursor: {cursor!r}")
+        after = (key, last_id)
+
+    # Lấy thêm một user để biết còn trang sau hay không
+    rows: List[Tuple[int, User, Any]] = []
+    for index in range(start, len(tiers)):
+        query = _tier_query(tiers[index], after if index == start else None, limit + 1 - len(rows))
+        rows += [(index, user, key) for user, key in (await db.execute(query)).all()]
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        index, last, key = rows[-1]
+        next_cursor = encode_cursor(index, key, last.id)
+    return [user for _, user, _ in rows], next_cursor
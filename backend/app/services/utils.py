@@ -1,8 +1,13 @@
 import base64
 import io
+import logging
 from PIL import Image
+import cv2
 import numpy as np
-from typing import Union, Tuple
+from typing import Optional, Union, Tuple
+from app.core.logger import log_sampled
+
+logger = logging.getLogger(__name__)
 
 def decode_base64_image(base64_string: str) -> bytes:
     """Decode base64 image string to bytes."""
@@ -28,8 +33,15 @@ def resize_image(image: Union[Image.Image, bytes], target_size: Tuple[int, int]
     
     return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-def preprocess_image(image: Union[Image.Image, bytes, str]) -> Image.Image:
+def preprocess_image(image: Union[Image.Image, bytes, str], imgsz: int = 640) -> Image.Image:
     """Preprocess image for model inference."""
+    return preprocess_image_scaled(image, imgsz)[0]
+
+def preprocess_image_scaled(image: Union[Image.Image, bytes, str], imgsz: int = 640) -> Tuple[Image.Image, float]:
+    """
+    Same as ``preprocess_image`` but also returns the scale factor
+    (resized / original) to map boxes back to the input image.
+    """
     try:
         if isinstance(image, bytes):
             image = Image.open(io.BytesIO(image)).convert("RGB")
@@ -45,20 +57,51 @@ def preprocess_image(image: Union[Image.Image, bytes, str]) -> Image.Image:
             image = image.convert("RGB")
         else:
             raise ValueError("Định dạng ảnh không hỗ trợ")
-        
+        original_size = image.size
+
         # Resize image
-        image = resize_image(image)
-        
+        image = resize_image(image, (imgsz, imgsz))
+
         # Convert to numpy array and back to ensure proper format
         image = np.array(image)
         image = Image.fromarray(image)
-        
-        print(f"Image size after preprocessing: {image.size}")
-        return image
+
+        # Tỉ lệ theo cạnh dài (cạnh ngắn bị làm tròn xuống khi resize)
+        scale = max(image.size) / max(original_size)
+        log_sampled(logger, "preprocess_image", logging.DEBUG, "Image preprocessed", size=image.size)
+        return image, scale
     except Exception as e:
-        print(f"Error in preprocess_image: {str(e)}")
+        log_sampled(logger, "preprocess_image.error", logging.WARNING, "Error in preprocess_image: %s", e)
         raise ValueError(f"Failed to preprocess image: {str(e)}")
 
+def decode_image(data: bytes) -> Optional[np.ndarray]:
+    """
+    Decode encoded image bytes (JPEG/PNG/WebP...) exactly once into a contiguous
+    BGR uint8 array using OpenCV (libjpeg-turbo). Returns None if OpenCV can't decode it.
+    """
+    if not data:
+        return None
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return np.ascontiguousarray(image)
+
+def resize_to_model(image: np.ndarray, imgsz: int = 640) -> Tuple[np.ndarray, float]:
+    """
+    Resize an ndarray once so its longer side equals the model input size.
+
+    The model only has to pad the result (no second resize). Returns the resized
+    array and the scale factor (resized / original) to map boxes back.
+    """
+    height, width = image.shape[:2]
+    scale = imgsz / max(height, width)
+    if scale == 1.0:
+        return image, 1.0
+    new_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    # INTER_AREA khi thu nhỏ (chất lượng tốt, nhanh), INTER_LINEAR khi phóng to
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(image, new_size, interpolation=interpolation), scale
+
 def image_to_bytes(image: Image.Image, format: str = 'JPEG') -> bytes:
     """Convert PIL Image to bytes."""
     img_byte_arr = io.BytesIO()
@@ -3,11 +3,11 @@ import numpy as np
 from typing import Generator, Tuple, Optional
 from .utils import preprocess_image
 from PIL import Image
-import io
+import queue
 import tempfile
+import threading
 import os
-from typing import List, Dict
-from app.services.classifier import Classifier
+from typing import List
 
 
 class VideoProcessor:
@@ -16,16 +16,18 @@ class VideoProcessor:
         Initialize video processor.
         
         Args:
-            frame_skip: Number of frames to skip between processing, set to 0 for 60fps.
+            frame_skip: Number of frames to skip between processed frames (0 = every frame).
         """
         self.frame_skip = frame_skip
 
-    def process_video_file(self, video_path: str) -> Generator[Tuple[np.ndarray, int], None, None]:
+    def process_video_file(self, video_path: str, rgb: bool = True) -> Generator[Tuple[np.ndarray, int], None, None]:
         """
         Process video file and yield frames for classification.
         
         Args:
             video_path: Path to video file
+            rgb: Convert frames to RGB; pass False to get OpenCV's BGR frames
+                (what Classifier expects for ndarray input)
             
         Yields:
             Tuple of (frame, frame_number)
@@ -33,20 +35,36 @@ class VideoProcessor:
         cap = cv2.VideoCapture(video_path)
         frame_count = 0
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Nếu bạn muốn xử lý toàn bộ các frame mà không bỏ qua
-            if self.frame_skip == 0:
-                # Convert BGR to RGB
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                yield frame_rgb, frame_count
-            
-            frame_count += 1
-            
-        cap.release()
+        try:
+            while cap.isOpened():
+                # Lấy 1 frame rồi bỏ qua frame_skip frame tiếp theo (frame_skip = 0: lấy tất cả)
+                if frame_count % (self.frame_skip + 1) != 0:
+                    # Frame bị bỏ qua: chỉ grab, không retrieve/convert
+                    if not cap.grab():
+                        break
+                    frame_count += 1
+                    continue
+
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                if rgb:
+                    # Convert BGR to RGB
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                yield frame, frame_count
+
+                frame_count += 1
+        finally:
+            cap.release()
+
+    @staticmethod
+    def video_fps(video_path: str) -> float:
+        cap = cv2.VideoCapture(video_path)
+        try:
+            return float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        finally:
+            cap.release()
 
     def process_frame(self, frame: np.ndarray) -> Image.Image:
         """
@@ -76,25 +94,107 @@ class VideoProcessor:
         Returns:
             First frame as numpy array or None if failed
         """
-        # Create temporary file
+        # OpenCV chỉ đọc video từ file, nên vẫn cần file tạm; nếu đã có file trên
+        # đĩa thì dùng extract_first_frame(path) để tránh ghi lại toàn bộ nội dung
         with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
             temp_file.write(video_bytes)
             temp_path = temp_file.name
         
         try:
-            # Read video from temporary file
-            cap = cv2.VideoCapture(temp_path)
+            return self.extract_first_frame(temp_path)
+        finally:
+            # Clean up temporary file
+            os.unlink(temp_path)
+
+    def extract_first_frame(self, video_path: str) -> Optional[np.ndarray]:
+        """
+        Extract the first frame (RGB) of a video file already on disk.
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
             if not cap.isOpened():
                 return None
-                
             ret, frame = cap.read()
+        finally:
             cap.release()
-            
-            if not ret:
-                return None
-                
-            # Convert BGR to RGB
-            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        if not ret:
+            return None
+
+        # Convert BGR to RGB
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+class FramePrefetcher:
+    """
+    Decode frames of a video file in a background thread into a bounded queue.
+
+    The consumer takes frames in batches with ``next_batch``; decoding stays up to
+    ``prefetch`` frames ahead of inference and pauses when the queue is full, so
+    memory stays bounded regardless of the video length.
+    """
+
+    _END = object()
+
+    def __init__(self, processor: VideoProcessor, video_path: str, prefetch: int = 32, rgb: bool = False):
+        self.processor = processor
+        self.video_path = video_path
+        self.rgb = rgb
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, prefetch))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._decode, name="video-prefetch", daemon=True)
+        self._finished = False
+        self.error: Optional[Exception] = None
+
+    def start(self) -> "FramePrefetcher":
+        self._thread.start()
+        return self
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self) -> None:
+        try:
+            for item in self.processor.process_video_file(self.video_path, rgb=self.rgb):
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self.error = e
         finally:
-            # Clean up temporary file
-            os.unlink(temp_path)
+            self._put(self._END)
+
+    def next_batch(self, size: int) -> List[Tuple[np.ndarray, int]]:
+        """
+        Block until ``size`` frames are available or the video ended; [] means done.
+        """
+        batch = []
+        while not self._finished and len(batch) < size:
+            # Sau close() thread giải mã không đưa _END vào nữa: không chờ queue mãi
+            if self._stop.is_set():
+                self._finished = True
+                break
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is self._END:
+                self._finished = True
+                break
+            batch.append(item)
+        return batch
+
+    def stop(self) -> None:
+        """
+        Ask the decoder and any blocked ``next_batch`` call to finish (doesn't wait).
+        """
+        self._stop.set()
+
+    def close(self) -> None:
+        self.stop()
+        self._thread.join(timeout=5)
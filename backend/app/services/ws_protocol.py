@@ -0,0 +1,104 @@
+import struct
+from typing import Any, Dict, List, Tuple
+
+# Giao thức nhị phân cho /classify/ws/camera (version 1)
+#
+# Client -> server (binary message):
+#   uint32 big-endian sequence id + ảnh đã mã hoá (JPEG/WebP/PNG)
+#
+# Server -> client (binary message, 27 bytes):
+#   uint32 seq | uint8 status | int16 class_id | float32 confidence (%) | 4 x int32 bbox (x1, y1, x2, y2)
+#
+# Tên class được gửi một lần trong message "hello" (JSON) ngay sau khi kết nối.
+
+PROTOCOL_NAME = "binary"
+PROTOCOL_VERSION = 1
+SUBPROTOCOL = "tomato.binary.v1"
+
+FRAME_HEADER = struct.Struct(">I")
+RESULT = struct.Struct(">IBhf4i")
+
+STATUS_OK = 0
+STATUS_NO_DETECTION = 1
+STATUS_BUSY = 2
+STATUS_LOADING = 3
+STATUS_ERROR = 4
+
+STATUS_NAMES = {
+    STATUS_OK: "ok",
+    STATUS_NO_DETECTION: "no_detection",
+    STATUS_BUSY: "busy",
+    STATUS_LOADING: "loading",
+    STATUS_ERROR: "error",
+}
+
+
+class ProtocolError(ValueError):
+    """
+    Raised for malformed binary frames.
+    """
+
+
+def hello_message(class_names: List[str]) -> Dict[str, Any]:
+    return {
+        "type": "hello",
+        "protocol": PROTOCOL_NAME,
+        "version": PROTOCOL_VERSION,
+        "classes": class_names,
+        "frame_header": "uint32 big-endian sequence id, followed by the encoded image",
+        "result_format": RESULT.format,
+        "statuses": STATUS_NAMES,
+    }
+
+
+def decode_frame(message: bytes) -> Tuple[int, bytes]:
+    """
+    Split a binary client message into (sequence id, encoded image bytes).
+    """
+    if len(message) <= FRAME_HEADER.size:
+        raise ProtocolError("Binary frame is too short")
+    (seq,) = FRAME_HEADER.unpack_from(message)
+    return seq, message[FRAME_HEADER.size:]
+
+
+def encode_result(seq: int, result: Dict[str, Any]) -> bytes:
+    """
+    Pack a classifier result dict into the fixed-size binary reply.
+    """
+    bbox = result.get("bounding_box") or []
+    if "error" in result:
+        status = STATUS_ERROR
+    elif len(bbox) == 4:
+        status = STATUS_OK
+    else:
+        status = STATUS_NO_DETECTION
+    if len(bbox) != 4:
+        bbox = [0, 0, 0, 0]
+    return RESULT.pack(
+        seq & 0xFFFFFFFF,
+        status,
+        int(result.get("class_id", -1)),
+        float(result.get("confidence", 0.0)),
+        *(int(v) for v in bbox),
+    )
+
+
+def encode_status(seq: int, status: int) -> bytes:
+    """
+    Binary reply without a detection (busy, loading, error).
+    """
+    return RESULT.pack(seq & 0xFFFFFFFF, status, -1, 0.0, 0, 0, 0, 0)
+
+
+def decode_result(message: bytes) -> Dict[str, Any]:
+    """
+    Inverse of encode_result (used by tests and Python clients).
+    """
+    seq, status, class_id, confidence, x1, y1, x2, y2 = RESULT.unpack(message)
+    return {
+        "seq": seq,
+        "status": STATUS_NAMES.get(status, "unknown"),
+        "class_id": class_id,
+        "confidence": confidence,
+        "bounding_box": [x1, y1, x2, y2] if status == STATUS_OK else [],
+    }
@@ -0,0 +1,133 @@
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services import utils
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def load_images(folder: str, limit: Optional[int] = None) -> List[Tuple[str, Optional[str], bytes]]:
+    """
+    Read sample images as (path, label, encoded bytes).
+
+    A folder with one sub-folder per class (``samples/Ripe/*.jpg``) is labeled
+    by the sub-folder name; images directly in ``folder`` have no label.
+    """
+    samples = []
+    for root, _, files in sorted(os.walk(folder)):
+        label = None if os.path.samefile(root, folder) else os.path.relpath(root, folder).split(os.sep)[0]
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    samples.append((path, label, f.read()))
+    if not samples:
+        raise SystemExit(f"No images found in {folder}")
+    return samples[:limit] if limit else samples
+
+
+def decode_all(samples: Sequence[Tuple[str, Optional[str], bytes]]) -> List[np.ndarray]:
+    frames = []
+    for path, _, data in samples:
+        frame = utils.decode_image(data)
+        if frame is None:
+            raise SystemExit(f"Cannot decode {path}")
+        frames.append(frame)
+    return frames
+
+
+def percentiles(values: Sequence[float], qs: Sequence[float] = (50, 95, 99)) -> Dict[str, float]:
+    """
+    ``{"p50": ..., "p95": ..., "p99": ...}`` in the unit of ``values``.
+    """
+    if not values:
+        return {f"p{q:g}": 0.0 for q in qs}
+    array = np.asarray(values, dtype=np.float64)
+    return {f"p{q:g}": float(np.percentile(array, q)) for q in qs}
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 1) -> List[float]:
+    """
+    Call ``fn`` ``warmup`` times untimed, then ``iterations`` times; returns seconds per call.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples: Sequence[float], items_per_call: int = 1) -> Dict[str, float]:
+    """
+    Latency percentiles (ms per call) and throughput (items/s) of ``measure`` samples.
+    """
+    ms = [s * 1000.0 for s in samples]
+    total = sum(samples)
+    return {
+        "iterations": len(samples),
+        "items_per_call": items_per_call,
+        "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+        **{f"{k}_ms": v for k, v in percentiles(ms).items()},
+        "throughput_ips": items_per_call * len(samples) / total if total > 0 else 0.0,
+    }
+
+
+def compare_results(
+        current: Dict[str, Dict[str, float]],
+        baseline: Dict[str, Dict[str, float]],
+        threshold: float = 0.10,
+        metric: str = "p50_ms",
+) -> List[Dict[str, Any]]:
+    """
+    Compare benchmark results by name; a case regresses when ``metric`` got
+    worse by more than ``threshold`` (0.10 = 10 %) than in the baseline. Latency
+    metrics get worse when they grow, throughput when it drops. Cases missing
+    on either side are ignored.
+    """
+    higher_is_better = metric.startswith("throughput")
+    rows = []
+    for name in sorted(set(current) & set(baseline)):
+        before, after = baseline[name].get(metric), current[name].get(metric)
+        if not before or not after:
+            continue
+        change = before / after - 1.0 if higher_is_better else after / before - 1.0
+        rows.append({
+            "name": name,
+            "baseline": before,
+            "current": after,
+            "change": change,
+            "regressed": change > threshold,
+        })
+    return rows
+
+
+def box_iou(a: Sequence[float], b: Sequence[float]) -> float:
+    if len(a) != 4 or len(b) != 4:
+        return 1.0 if len(a) == len(b) else 0.0
+    w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def print_table(rows: List[Dict], columns: Sequence[Tuple[str, str]]) -> None:
+    """
+    Print ``rows`` as an aligned text table; ``columns`` are (key, header) pairs.
+    """
+    def fmt(value):
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return "-" if value is None else str(value)
+
+    cells = [[fmt(row.get(key)) for key, _ in columns] for row in rows]
+    widths = [max([len(header)] + [len(r[i]) for r in cells]) for i, (_, header) in enumerate(columns)]
+    print("  ".join(header.ljust(w) for (_, header), w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(c.ljust(w) for c, w in zip(r, widths)))
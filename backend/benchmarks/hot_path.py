@@ -0,0 +1,215 @@
+"""
+Offline micro-benchmarks of the classification hot path.
+
+Synthetic images of several resolutions go through each stage on its own:
+OpenCV decode, the PIL ``preprocess_image`` pipeline, ``resize_to_model``,
+box drawing + JPEG/base64 encoding of ``analyze_image`` (full size and
+thumbnail). When the model file exists, it also measures
+``Classifier.predict_image``, ``predict_batch`` and ``batch_predict`` at
+several batch sizes, and end to end (decode, predict, annotate) per image.
+
+Results (p50/p95/p99 latency per call, throughput) are written as JSON and
+can be compared with a stored baseline; the exit code is 1 when a case got
+slower than the threshold allows.
+
+Run from ``backend/``::
+
+    python -m benchmarks.hot_path --output bench.json
+    python -m benchmarks.hot_path --baseline bench.json --threshold 0.15
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services import utils
+from app.services.rendering import annotate_image
+
+from benchmarks.common import compare_results, measure, print_table, summarize
+
+DEFAULT_RESOLUTIONS = "320x240,640x480,1280x720,1920x1080"
+DEFAULT_BATCH_SIZES = "1,4,8,16"
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    BGR test image that compresses like a photo: background gradient, a few
+    shaded "tomatoes" and mild noise (pure noise would make JPEG unrealistically large).
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    image = np.empty((height, width, 3), dtype=np.float32)
+    image[..., 0] = 60 + 80 * x
+    image[..., 1] = 90 + 60 * y
+    image[..., 2] = 120 + 40 * (x + y)
+    image = image.astype(np.uint8)
+    for _ in range(5):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(min(width, height) // 12, min(width, height) // 5))
+        color = tuple(int(c) for c in rng.integers(20, 255, 3))
+        cv2.circle(image, center, radius, color, -1, lineType=cv2.LINE_AA)
+    noise = rng.normal(0, 4, image.shape)
+    image = np.clip(image + noise, 0, 255).astype(np.uint8)
+    return cv2.GaussianBlur(image, (3, 3), 0)
+
+
+def parse_resolutions(value: str) -> List[Tuple[int, int]]:
+    return [tuple(int(v) for v in item.lower().split("x")) for item in value.split(",") if item]
+
+
+@contextlib.contextmanager
+def quiet():
+    # Chặn output còn lại (ví dụ từ ultralytics) để không làm rối bảng kết quả
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _annotate_case(frame: np.ndarray, max_size: int = None) -> Callable[[], Any]:
+    height, width = frame.shape[:2]
+    result = {
+        "classification": "Ripe",
+        "confidence": 91.5,
+        "bounding_box": [width // 4, height // 4, width * 3 // 4, height * 3 // 4],
+    }
+    # Như analyze_image: nhận ndarray BGR, chuyển màu / thu nhỏ nằm trong phần đo
+    return lambda: annotate_image(frame, result, max_size)
+
+
+def stage_cases(resolutions: List[Tuple[int, int]]) -> Dict[str, Tuple[Callable[[], Any], int]]:
+    """
+    Model-free cases: name -> (callable, items per call).
+    """
+    cases = {}
+    for width, height in resolutions:
+        frame = synthetic_image(width, height)
+        data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        res = f"{width}x{height}"
+        cases[f"decode/{res}"] = (lambda data=data: utils.decode_image(data), 1)
+        cases[f"preprocess_pil/{res}"] = (lambda data=data: utils.preprocess_image(data), 1)
+        cases[f"resize_to_model/{res}"] = (
+            lambda frame=frame: utils.resize_to_model(frame, settings.MODEL_INPUT_SIZE), 1)
+        cases[f"annotate_jpeg/{res}"] = (_annotate_case(frame), 1)
+        cases[f"annotate_thumbnail/{res}"] = (_annotate_case(frame, settings.THUMBNAIL_MAX_SIZE), 1)
+    return cases
+
+
+def model_cases(classifier, resolutions: List[Tuple[int, int]], batch_sizes: List[int]) -> Dict[str, Tuple[Callable[[], Any], int]]:
+    """
+    Cases that run the model: name -> (callable, items per call).
+    """
+    cases = {}
+    for width, height in resolutions:
+        frame = synthetic_image(width, height)
+        data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        res = f"{width}x{height}"
+        cases[f"predict_image/{res}"] = (lambda data=data: classifier.predict_image(data), 1)
+
+        def end_to_end(data=data):
+            # Như analyze_image (không tính HTTP): giải mã một lần, dự đoán, vẽ + mã hoá JPEG
+            decoded = utils.decode_image(data)
+            result = classifier.predict_image(decoded)
+            return annotate_image(decoded, result)
+
+        cases[f"end_to_end/{res}"] = (end_to_end, 1)
+
+    width, height = resolutions[len(resolutions) // 2]
+    frames = [synthetic_image(width, height, seed) for seed in range(max(batch_sizes))]
+    encoded = [cv2.imencode(".jpg", f)[1].tobytes() for f in frames]
+    for size in batch_sizes:
+        cases[f"predict_batch/bs{size}"] = (lambda size=size: classifier.predict_batch(frames[:size]), size)
+        cases[f"batch_predict/bs{size}"] = (lambda size=size: classifier.batch_predict(encoded[:size]), size)
+    return cases
+
+
+def metadata(args) -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "backend": args.backend,
+        "model": None if args.no_model else args.model,
+        "iterations": args.iterations,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="comma separated WxH")
+    parser.add_argument("--batch-sizes", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--model", default="models/best.pt")
+    parser.add_argument("--backend", default=settings.INFERENCE_BACKEND)
+    parser.add_argument("--no-model", action="store_true", help="only the model-free stages")
+    parser.add_argument("--only", default="", help="run only cases whose name contains this text")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, 0.10 = 10%%")
+    parser.add_argument("--metric", default="p50_ms", help="metric compared with the baseline")
+    args = parser.parse_args(argv)
+
+    resolutions = parse_resolutions(args.resolutions)
+    batch_sizes = [int(v) for v in args.batch_sizes.split(",") if v]
+
+    cases = stage_cases(resolutions)
+    if not args.no_model:
+        model_path = args.model if os.path.isabs(args.model) else os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), args.model)
+        if os.path.exists(model_path):
+            from app.services.classifier import Classifier
+            with quiet():
+                classifier = Classifier(model_path, backend=args.backend)
+            cases.update(model_cases(classifier, resolutions, batch_sizes))
+        else:
+            print(f"{model_path} not found, skipping model cases", file=sys.stderr)
+            args.no_model = True
+
+    results = {}
+    for name, (fn, items) in cases.items():
+        if args.only and args.only not in name:
+            continue
+        with quiet():
+            samples = measure(fn, args.iterations, args.warmup)
+        results[name] = summarize(samples, items)
+
+    print_table([{"name": name, **r} for name, r in results.items()], [
+        ("name", "case"), ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"), ("p99_ms", "p99 ms"),
+        ("throughput_ips", "items/s"),
+    ])
+
+    report = {"meta": metadata(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare_results(results, baseline["results"], args.threshold, args.metric)
+    print(f"\nCompared with {args.baseline} ({args.metric}, threshold {args.threshold:.0%}):")
+    print_table([{**row, "change": f"{row['change']:+.1%}", "regressed": "REGRESSED" if row["regressed"] else ""}
+                 for row in rows],
+                [("name", "case"), ("baseline", "baseline"), ("current", "current"), ("change", "change"),
+                 ("regressed", "")])
+    regressions = [row["name"] for row in rows if row["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
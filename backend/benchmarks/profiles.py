@@ -0,0 +1,120 @@
+"""
+Compare inference profiles on a folder of sample images.
+
+For every profile it reports per-image latency, batched throughput and how
+often the result agrees with the baseline profile (same class, box IoU,
+confidence difference), plus accuracy when the folder is labeled
+(``samples/<class name>/*.jpg``).
+
+Run from ``backend/``::
+
+    python -m benchmarks.profiles samples/ --profiles full,balanced,fast --json report.json
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.classifier import Classifier
+from app.services.profiles import all_profiles
+
+from benchmarks.common import box_iou, decode_all, load_images, percentiles, print_table
+
+
+def run_profile(classifier: Classifier, profile: str, frames, batch_size: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        classifier.predict_batch(frames[:batch_size], profile)
+
+    # Độ trễ từng ảnh (một ảnh mỗi lần gọi, như một request đơn lẻ)
+    latencies, results = [], []
+    for frame in frames:
+        started = time.perf_counter()
+        results.append(classifier.predict_batch([frame], profile)[0])
+        latencies.append((time.perf_counter() - started) * 1000.0)
+
+    # Throughput khi chạy theo batch
+    started = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        classifier.predict_batch(frames[i:i + batch_size], profile)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "profile": profile,
+        **classifier.get_profile(profile).to_dict(),
+        "latency_ms": {"mean": sum(latencies) / len(latencies), **percentiles(latencies)},
+        "throughput_ips": len(frames) / elapsed if elapsed > 0 else 0.0,
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], labels: List[Optional[str]]) -> None:
+    """
+    Add agreement with the baseline (and accuracy against labels) to ``report``.
+    """
+    same, ious, conf_diffs = 0, [], []
+    for ours, theirs in zip(report["results"], baseline["results"]):
+        if ours["classification"] == theirs["classification"]:
+            same += 1
+            if ours.get("bounding_box") and theirs.get("bounding_box"):
+                ious.append(box_iou(ours["bounding_box"], theirs["bounding_box"]))
+            conf_diffs.append(abs(ours["confidence"] - theirs["confidence"]))
+    report["agreement"] = same / len(report["results"])
+    report["mean_box_iou"] = sum(ious) / len(ious) if ious else None
+    report["mean_conf_diff"] = sum(conf_diffs) / len(conf_diffs) if conf_diffs else None
+
+    labeled = [(result, label) for result, label in zip(report["results"], labels) if label is not None]
+    if labeled:
+        report["accuracy"] = sum(r["classification"] == label for r, label in labeled) / len(labeled)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="sample images, optionally one sub-folder per class")
+    parser.add_argument("--profiles", default=",".join(all_profiles()), help="comma separated profile names")
+    parser.add_argument("--baseline", default="full", help="profile the others are compared to")
+    parser.add_argument("--model", default="models/best.pt")
+    parser.add_argument("--backend", default=settings.INFERENCE_BACKEND)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=None, help="use only the first N images")
+    parser.add_argument("--json", dest="json_path", help="also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    names = [args.baseline] + [n for n in args.profiles.split(",") if n and n != args.baseline]
+    samples = load_images(args.folder, args.limit)
+    frames = decode_all(samples)
+    labels = [label for _, label, _ in samples]
+    classifier = Classifier(args.model, backend=args.backend, profiles=names)
+
+    reports = [run_profile(classifier, name, frames, args.batch_size, args.warmup) for name in names]
+    for report in reports:
+        compare(report, reports[0], labels)
+
+    rows = [{
+        **report,
+        "p50": report["latency_ms"]["p50"],
+        "p95": report["latency_ms"]["p95"],
+        "speedup": reports[0]["latency_ms"]["p50"] / report["latency_ms"]["p50"],
+    } for report in reports]
+    print(f"{len(frames)} images, baseline '{args.baseline}', backend '{args.backend}'")
+    print_table(rows, [
+        ("profile", "profile"), ("imgsz", "imgsz"), ("precision", "precision"), ("conf", "conf"),
+        ("p50", "p50 ms"), ("p95", "p95 ms"), ("throughput_ips", "img/s"), ("speedup", "speedup"),
+        ("agreement", "agreement"), ("mean_box_iou", "box IoU"), ("accuracy", "accuracy"),
+    ])
+
+    summary = {
+        "images": len(frames),
+        "baseline": args.baseline,
+        "backend": args.backend,
+        "profiles": [{k: v for k, v in report.items() if k != "results"} for report in reports],
+    }
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
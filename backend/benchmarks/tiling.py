@@ -0,0 +1,145 @@
+"""
+Latency of tiled inference against single-shot inference on large images.
+
+For every resolution it measures ``Classifier.predict_image`` (the whole
+image resized to the model input) and ``Classifier.predict_tiled`` for each
+tile size / overlap, and reports p50/p95 latency, the number of tiles, the
+slowdown against single-shot and how many boxes each found.
+
+Without the model (``--no-model``) a stub detector stands in for the network,
+so only the tiling overhead is measured: cropping, batching and the global
+NMS merge.
+
+Run from ``backend/``::
+
+    python -m benchmarks.tiling --resolutions 1920x1080,3840x2160 --tile-sizes 640,960 --output tiling.json
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.backends import Detections
+from app.services.detection import DetectOptions
+from app.services.tiling import detect_tiled, tile_grid
+
+from benchmarks.common import measure, print_table, summarize
+from benchmarks.hot_path import metadata, parse_resolutions, quiet, synthetic_image
+
+DEFAULT_RESOLUTIONS = "1920x1080,3840x2160"
+
+
+def stub_predict(images: List[np.ndarray]) -> List[Detections]:
+    """
+    Stand-in for the model: 20 boxes per input, in that input's coordinates.
+    """
+    rng = np.random.default_rng(0)
+    outputs = []
+    for image in images:
+        height, width = image.shape[:2]
+        xy = rng.uniform(0, 1, (20, 2)) * [width * 0.9, height * 0.9]
+        boxes = np.concatenate([xy, xy + [width * 0.1, height * 0.1]], axis=1).astype(np.float32)
+        outputs.append(Detections(boxes, rng.uniform(0.3, 1, 20).astype(np.float32),
+                                  rng.integers(0, 3, 20).astype(np.int32)))
+    return outputs
+
+
+def _boxes(result: Dict[str, Any]) -> int:
+    return result.get("detections", {}).get("count", 0)
+
+
+def model_cases(classifier, frame: np.ndarray, tile_sizes: List[int], overlaps: List[float]):
+    options = DetectOptions(layout="arrays")
+    cases = {"single": (lambda: classifier.predict_image(frame, options=options), None)}
+    for tile_size in tile_sizes:
+        for overlap in overlaps:
+            cases[f"tiled_{tile_size}_{overlap:g}"] = (
+                lambda t=tile_size, o=overlap: classifier.predict_tiled(frame, options=options, tile_size=t, overlap=o),
+                (tile_size, overlap),
+            )
+    return cases
+
+
+def stub_cases(frame: np.ndarray, tile_sizes: List[int], overlaps: List[float]):
+    cases = {"single": (lambda: stub_predict([frame])[0], None)}
+    for tile_size in tile_sizes:
+        for overlap in overlaps:
+            cases[f"tiled_{tile_size}_{overlap:g}"] = (
+                lambda t=tile_size, o=overlap: detect_tiled(stub_predict, frame, t, o)[0],
+                (tile_size, overlap),
+            )
+    return cases
+
+
+def run(cases, frame: np.ndarray, iterations: int, warmup: int) -> List[Dict[str, Any]]:
+    height, width = frame.shape[:2]
+    rows = []
+    for name, (fn, tiling) in cases.items():
+        with quiet():
+            samples = measure(fn, iterations, warmup)
+            result = fn()
+        stats = summarize(samples)
+        rows.append({
+            "resolution": f"{width}x{height}",
+            "case": name,
+            "tiles": len(tile_grid(width, height, *tiling)) if tiling else 1,
+            "boxes": _boxes(result) if isinstance(result, dict) else len(result),
+            **stats,
+        })
+    single = rows[0]["p50_ms"]
+    for row in rows:
+        row["slowdown"] = row["p50_ms"] / single if single else None
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="comma separated WxH")
+    parser.add_argument("--tile-sizes", default=str(settings.TILE_SIZE))
+    parser.add_argument("--overlaps", default=str(settings.TILE_OVERLAP))
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--model", default="models/best.pt")
+    parser.add_argument("--backend", default=settings.INFERENCE_BACKEND)
+    parser.add_argument("--no-model", action="store_true", help="stub detector: tiling overhead only")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    tile_sizes = [int(v) for v in args.tile_sizes.split(",") if v]
+    overlaps = [float(v) for v in args.overlaps.split(",") if v]
+
+    classifier = None
+    if not args.no_model:
+        model_path = args.model if os.path.isabs(args.model) else os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), args.model)
+        if os.path.exists(model_path):
+            from app.services.classifier import Classifier
+            with quiet():
+                classifier = Classifier(model_path, backend=args.backend)
+        else:
+            print(f"{model_path} not found, measuring with the stub detector", file=sys.stderr)
+            args.no_model = True
+
+    rows = []
+    for width, height in parse_resolutions(args.resolutions):
+        frame = synthetic_image(width, height)
+        cases = (model_cases(classifier, frame, tile_sizes, overlaps) if classifier is not None
+                 else stub_cases(frame, tile_sizes, overlaps))
+        rows += run(cases, frame, args.iterations, args.warmup)
+
+    print_table(rows, [
+        ("resolution", "resolution"), ("case", "case"), ("tiles", "tiles"), ("p50_ms", "p50 ms"),
+        ("p95_ms", "p95 ms"), ("slowdown", "x single"), ("boxes", "boxes"),
+    ])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(args), "results": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
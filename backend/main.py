@@ -1,22 +1,61 @@
+import time
+
+# Mốc thời gian khởi động process, dùng để đo cold start (import + load model + warm-up)
+PROCESS_STARTED_AT = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from app.api.v1.endpoints import classify, auth, admin  # Đảm bảo các file này được định nghĩa đúng
-from app.database._init_db import _init_db  # Comment phần khởi tạo database
-from app.core.logger import get_logger  # Import get_logger thay vì setup_logging
+from app.database._init_db import _init_db
+from app.database.session import SessionLocal, dispose_engines
+from app.services.result_stats import result_stats
+from app.services.result_writer import result_writer
+from app.services.password_hasher import password_hasher
+from app.core.logger import get_logger, setup_logging
+from app.services.inference import inference_service
+from app.core.config import settings
+from app.core.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware
+
+
+# Cấu hình logging một lần cho cả app: queue + thread nền, không in trùng
+setup_logging()
+logger = get_logger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Khởi tạo cơ sở dữ liệu trong thread riêng, không chặn event loop
+    try:
+        await asyncio.to_thread(_init_db)
+        # Ghi kết quả phân loại xuống DB ở thread nền, theo lô
+        if settings.RESULT_PERSIST_ENABLED:
+            # Nạp bộ đếm thống kê từ các lần rollup trước
+            await asyncio.to_thread(result_stats.load, SessionLocal)
+            result_writer.start()
+    except Exception as e:
+        logger.error(f"Database initialization failed: {e}")
+
+    # Load + warm-up model chạy nền; /ready chỉ trả 200 khi đã xong
+    startup_task = asyncio.create_task(inference_service.start(PROCESS_STARTED_AT))
+    yield
+    startup_task.cancel()
+    await inference_service.shutdown()
+    password_hasher.shutdown(wait=False)
+    # Ghi nốt các kết quả còn trong hàng đợi trước khi đóng kết nối
+    await asyncio.to_thread(result_writer.stop)
+    await dispose_engines()
+
 
 # Tạo ứng dụng FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
 
-# Cấu hình logger
-logger = get_logger(__name__)
-
-# Khởi tạo cơ sở dữ liệu
-_init_db()  # Comment phần khởi tạo database
-
 # Đăng ký các router của API
 app.include_router(classify.router, prefix="/classify", tags=["classification"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -29,10 +68,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Kết quả của /classify/analyze_image?mode=jpeg nằm trong header
+    expose_headers=["X-Classification", "X-Confidence", "X-Bounding-Box", "X-Image-Size", "X-Detections",
+                    "X-Next-Cursor"],
 )
+# Đếm request / đo latency theo route cho /metrics
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/health", tags=["health"])
+def health():
+    # Liveness: process còn sống, không phụ thuộc model hay database
+    return {"status": "ok"}
+
+
+@app.get("/ready", tags=["health"])
+def ready():
+    # Readiness: chỉ sẵn sàng khi model đã load và chạy xong warm-up inference
+    status = inference_service.status()
+    return JSONResponse(status_code=200 if inference_service.ready else 503, content=status)
+
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics():
+    # Prometheus text format: latency từng stage, request đang xử lý, websocket, độ sâu hàng đợi
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 
 # Khởi động ứng dụng với uvicorn (có thể chạy từ command line)
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting FastAPI application...")  # Ghi log khi ứng dụng bắt đầu chạy
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)  # giữ cấu hình logging ở trên
@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Test không cần MySQL: dùng file SQLite tạm (engine sync và async cùng thấy dữ liệu)
+os.environ.setdefault(
+    "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="thptht-test-"), "test.db")
+)
+
+from app.services.backends import Detections, InferenceBackend  # noqa: E402  (sau DATABASE_URL)
+
+NAMES = {0: "ripe", 1: "unripe", 2: "rotten"}
+RESULT = {"classification": "ripe", "class_id": 0, "confidence": 90.0, "bounding_box": [0, 0, 8, 8]}
+
+
+class FakeInferenceService:
+    """
+    Stand-in for ``inference_service`` in the classify endpoints: every image
+    goes to ``predict(image, profile, options)``, which returns its result dict.
+    """
+    ready = True
+
+    def __init__(self, predict=None, class_names=("ripe", "unripe", "rotten")):
+        self.predict_fn = predict or (lambda image, profile, options: dict(RESULT))
+        self.class_names = list(class_names)
+        self.options = []  # options của từng lần gọi
+        self.batch_sizes = []  # số ảnh của từng lần gọi predict_many
+
+    def resolve_profile(self, profile):
+        return profile or "full"
+
+    async def predict(self, image, profile=None, options=None):
+        self.options.append(options)
+        return self.predict_fn(image, profile, options)
+
+    async def predict_image(self, data, image=None, profile=None, options=None):
+        return await self.predict(image if image is not None else data, profile, options)
+
+    async def predict_many(self, frames, profile=None, options=None):
+        self.options.append(options)
+        self.batch_sizes.append(len(frames))
+        return [self.predict_fn(frame, profile, options) for frame in frames]
+
+
+@pytest.fixture
+def classify_client(monkeypatch):
+    """
+    Factory for a TestClient on the /classify router: ``classify_client(predict)``
+    serves it with a FakeInferenceService around ``predict``, or
+    ``classify_client(service=...)`` with any service object. The service is
+    ``client.service``.
+    """
+    from app.api.v1.endpoints import classify
+
+    def make(predict=None, service=None, **kwargs) -> TestClient:
+        service = service if service is not None else FakeInferenceService(predict, **kwargs)
+        monkeypatch.setattr(classify, "inference_service", service)
+        app = FastAPI()
+        app.include_router(classify.router, prefix="/classify")
+        client = TestClient(app)
+        client.service = service
+        return client
+
+    return make
+
+
+class FakeBackend(InferenceBackend):
+    """
+    Backend returning fixed ``detections`` for every image, or whatever
+    ``detections(images)`` returns when it is a callable.
+    """
+    name = "fake"
+
+    def __init__(self, detections, names=None):
+        self.detections = detections
+        self.names = dict(names or NAMES)
+        self.calls = []  # tham số của từng lần predict
+        self.inputs = []  # mọi ảnh đã đưa vào model
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.7, max_det=300, classes=None):
+        self.calls.append({"conf": conf, "iou": iou, "max_det": max_det, "classes": classes})
+        self.inputs += images
+        if callable(self.detections):
+            return self.detections(images)
+        return [self.detections for _ in images]
+
+
+@pytest.fixture
+def fake_classifier(monkeypatch, tmp_path):
+    """
+    Factory for a real Classifier ("full" profile) on a FakeBackend:
+    ``fake_classifier(detections, names)``. The backend is ``classifier.backend``.
+    """
+    from app.services import classifier as classifier_module
+
+    def make(detections: Detections, names=None) -> classifier_module.Classifier:
+        backend = FakeBackend(detections, names)
+        monkeypatch.setattr(classifier_module, "create_backend", lambda name, path, precision="fp32": backend)
+        weights = tmp_path / "fake.pt"
+        weights.write_bytes(b"")
+        return classifier_module.Classifier(str(weights), backend=FakeBackend.name, profiles=["full"])
+
+    return make
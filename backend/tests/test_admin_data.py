@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app.api.v1.endpoints import admin
+from app.database._init_db import _init_db
+from app.database.session import SessionLocal
+from app.models.classification_result import ClassificationResult
+
+SOURCE = "admin-data-test"
+START = datetime(2024, 1, 1)
+
+
+def _client():
+    _init_db()
+    with SessionLocal() as db:
+        db.execute(delete(ClassificationResult).where(ClassificationResult.source == SOURCE))
+        db.add_all([
+            ClassificationResult(result="ripe" if i % 2 else "unripe", confidence=50.0 + i, source=SOURCE,
+                                 created_at=START + timedelta(hours=i))
+            for i in range(25)
+        ])
+        db.commit()
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+    return TestClient(app)
+
+
+def test_data_pages_with_cursor_header_until_exhausted():
+    client = _client()
+    seen, cursor = [], None
+    while True:
+        params = {"source": SOURCE, "limit": 10, **({"cursor": cursor} if cursor else {})}
+        res = client.get("/admin/data", params=params)
+        assert res.status_code == 200
+        seen += [row["id"] for row in res.json()]
+        cursor = res.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert len(seen) == 25
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_data_filters_by_class_confidence_and_time():
+    client = _client()
+    res = client.get("/admin/data", params={
+        "source": SOURCE, "classification": "ripe", "min_confidence": 60,
+        "since": (START + timedelta(hours=5)).isoformat(), "until": (START + timedelta(hours=20)).isoformat(),
+    })
+
+    rows = res.json()
+    assert {row["result"] for row in rows} == {"ripe"}
+    assert [row["confidence"] for row in rows] == [69.0, 67.0, 65.0, 63.0, 61.0]
+    assert "x-next-cursor" not in res.headers
+
+
+def test_data_rejects_bad_cursor():
+    assert _client().get("/admin/data", params={"cursor": "!!"}).status_code == 400
+
+
+def test_export_streams_every_row_in_chunks(monkeypatch):
+    client = _client()
+    monkeypatch.setattr(admin.settings, "ADMIN_EXPORT_CHUNK_SIZE", 4)
+
+    res = client.get("/admin/data/export", params={"source": SOURCE, "format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    assert len(rows) == 25
+    assert rows[0]["source"] == SOURCE
+
+    res = client.get("/admin/data/export", params={"source": SOURCE, "format": "ndjson", "classification": "unripe"})
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert len(lines) == 13
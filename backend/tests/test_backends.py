@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services.backends import batched_nms, create_backend, letterbox, nms
+
+
+def test_nms_suppresses_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+
+    assert nms(boxes, scores, 0.5).tolist() == [0, 2]
+
+
+def test_batched_nms_keeps_overlapping_boxes_of_other_classes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11]], dtype=np.float32)
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+
+    assert batched_nms(boxes, scores, np.array([0, 1]), 0.5).tolist() == [0, 1]
+    assert batched_nms(boxes, scores, np.array([0, 0]), 0.5).tolist() == [0]
+
+
+def test_letterbox_pads_to_square():
+    image = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    padded, ratio, (left, top) = letterbox(image, 640)
+
+    assert padded.shape == (640, 640, 3)
+    assert ratio == 2.0
+    assert (left, top) == (0, 80)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_backend("tensorrt", "models/best.pt")
+
+
+def _box_iou(a, b):
+    w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def _tiny_detector(path):
+    """
+    Save a randomly initialised 3-class YOLOv8n as ``path``. BatchNorm statistics
+    are calibrated on random batches and the class bias raised, so noise images
+    already give a few hundred boxes with spread-out scores.
+    """
+    import torch
+    from ultralytics import YOLO
+    from ultralytics.nn.tasks import DetectionModel
+
+    torch.manual_seed(0)
+    model = DetectionModel("yolov8n.yaml", nc=3, verbose=False)
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.momentum = 1.0
+    model.train()
+    with torch.no_grad():
+        model(torch.rand(4, 3, 320, 320))
+    for conv in model.model[-1].cv3:
+        conv[-1].bias.data += 5.0
+    model.eval()
+    model.names = {0: "ripe", 1: "unripe", 2: "rotten"}
+
+    wrapper = YOLO("yolov8n.yaml")
+    wrapper.model = model
+    wrapper.save(str(path))
+
+
+@pytest.fixture(scope="module")
+def parity_weights(tmp_path_factory):
+    # Export vào thư mục tạm để không đụng tới models/
+    pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime")
+    weights = tmp_path_factory.mktemp("parity") / "parity.pt"
+    model_path = os.environ.get("PARITY_MODEL")
+    if model_path:
+        weights.write_bytes(open(model_path, "rb").read())
+    else:
+        _tiny_detector(weights)
+    return weights
+
+
+def test_onnx_matches_torch(parity_weights):
+    """
+    Parity of the ONNX Runtime backend with the torch backend on the same weights:
+    a tiny synthetic detector, or the weights in $PARITY_MODEL.
+    """
+    conf = float(os.environ.get("PARITY_CONF", "0.25"))
+    torch_backend = create_backend("torch", str(parity_weights))
+    onnx_backend = create_backend("onnx", str(parity_weights))
+    assert onnx_backend.names == torch_backend.names
+
+    rng = np.random.default_rng(0)
+    images = [
+        rng.integers(0, 255, (480, 640, 3), dtype=np.uint8),
+        rng.integers(0, 255, (640, 360, 3), dtype=np.uint8),
+    ]
+    for image in images:
+        expected = torch_backend.predict([image], conf=conf)[0]
+        actual = onnx_backend.predict([image], conf=conf)[0]
+        if "PARITY_MODEL" not in os.environ:
+            assert len(expected) > 0
+        assert abs(len(actual) - len(expected)) <= max(1, len(expected) // 50)
+        # 10 box tốt nhất của torch đều có box tương ứng (cùng class, điểm gần bằng) trong kết quả ONNX
+        for index in np.argsort(-expected.scores)[:10]:
+            same_class = actual.class_ids == expected.class_ids[index]
+            assert same_class.any()
+            ious = np.array([_box_iou(box, expected.boxes[index]) for box in actual.boxes[same_class]])
+            match = ious.argmax()
+            assert ious[match] > 0.9
+            assert abs(float(actual.scores[same_class][match]) - float(expected.scores[index])) < 0.02
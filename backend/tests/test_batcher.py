@@ -0,0 +1,167 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import pytest
+from app.services.batcher import MicroBatcher
+from app.services.inference import ModelNotReadyError
+from app.services.inference_executor import InferenceExecutor, InferenceBusyError, process_predict_batch
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+    await batcher.close()
+
+    # Mỗi caller nhận đúng kết quả của mình, và chỉ có một lần gọi model
+    assert results == [0, 2, 4, 6, 8]
+    assert len(calls) == 1
+    assert batcher.stats()["batch_size"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_is_capped_at_max_batch_size():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(len(items))
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=3, max_wait_ms=50)
+    await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+    await batcher.close()
+
+    assert max(calls) <= 3
+    assert sum(calls) == 7
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_propagate_to_every_caller():
+    def batch_fn(items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=5)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+    await batcher.close()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_batch_still_settles_every_caller():
+    async def runner(fn, items):
+        raise asyncio.CancelledError()
+
+    batcher = MicroBatcher(lambda items: items, max_batch_size=4, max_wait_ms=5, runner=runner)
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True), timeout=2)
+    await batcher.close()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_close_fails_items_still_waiting_in_queue():
+    release = threading.Event()
+
+    def slow(items):
+        release.wait(timeout=5)
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=50)
+    running = asyncio.ensure_future(batcher.submit(1))
+    await asyncio.sleep(0.01)
+    # Batch đầu đang chạy: các item sau nằm trong queue / đang được gom
+    waiting = [asyncio.ensure_future(batcher.submit(i)) for i in (2, 3)]
+    await asyncio.sleep(0.01)
+
+    await batcher.close()
+    results = await asyncio.wait_for(asyncio.gather(*waiting, return_exceptions=True), timeout=2)
+    assert all(isinstance(r, ModelNotReadyError) for r in results)
+    release.set()
+    assert await running == 1
+
+
+@pytest.mark.asyncio
+async def test_full_executor_rejects_with_busy_error():
+    release = threading.Event()
+
+    def slow(items):
+        release.wait(timeout=5)
+        return items
+
+    executor = InferenceExecutor(kind="thread", max_workers=1, max_queue=1)
+    first = asyncio.ensure_future(executor.run(slow, [1]))
+    second = asyncio.ensure_future(executor.run(slow, [2]))
+    await asyncio.sleep(0.01)
+
+    # 1 job đang chạy + 1 job chờ => job thứ ba bị từ chối ngay
+    with pytest.raises(InferenceBusyError):
+        await executor.run(slow, [3])
+
+    release.set()
+    assert await first == [1]
+    assert await second == [2]
+    executor.shutdown()
+
+
+class _FakeClassifier:
+    def share_memory(self):
+        pass
+
+    def predict_batch(self, images):
+        return [{"classification": "ok", "pid": os.getpid()} for _ in images]
+
+
+def _crash_once(marker):
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "recovered"
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+async def test_process_pool_uses_forked_model_and_restarts_dead_workers(tmp_path):
+    executor = InferenceExecutor(kind="process", max_workers=2, classifier=_FakeClassifier(), threads_per_worker=1)
+    executor.start()
+    try:
+        results = await executor.run(process_predict_batch, [1, 2])
+        assert [r["classification"] for r in results] == ["ok", "ok"]
+        assert results[0]["pid"] != os.getpid()
+
+        # Worker chết giữa chừng => pool được fork lại và job chạy lại một lần
+        assert await executor.run(_crash_once, str(tmp_path / "crashed")) == "recovered"
+        assert executor.restarts == 1
+    finally:
+        executor.shutdown()
+
+
+def _slow_echo(value):
+    import time
+    time.sleep(0.2)
+    return value
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+async def test_dead_worker_restarts_pool_once_and_retries_sibling_jobs(tmp_path):
+    executor = InferenceExecutor(kind="process", max_workers=2, classifier=_FakeClassifier(), threads_per_worker=1)
+    executor.start()
+    try:
+        # Job 1 làm chết worker trong khi các job khác đang chạy/chờ trên cùng pool
+        jobs = [executor.run(_slow_echo, i) for i in range(3)]
+        jobs.insert(1, executor.run(_crash_once, str(tmp_path / "crashed")))
+        results = await asyncio.wait_for(asyncio.gather(*jobs, return_exceptions=True), timeout=20)
+
+        assert results == [0, "recovered", 1, 2]
+        assert executor.restarts == 1
+    finally:
+        executor.shutdown()
@@ -0,0 +1,40 @@
+import json
+
+from benchmarks import hot_path
+from benchmarks.common import compare_results, summarize
+
+
+def test_summarize_reports_percentiles_and_throughput():
+    stats = summarize([0.01] * 99 + [0.1], items_per_call=4)
+
+    assert stats["p50_ms"] == 10.0
+    assert stats["p99_ms"] > stats["p95_ms"] >= stats["p50_ms"]
+    assert round(stats["throughput_ips"]) == round(400 / 1.09)
+
+
+def test_compare_results_flags_regressions_past_threshold():
+    baseline = {"a": {"p50_ms": 10.0, "throughput_ips": 100.0}, "b": {"p50_ms": 10.0, "throughput_ips": 100.0}}
+    current = {"a": {"p50_ms": 10.5, "throughput_ips": 95.0}, "b": {"p50_ms": 13.0, "throughput_ips": 70.0},
+               "new": {"p50_ms": 1.0}}
+
+    by_latency = {row["name"]: row["regressed"] for row in compare_results(current, baseline, 0.10)}
+    assert by_latency == {"a": False, "b": True}
+    by_throughput = {row["name"]: row["regressed"]
+                     for row in compare_results(current, baseline, 0.10, "throughput_ips")}
+    assert by_throughput == {"a": False, "b": True}
+
+
+def test_hot_path_writes_results_and_fails_on_regression(tmp_path):
+    output = tmp_path / "bench.json"
+    args = ["--no-model", "--iterations", "2", "--warmup", "0", "--resolutions", "64x48"]
+    assert hot_path.main(args + ["--output", str(output)]) == 0
+
+    report = json.loads(output.read_text())
+    assert {"decode/64x48", "preprocess_pil/64x48", "resize_to_model/64x48", "annotate_jpeg/64x48"} <= set(
+        report["results"])
+
+    # Baseline nhanh hơn nhiều lần => phải báo regression
+    for stats in report["results"].values():
+        stats["p50_ms"] /= 1000.0
+    output.write_text(json.dumps(report))
+    assert hot_path.main(args + ["--baseline", str(output)]) == 1
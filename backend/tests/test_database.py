@@ -0,0 +1,47 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from sqlalchemy.pool import StaticPool
+
+from app.database import session
+from app.database._init_db import _init_db
+from app.models.user import User
+
+
+def test_async_url_maps_sync_drivers():
+    assert session.async_url("mysql+mysqldb://u:p@db:3306/app") == "mysql+aiomysql://u:p@db:3306/app"
+    assert session.async_url("sqlite:///./local.db") == "sqlite+aiosqlite:///./local.db"
+
+
+def test_engine_options_size_pool_only_for_server_databases(monkeypatch):
+    monkeypatch.setattr(session.settings, "DB_POOL_SIZE", 12)
+    options = session.engine_options("mysql+mysqldb://u:p@db/app")
+    assert options["pool_size"] == 12
+    assert options["pool_pre_ping"] is True
+
+    memory = session.engine_options("sqlite://")
+    assert "pool_size" not in memory
+    assert memory["poolclass"] is StaticPool
+
+
+def test_init_db_creates_model_tables():
+    _init_db()
+    tables = inspect(session.engine).get_table_names()
+    assert {"user", "classification_results"} <= set(tables)
+
+
+def test_async_admin_endpoint_reads_rows_written_by_sync_session():
+    from app.api.v1.endpoints import admin
+
+    _init_db()
+    with session.SessionLocal() as db:
+        db.query(User).filter(User.username == "async-reader").delete()
+        db.add(User(username="async-reader", email="async@example.com", hashed_password="x", role="user"))
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+    res = TestClient(app).get("/admin/users/search", params={"search_term": "async-rea"})
+
+    assert res.status_code == 200
+    assert [user["username"] for user in res.json()] == ["async-reader"]
@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.backends import Detections
+from app.services.detection import DetectOptions, format_detections, resolve_classes
+from app.services.inference import InferenceService
+from app.services.rendering import result_boxes
+
+NAMES = {0: "ripe", 1: "unripe", 2: "rotten"}
+DETECTIONS = Detections(
+    boxes=np.array([[10, 10, 50, 50], [100, 20, 140, 60], [200, 30, 260, 90]], dtype=np.float32),
+    scores=np.array([0.5, 0.9, 0.7], dtype=np.float32),
+    class_ids=np.array([0, 1, 0], dtype=np.int32),
+)
+
+
+def test_format_detections_arrays_sorted_and_scaled():
+    out = format_detections(DETECTIONS, NAMES, scale=0.5)
+
+    assert out == {
+        "count": 3,
+        "names": {0: "ripe", 1: "unripe"},
+        "class_ids": [1, 0, 0],
+        "confidences": [90.0, 70.0, 50.0],
+        "boxes": [[200, 40, 280, 120], [400, 60, 520, 180], [20, 20, 100, 100]],
+    }
+
+
+def test_format_detections_objects_layout():
+    out = format_detections(DETECTIONS, NAMES, layout="objects")
+
+    assert out["count"] == 3
+    assert out["boxes"][0] == {"classification": "unripe", "class_id": 1, "confidence": 90.0,
+                               "bounding_box": [100, 20, 140, 60]}
+
+
+def test_resolve_classes_accepts_names_ids_and_lists():
+    names = ["ripe", "unripe", "rotten"]
+    assert resolve_classes(None, names) is None
+    assert resolve_classes(["rotten", "0"], names) == (0, 2)
+    assert resolve_classes(["ripe,unripe"], names) == (0, 1)
+    with pytest.raises(ValueError):
+        resolve_classes(["bruised"], names)
+
+
+def test_classifier_passes_request_parameters_to_model(fake_classifier):
+    classifier = fake_classifier(DETECTIONS, NAMES)
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+
+    default = classifier.predict_image(image)
+    assert "detections" not in default
+    assert classifier.backend.calls[-1]["conf"] == 0.25
+
+    options = DetectOptions(conf=0.6, iou=0.5, max_det=5, classes=(0,), layout="arrays")
+    result = classifier.predict_batch([image], options=options)[0]
+    assert classifier.backend.calls[-1] == {"conf": 0.6, "iou": 0.5, "max_det": 5, "classes": (0,)}
+    assert result["classification"] == "unripe"
+    assert result["detections"]["count"] == 3
+
+
+def test_result_boxes_reads_every_layout():
+    best = {"classification": "ripe", "confidence": 80.0, "bounding_box": [1, 2, 3, 4]}
+    assert result_boxes(best) == [("ripe", 80.0, [1, 2, 3, 4])]
+    for layout in ("arrays", "objects"):
+        result = {**best, "detections": format_detections(DETECTIONS, NAMES, layout=layout)}
+        assert [box[0] for box in result_boxes(result)] == ["unripe", "ripe", "ripe"]
+
+
+def test_options_with_unknown_layout_are_rejected():
+    with pytest.raises(ValueError):
+        DetectOptions(layout="table")
+
+
+def _predict_with_detections(image, profile, options):
+    result = {"classification": "unripe", "class_id": 1, "confidence": 90.0, "bounding_box": [100, 20, 140, 60]}
+    if options is not None and options.layout:
+        result["detections"] = format_detections(DETECTIONS, NAMES, layout=options.layout)
+    return result
+
+
+def test_analyze_image_detection_parameters(classify_client):
+    client = classify_client(_predict_with_detections)
+    service = client.service
+    upload = {"file": ("a.jpg", cv2.imencode(".jpg", np.zeros((120, 300, 3), np.uint8))[1].tobytes(), "image/jpeg")}
+
+    res = client.post("/classify/analyze_image", files=upload, params={"mode": "json"})
+    assert service.options[-1] is None and "detections" not in res.json()["data"]
+
+    res = client.post("/classify/analyze_image", files=upload, params={
+        "mode": "json", "detections": "arrays", "conf": 0.4, "classes": ["ripe", "2"]})
+    assert service.options[-1] == DetectOptions(conf=0.4, classes=(0, 2), layout="arrays")
+    assert res.json()["data"]["detections"]["count"] == 3
+
+    res = client.post("/classify/analyze_image", files=upload, params={"mode": "jpeg", "detections": "objects"})
+    assert res.headers["x-detections"] == "3"
+
+    assert client.post("/classify/analyze_image", files=upload, params={"classes": "bruised"}).status_code == 400
+
+
+class _OptionsClassifier:
+    profiles = {"full": None}
+
+    def predict_batch(self, images, profile=None, options=None):
+        result = {"classification": "unripe", "confidence": 90.0, "bounding_box": [100, 20, 140, 60]}
+        if options is not None and options.layout:
+            result["detections"] = format_detections(DETECTIONS, NAMES, layout=options.layout)
+        return [dict(result) for _ in images]
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_cache_hits_respect_detection_options():
+    service = InferenceService(classifier_factory=_OptionsClassifier)
+    await service.start()
+    service.cache.phash_distance = 4
+    image = np.tile(np.arange(64, dtype=np.uint8), (64, 1))[..., None].repeat(3, axis=2)
+
+    plain = await service.predict_image(b"first", image)
+    detailed = await service.predict_image(b"second", image, options=DetectOptions(layout="arrays"))
+    again = await service.predict_image(b"third", image)
+
+    assert "detections" not in plain and "detections" not in again
+    assert detailed["detections"]["count"] == 3
+    assert service.cache.stats()["phash_hits"] == 1  # chỉ "third" trùng với "first"
+    await service.shutdown()
@@ -0,0 +1,83 @@
+import io
+import json
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import UploadFile
+
+from app.api.v1.endpoints import classify
+from app.services import image_batch
+
+
+def _jpeg(width=64, height=48):
+    return cv2.imencode(".jpg", np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+
+
+def _zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_iter_upload_images_expands_zip_and_skips_non_images():
+    archive = _zip({"a.jpg": _jpeg(), "dir/b.png": b"x", "notes.txt": b"hi", "__MACOSX/._a.jpg": b""})
+    uploads = [("one.jpg", io.BytesIO(_jpeg())), ("set.zip", io.BytesIO(archive))]
+
+    items = list(image_batch.iter_upload_images(uploads, max_bytes=1 << 20))
+    assert [name for name, _, _ in items] == ["one.jpg", "set.zip/a.jpg", "set.zip/dir/b.png"]
+
+
+def test_chunk_reader_marks_bad_images_and_stops_at_limit():
+    images = iter([(f"{i}.jpg", _jpeg() if i != 1 else b"garbage", None) for i in range(5)])
+    reader = image_batch.ChunkReader(images, chunk_size=2, max_images=3, workers=2)
+
+    first = reader.read_chunk()
+    assert [item.index for item in first] == [0, 1]
+    assert first[0].frame.shape == (48, 64, 3)
+    assert first[1].error == "Cannot decode image"
+    assert [item.index for item in reader.read_chunk()] == [2]
+    assert reader.read_chunk() == []
+    assert reader.truncated
+    reader.close()
+
+
+def test_analyze_batch_streams_results_per_chunk(classify_client):
+    client = classify_client()
+
+    files = [
+        ("files", ("a.jpg", _jpeg(), "image/jpeg")),
+        ("files", ("bad.jpg", b"not an image", "image/jpeg")),
+        ("files", ("set.zip", _zip({f"{i}.jpg": _jpeg(32, 16) for i in range(3)}), "application/zip")),
+    ]
+    res = client.post("/classify/analyze_batch?batch_size=2", files=files)
+
+    assert res.status_code == 200
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    images, summary = lines[:-1], lines[-1]
+    assert [line["index"] for line in images] == [0, 1, 2, 3, 4]
+    assert images[1]["error"] == "Cannot decode image"
+    assert images[2]["filename"] == "set.zip/0.jpg"
+    assert images[2]["image_size"] == [32, 16]
+    assert client.service.batch_sizes == [1, 2, 1]
+    assert summary == {**summary, "type": "summary", "images": 5, "errors": 1, "truncated": False}
+
+
+@pytest.mark.asyncio
+async def test_analyze_batch_reads_uploads_after_fastapi_closed_them(classify_client):
+    classify_client()  # gọi thẳng handler, chỉ cần fake inference_service
+    uploads = [UploadFile(io.BytesIO(_jpeg()), filename=name) for name in ("a.jpg", "b.jpg")]
+    detection = classify.DetectionQuery(None, None, None, None, None)
+
+    response = await classify.analyze_batch(uploads, batch_size=1, profile=None, detection=detection)
+    # FastAPI < 0.118 đóng UploadFile ngay khi handler trả về, trước khi stream chạy
+    for upload in uploads:
+        await upload.close()
+    body = "".join([chunk async for chunk in response.body_iterator])
+
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert [line.get("classification") for line in lines[:-1]] == ["ripe", "ripe"]
+    assert lines[-1]["errors"] == 0
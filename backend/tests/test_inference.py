@@ -0,0 +1,34 @@
+import pytest
+from app.services.inference import InferenceService, ModelNotReadyError
+
+
+class _FakeClassifier:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def predict_batch(self, images):
+        if self.fail:
+            return [{"classification": "Error", "confidence": 0.0, "bounding_box": [], "error": "boom"}]
+        return [{"classification": "ripe", "confidence": 99.0, "bounding_box": []} for _ in images]
+
+
+@pytest.mark.asyncio
+async def test_service_is_not_ready_until_warm_up_completes():
+    service = InferenceService(classifier_factory=_FakeClassifier)
+    with pytest.raises(ModelNotReadyError):
+        await service.predict(b"image")
+
+    await service.start()
+    assert service.ready
+    assert {"model_load_seconds", "warmup_seconds", "cold_start_seconds"} <= set(service.status())
+    assert (await service.predict(b"image"))["classification"] == "ripe"
+    await service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_failed_warm_up_keeps_service_unready():
+    service = InferenceService(classifier_factory=lambda: _FakeClassifier(fail=True))
+    await service.start()
+    assert service.state == "failed"
+    assert "boom" in service.status()["error"]
+    await service.shutdown()
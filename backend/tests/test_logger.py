@@ -0,0 +1,77 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from app.core import logger as app_logger
+from app.core.logger import DroppingQueueHandler, JsonFormatter, KeyValueFormatter, LogSampler
+
+
+def test_setup_is_idempotent():
+    try:
+        app_logger.get_logger("a")
+        app_logger.get_logger("b")
+        app_logger.setup_logging()
+        root = logging.getLogger()
+        assert sum(isinstance(h, DroppingQueueHandler) for h in root.handlers) == 1
+        assert not logging.getLogger("a").handlers and not logging.getLogger("b").handlers
+    finally:
+        app_logger.shutdown_logging()
+        for handler in list(logging.getLogger().handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                logging.getLogger().removeHandler(handler)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.makeLogRecord({"msg": "frame"})
+    handler.emit(record)
+    handler.emit(record)
+    assert handler.dropped == 1
+
+
+def test_formatters_include_structured_fields():
+    record = logging.makeLogRecord({"name": "camera", "levelname": "INFO", "msg": "closed",
+                                    "frames": 12, "mode": "binary"})
+    assert KeyValueFormatter("%(message)s").format(record) == "closed frames=12 mode=binary"
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "closed" and payload["frames"] == 12
+
+
+def test_sampler_limits_events_per_key():
+    sampler = LogSampler(every=10)
+    allowed = [sampler.allow("frame") for _ in range(25)]
+    assert [i for i, a in enumerate(allowed) if a is not None] == [0, 10, 20]
+    assert allowed[10] == 9
+    assert sampler.allow("other") == 0
+
+    timed = LogSampler(interval=60.0)
+    assert timed.allow("frame") == 0
+    assert all(timed.allow("frame") is None for _ in range(100))
+
+
+def _log_from_worker():
+    logging.getLogger("app.worker").warning("logged in worker %d", os.getpid())
+    return os.getpid()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_forked_worker_logs_are_emitted(capfd):
+    app_logger.setup_logging(force=True)
+    try:
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            pid = pool.submit(_log_from_worker).result(timeout=30)
+        # Process cha vẫn đi qua queue như cũ
+        assert any(isinstance(h, DroppingQueueHandler) for h in logging.getLogger().handlers)
+    finally:
+        app_logger.shutdown_logging()
+        for handler in list(logging.getLogger().handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                logging.getLogger().removeHandler(handler)
+
+    assert f"logged in worker {pid}" in capfd.readouterr().err
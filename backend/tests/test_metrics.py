@@ -0,0 +1,56 @@
+from fastapi import FastAPI
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import (
+    DB_QUERY_SECONDS, HTTP_REQUESTS, REGISTRY, Counter, Gauge, Histogram, MetricsMiddleware, Registry,
+    instrument_engine,
+)
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    counter = registry.register(Counter("jobs_total", "Jobs", ("kind",)))
+    registry.register(Gauge("depth", "Queue depth", fn=lambda: 3))
+    histogram = registry.register(Histogram("latency_seconds", "Latency", [0.1, 1.0], ("stage",)))
+
+    counter.labels(kind='a"b').inc(2)
+    histogram.labels(stage="decode").observe(0.05)
+    histogram.labels(stage="decode").observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE jobs_total counter" in lines
+    assert 'jobs_total{kind="a\\"b"} 2' in lines
+    assert "depth 3" in lines
+    assert 'latency_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="decode",le="+Inf"} 2' in lines
+    assert 'latency_seconds_count{stage="decode"} 2' in lines
+
+
+def test_middleware_labels_requests_and_db_queries_by_route_template():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(REGISTRY.render(), media_type="text/plain")
+
+    client = TestClient(app)
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+
+    assert HTTP_REQUESTS.labels(method="GET", route="/items/{item_id}", status="200").value == 2
+    assert DB_QUERY_SECONDS.labels(route="/items/{item_id}", operation="SELECT").snapshot()["count"] == 2
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 2' in body
+    assert "http_requests_in_flight 1" in body  # chính request /metrics
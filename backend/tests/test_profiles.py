@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.inference import InferenceService
+from app.services.profiles import InferenceProfile, UnknownProfileError, all_profiles, get_profile
+
+
+def test_builtin_and_configured_profiles(monkeypatch):
+    monkeypatch.setattr(settings, "INFERENCE_PROFILES", {
+        "balanced": {"conf": 0.4},
+        "tiny": {"imgsz": 256, "precision": "int8"},
+    })
+    monkeypatch.setattr(settings, "INFERENCE_PROFILES_ENABLED", ["balanced", "tiny"])
+
+    profiles = all_profiles()
+    assert profiles["balanced"] == InferenceProfile("balanced", 416, "fp32", 0.4)
+    assert profiles["tiny"].imgsz == 256 and profiles["tiny"].precision == "int8"
+    assert get_profile().name == settings.INFERENCE_PROFILE
+    assert get_profile("tiny").name == "tiny"
+
+    with pytest.raises(UnknownProfileError):
+        get_profile("fast")  # có sẵn nhưng không được bật
+    assert get_profile("fast", enabled_only=False).precision == "int8"
+
+
+def test_invalid_profile_values_are_rejected():
+    with pytest.raises(ValueError):
+        InferenceProfile("bad", precision="fp8")
+    with pytest.raises(ValueError):
+        InferenceProfile("bad", imgsz=500)
+
+
+class _ProfiledClassifier:
+    profiles = {"full": None, "balanced": None}
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_batch(self, images, profile=None):
+        self.calls.append(profile)
+        return [{"classification": profile or "full", "confidence": 90.0, "bounding_box": []} for _ in images]
+
+
+@pytest.mark.asyncio
+async def test_service_routes_requests_by_profile():
+    service = InferenceService(classifier_factory=_ProfiledClassifier)
+    await service.start()
+    assert service.ready
+    # Warm-up chạy cả hai profile
+    assert set(service.classifier.calls) == {None, "balanced"}
+
+    assert (await service.predict(b"image"))["classification"] == "full"
+    assert (await service.predict(b"image", "balanced"))["classification"] == "balanced"
+    # Cùng một ảnh nhưng khác profile không được dùng chung kết quả cache
+    assert (await service.predict_image(b"same", None, "full"))["classification"] == "full"
+    assert (await service.predict_image(b"same", None, "balanced"))["classification"] == "balanced"
+    # Kể cả khi tra theo perceptual hash (ảnh gần giống)
+    service.cache.phash_distance = 4
+    image = np.tile(np.arange(64, dtype=np.uint8), (64, 1))[..., None].repeat(3, axis=2)
+    assert (await service.predict_image(b"first", image, "full"))["classification"] == "full"
+    assert (await service.predict_image(b"second", image, "balanced"))["classification"] == "balanced"
+
+    with pytest.raises(UnknownProfileError):
+        await service.predict(b"image", "fast")
+    await service.shutdown()
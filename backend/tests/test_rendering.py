@@ -0,0 +1,113 @@
+import asyncio
+import io
+import urllib.parse
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services import rendering
+from app.services.backends import Detections
+from app.services.inference import InferenceService
+
+RESULT = {"classification": "Chín", "class_id": 0, "confidence": 91.5, "bounding_box": [400, 300, 800, 600]}
+
+
+def _fixed_result(image, profile, options):
+    return dict(RESULT)
+
+
+def _upload():
+    ok, buf = cv2.imencode(".jpg", np.zeros((720, 1280, 3), dtype=np.uint8))
+    return {"file": ("a.jpg", buf.tobytes(), "image/jpeg")}
+
+
+def test_thumbnail_draws_box_scaled_to_small_image():
+    img = Image.new("RGB", (1280, 720))
+    thumb, factor = rendering.make_thumbnail(img, 320)
+    assert thumb.size == (320, 180)
+    assert factor == 0.25
+
+    rendering.draw_result(thumb, RESULT, factor)
+    # Cạnh trái của box (400 -> 100) nằm trên ảnh thu nhỏ
+    assert thumb.getpixel((100, 120)) != (0, 0, 0)
+    assert thumb.getpixel((50, 120)) == (0, 0, 0)
+
+
+def test_make_thumbnail_never_upscales():
+    img = Image.new("RGB", (200, 100))
+    assert rendering.make_thumbnail(img, 320) == (img, 1.0)
+
+
+def test_json_mode_has_no_image(classify_client):
+    res = classify_client(_fixed_result).post("/classify/analyze_image?mode=json", files=_upload())
+
+    assert res.status_code == 200
+    data = res.json()["data"]
+    assert "image_base64" not in data
+    assert data["bounding_box"] == [400, 300, 800, 600]
+    assert data["image_size"] == [1280, 720]
+
+
+def test_default_mode_keeps_legacy_shape(classify_client):
+    res = classify_client(_fixed_result).post("/classify/analyze_image", files=_upload())
+
+    body = res.json()
+    assert body["type"] == "image_with_info"
+    assert body["data"]["image_base64"]
+    assert body["data"]["classification"] == "Chín"
+
+
+def test_jpeg_mode_returns_image_with_result_headers(classify_client):
+    res = classify_client(_fixed_result).post("/classify/analyze_image?mode=jpeg&quality=50", files=_upload())
+
+    assert res.headers["content-type"] == "image/jpeg"
+    assert urllib.parse.unquote(res.headers["x-classification"]) == "Chín"
+    assert res.headers["x-bounding-box"] == "400,300,800,600"
+    decoded = cv2.imdecode(np.frombuffer(res.content, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (720, 1280, 3)
+
+
+def test_thumbnail_mode_keeps_original_coordinates(classify_client):
+    res = classify_client(_fixed_result).post("/classify/analyze_image?mode=thumbnail&max_size=160", files=_upload())
+
+    data = res.json()["data"]
+    assert data["thumbnail_size"] == [160, 90]
+    assert data["bounding_box"] == [400, 300, 800, 600]
+    assert data["image_size"] == [1280, 720]
+
+
+# Box [400, 300, 800, 600] của ảnh 1280x720 sau khi resize về 640
+FIXED_BOX = Detections(np.array([[200, 150, 400, 300]], np.float32), np.array([0.9], np.float32), np.zeros(1, np.int32))
+
+
+def _pil_fallback_client(classify_client, fake_classifier):
+    classifier = fake_classifier(FIXED_BOX, {0: "Chín"})
+    service = InferenceService(classifier_factory=lambda: classifier)
+    asyncio.run(service.start())
+    return classify_client(service=service), classifier.backend
+
+
+def test_pil_fallback_without_fast_preprocess(monkeypatch, classify_client, fake_classifier):
+    monkeypatch.setattr(settings, "FAST_PREPROCESS", False)
+    client, backend = _pil_fallback_client(classify_client, fake_classifier)
+
+    res = client.post("/classify/analyze_image?mode=json", files=_upload())
+
+    assert res.json()["data"]["bounding_box"] == [400, 300, 800, 600]
+    assert isinstance(backend.inputs[-1], Image.Image) and backend.inputs[-1].size == (640, 360)
+
+
+def test_pil_fallback_for_upload_opencv_cannot_decode(classify_client, fake_classifier):
+    client, backend = _pil_fallback_client(classify_client, fake_classifier)
+    pcx = io.BytesIO()
+    Image.new("RGB", (1280, 720)).save(pcx, format="PCX")
+    assert cv2.imdecode(np.frombuffer(pcx.getvalue(), np.uint8), cv2.IMREAD_COLOR) is None
+
+    res = client.post("/classify/analyze_image?mode=json",
+                      files={"file": ("a.pcx", pcx.getvalue(), "image/x-pcx")})
+
+    data = res.json()["data"]
+    assert (data["classification"], data["bounding_box"]) == ("Chín", [400, 300, 800, 600])
+    assert isinstance(backend.inputs[-1], Image.Image)
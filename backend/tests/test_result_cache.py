@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+from app.core.metrics import REGISTRY
+from app.services.result_cache import RESULT_CACHE_LOOKUPS, ResultCache, content_hash, perceptual_hash, rescale_result
+
+RESULT = {"classification": "ripe", "confidence": 91.0, "bounding_box": [1, 2, 3, 4]}
+
+
+def _image(seed=0):
+    rng = np.random.default_rng(seed)
+    return cv2.resize(rng.integers(0, 255, size=(8, 8, 3), dtype=np.uint8), (256, 256))
+
+
+def test_exact_hit_miss_and_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put(content_hash(b"a"), RESULT)
+    cache.put(content_hash(b"b"), RESULT)
+    assert cache.get(content_hash(b"a")) == RESULT  # "a" thành mới dùng gần nhất
+    cache.put(content_hash(b"c"), RESULT)  # đẩy "b" ra
+
+    assert cache.get(content_hash(b"b")) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_ttl_expiry_and_version_invalidation():
+    cache = ResultCache(ttl_seconds=-1)
+    cache.put("k", RESULT)
+    assert cache.get("k") is None
+    assert cache.stats()["expirations"] == 1
+
+    cache = ResultCache()
+    cache.set_version("v1")
+    cache.put("k", RESULT)
+    cache.set_version("v2")
+    assert cache.get("k") is None
+
+
+def test_perceptual_hash_matches_reencoded_image():
+    image = _image()
+    ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 60])
+    reencoded = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+
+    cache = ResultCache(phash_distance=4)
+    cache.put("original", RESULT, perceptual_hash(image), (256, 256))
+    assert cache.get("other-bytes", perceptual_hash(reencoded), (256, 256)) == RESULT
+    assert cache.get("unrelated", perceptual_hash(_image(seed=1))) is None
+    assert cache.stats()["phash_hits"] == 1
+
+
+def test_near_duplicate_hit_rescales_box_to_requested_image():
+    image = _image()
+    resized = cv2.resize(image, (128, 64))
+
+    cache = ResultCache(phash_distance=4)
+    cache.put("original", {**RESULT, "bounding_box": [40, 20, 200, 240]}, perceptual_hash(image), (256, 256))
+    hit = cache.get("smaller", perceptual_hash(resized), (128, 64))
+    assert hit["bounding_box"] == [20, 5, 100, 60]
+    assert hit["classification"] == "ripe"
+    # Không biết kích thước ảnh: chỉ trả phân loại, không trả box sai toạ độ
+    assert rescale_result(RESULT, None, (128, 64))["bounding_box"] == []
+
+
+def test_near_duplicate_lookup_stays_within_scope():
+    phash = perceptual_hash(_image())
+    cache = ResultCache(phash_distance=4)
+    cache.put("fast:aaa", RESULT, phash, (256, 256), scope="fast")
+
+    assert cache.get("full:bbb", phash, (256, 256), scope="full") is None
+    assert cache.get("fast:bbb", phash, (256, 256), scope="fast") == RESULT
+
+
+def test_rescale_moves_every_detection_box():
+    arrays = {**RESULT, "detections": {"count": 1, "boxes": [[40, 20, 200, 240]]}}
+    objects = {**RESULT, "detections": {"count": 1, "boxes": [{"classification": "ripe",
+                                                               "bounding_box": [40, 20, 200, 240]}]}}
+
+    assert rescale_result(arrays, (256, 256), (128, 64))["detections"]["boxes"] == [[20, 5, 100, 60]]
+    assert rescale_result(objects, (256, 256), (128, 64))["detections"]["boxes"][0]["bounding_box"] == [20, 5, 100, 60]
+    assert "detections" not in rescale_result(arrays, None, (128, 64))
+    assert arrays["detections"]["boxes"] == [[40, 20, 200, 240]]  # bản gốc trong cache không đổi
+
+
+def test_error_results_are_not_cached():
+    cache = ResultCache()
+    cache.put("k", {**RESULT, "error": "boom"})
+    assert cache.get("k") is None
+
+
+def test_lookups_are_exported_to_prometheus():
+    def lookups(outcome):
+        return RESULT_CACHE_LOOKUPS.labels(outcome=outcome).value
+
+    before = {outcome: lookups(outcome) for outcome in ("hit", "phash_hit", "miss")}
+    phash = perceptual_hash(_image())
+    cache = ResultCache(phash_distance=4)
+    cache.put("a", RESULT, phash, (256, 256))
+    cache.get("a")
+    cache.get("b", phash, (256, 256))
+    cache.get("c")
+
+    assert {outcome: lookups(outcome) - before[outcome] for outcome in before} == {
+        "hit": 1, "phash_hit": 1, "miss": 1}
+    assert 'result_cache_lookups_total{outcome="phash_hit"}' in REGISTRY.render()
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.endpoints import admin
+from app.database._init_db import _init_db
+from app.models.base import Base
+from app.models import classification_stat  # noqa: F401
+from app.models.classification_result import ClassificationResult
+from app.services.result_stats import ResultStats
+
+NOON = datetime(2024, 5, 1, 12, 30)
+
+
+def _session_factory():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _rows():
+    return [
+        {"result": "ripe", "confidence": 95.0, "created_at": NOON},
+        {"result": "ripe", "confidence": 85.0, "created_at": NOON.replace(hour=13)},
+        {"result": "unripe", "confidence": 42.0, "created_at": NOON},
+    ]
+
+
+def test_observe_updates_totals_histograms_and_buckets():
+    stats = ResultStats(rollup_interval=60, hourly_retention=10 ** 6)
+    stats.observe(_rows())
+
+    snapshot = stats.snapshot()
+    assert snapshot["total_classifications"] == 3
+    assert snapshot["by_class"]["ripe"]["count"] == 2
+    assert snapshot["by_class"]["ripe"]["mean_confidence"] == 90.0
+    assert snapshot["by_class"]["ripe"]["confidence_histogram"][8:] == [1, 1]
+    assert [(b["start"], b["count"]) for b in snapshot["hourly"]] == [
+        ("2024-05-01T12:00:00", 2), ("2024-05-01T13:00:00", 1)]
+    assert snapshot["daily"] == [{"start": "2024-05-01T00:00:00", "count": 3, "by_class": {"ripe": 2, "unripe": 1}}]
+
+
+def test_rollups_are_incremental_and_reload_after_restart():
+    factory = _session_factory()
+    stats = ResultStats(rollup_interval=60, hourly_retention=10 ** 6)
+    stats.observe(_rows())
+    stats.rollup(factory)
+    stats.observe(_rows()[:1])
+    stats.rollup(factory)
+
+    restarted = ResultStats(rollup_interval=60, hourly_retention=10 ** 6)
+    restarted.load(factory)
+    assert restarted.snapshot() == stats.snapshot()
+    assert restarted.snapshot()["by_class"]["ripe"]["count"] == 3
+
+
+def test_first_load_backfills_from_stored_results():
+    factory = _session_factory()
+    with factory() as db:
+        db.add(ClassificationResult(result="ripe", confidence=70.0, created_at=NOON))
+        # Dòng cũ (trước khi có cột created_at)
+        db.execute(text("INSERT INTO classification_results (result, confidence) VALUES ('ripe', 10.0)"))
+        db.commit()
+
+    stats = ResultStats(rollup_interval=60, hourly_retention=10 ** 6)
+    stats.load(factory)
+    snapshot = stats.snapshot()
+    assert snapshot["by_class"]["ripe"]["count"] == 2
+    assert sum(bucket["count"] for bucket in snapshot["daily"]) == 1
+
+
+def test_stats_endpoint_reads_counters(monkeypatch):
+    _init_db()
+    stats = ResultStats(rollup_interval=60, hourly_retention=10 ** 6)
+    stats.observe(_rows())
+    monkeypatch.setattr(admin, "result_stats", stats)
+    monkeypatch.setattr(admin.result_writer, "_thread", object())  # như khi writer đang chạy
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+
+    body = TestClient(app).get("/admin/stats").json()
+    assert body["total_classifications"] == 3
+    assert body["by_class"]["unripe"]["count"] == 1
+    assert isinstance(body["total_users"], int)
@@ -0,0 +1,52 @@
+import threading
+
+from sqlalchemy import func, select
+
+from app.database.session import SessionLocal
+from app.database._init_db import _init_db
+from app.models.classification_result import ClassificationResult
+from app.services.result_writer import ResultWriter
+
+RESULT = {"classification": "ripe", "class_id": 0, "confidence": 91.0, "bounding_box": [1, 2, 30, 40]}
+
+
+def _count(source):
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(ClassificationResult).where(
+            ClassificationResult.source == source))
+
+
+def test_writer_bulk_inserts_and_flushes_on_stop():
+    _init_db()
+    writer = ResultWriter(SessionLocal, batch_size=2, interval=0.05, max_queue=100)
+    writer.start()
+    for i in range(5):
+        assert writer.record(RESULT, "writer-test", f"{i}.jpg")
+    assert not writer.record({**RESULT, "error": "boom"}, "writer-test")
+    writer.stop()
+
+    assert writer.stats() == {"running": False, "queued": 0, "persisted": 5, "dropped": 0}
+    assert _count("writer-test") == 5
+    with SessionLocal() as db:
+        row = db.scalars(select(ClassificationResult).where(ClassificationResult.source == "writer-test")).first()
+    assert (row.result, row.bounding_box, row.class_id) == ("ripe", "1,2,30,40", 0)
+    assert row.created_at is not None
+
+
+def test_writer_drops_instead_of_blocking_when_queue_is_full():
+    _init_db()
+    release = threading.Event()
+
+    def slow_session():
+        release.wait(5)
+        return SessionLocal()
+
+    writer = ResultWriter(slow_session, batch_size=1, interval=0.01, max_queue=2)
+    writer.start()
+    accepted = sum(writer.record(RESULT, "writer-full") for _ in range(10))
+    release.set()
+    writer.stop()
+
+    assert writer.dropped == 10 - accepted
+    assert writer.dropped >= 7  # tối đa: 2 trong hàng đợi + 1 đang ghi
+    assert _count("writer-full") == accepted
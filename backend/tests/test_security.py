@@ -0,0 +1,89 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app.api.v1.endpoints import auth
+from app.core import security
+from app.database._init_db import _init_db
+from app.database.session import SessionLocal
+from app.models.user import User
+from app.services import jwt as jwt_service
+from app.services import password_hasher as hasher_module
+from app.services.password_hasher import PasswordHasher, PasswordHasherBusyError, make_context
+from app.services.token_cache import TokenCache, token_cache
+
+
+def test_token_cache_expires_with_token_and_stays_bounded():
+    cache = TokenCache(max_size=2, ttl=60)
+    cache.put("a", {"sub": "a", "exp": time.time() - 1})
+    cache.put("b", {"sub": "b", "exp": time.time() + 60})
+    cache.put("c", {"sub": "c", "exp": time.time() + 60})
+    cache.put("d", {"sub": "d", "exp": time.time() + 60})
+
+    assert cache.get("a") is None
+    assert cache.get("b") is None  # bị đẩy ra (LRU)
+    assert cache.get("d")["sub"] == "d"
+    assert len(cache) == 2
+
+
+def test_admin_required_verifies_once_then_uses_cache(monkeypatch):
+    token_cache.clear()
+    token = security.create_access_token({"sub": "boss", "role": "admin"}, timedelta(minutes=5))
+    assert security.admin_required(token)["sub"] == "boss"
+
+    monkeypatch.setattr("app.services.token_cache.jwt.decode", lambda *a, **k: pytest.fail("decoded twice"))
+    assert security.admin_required(token)["sub"] == "boss"
+    assert jwt_service.get_user_from_token(token) == "boss"
+
+
+def test_admin_required_rejects_expired_and_non_admin_tokens():
+    expired = security.create_access_token({"sub": "boss", "role": "admin"}, timedelta(seconds=-1))
+    user = security.create_access_token({"sub": "joe", "role": "user"})
+    for token in (expired, user, "garbage"):
+        with pytest.raises(HTTPException):
+            security.admin_required(token)
+
+
+def test_hasher_flags_other_work_factor_for_rehash():
+    old_hash = make_context(4).hash("secret")
+    hasher = PasswordHasher(rounds=5, max_workers=1)
+
+    verified, new_hash = asyncio.run(hasher.verify_and_update("secret", old_hash))
+    assert verified and new_hash and "$05$" in new_hash
+    assert asyncio.run(hasher.verify_and_update("secret", new_hash)) == (True, None)
+    assert asyncio.run(hasher.verify_and_update("wrong", new_hash)) == (False, None)
+
+
+def test_hasher_rejects_work_beyond_queue():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_queue=1)
+
+    async def burst():
+        return await asyncio.gather(*(hasher.hash("x") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert sum(isinstance(r, PasswordHasherBusyError) for r in results) == 1
+
+
+def test_login_rehashes_password_with_configured_rounds(monkeypatch):
+    monkeypatch.setattr(hasher_module, "password_hasher", PasswordHasher(rounds=5, max_workers=1))
+    monkeypatch.setattr(auth, "password_hasher", hasher_module.password_hasher)
+    _init_db()
+    with SessionLocal() as db:
+        db.execute(delete(User).where(User.username == "rehash-test"))
+        db.add(User(username="rehash-test", email="rehash@test.example", role="user",
+                    hashed_password=make_context(4).hash("secret")))
+        db.commit()
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/auth")
+    client = TestClient(app)
+
+    assert client.post("/auth/login/user", data={"username": "rehash-test", "password": "wrong"}).status_code == 401
+    res = client.post("/auth/login/user", data={"username": "rehash-test", "password": "secret"})
+    assert res.status_code == 200 and res.json()["access_token"]
+    with SessionLocal() as db:
+        assert "$05$" in db.query(User).filter(User.username == "rehash-test").one().hashed_password
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.services.backends import Detections
+from app.services.tiling import detect_tiled, merge_detections, tile_grid
+from benchmarks import tiling as tiling_benchmark
+
+BASE = np.zeros((600, 1000, 3), dtype=np.uint8)
+# Hai "quả cà chua" theo toạ độ ảnh gốc 1000x600
+OBJECTS = np.array([[90, 90, 130, 130], [610, 300, 660, 350]], dtype=np.float32)
+
+
+def _detector(calls):
+    # Trả các vật nằm (một phần) trong ảnh được đưa vào, theo toạ độ của ảnh đó, như backend thật
+    def predict(images):
+        calls.append([image.shape[:2] for image in images])
+        outputs = []
+        for image in images:
+            # Tile là view của ảnh gốc: lấy lại offset từ con trỏ dữ liệu
+            offset = (image.__array_interface__["data"][0] - BASE.__array_interface__["data"][0]) // 3
+            y, x = divmod(offset, BASE.shape[1])
+            boxes = OBJECTS - np.array([x, y, x, y], dtype=np.float32)
+            height, width = image.shape[:2]
+            boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+            boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+            visible = ((boxes[:, 2] - boxes[:, 0]) > 0) & ((boxes[:, 3] - boxes[:, 1]) > 0)
+            outputs.append(Detections(boxes[visible], np.full(visible.sum(), 0.9, np.float32),
+                                      np.zeros(visible.sum(), np.int32)))
+        return outputs
+    return predict
+
+
+def test_tile_grid_covers_image_with_overlap():
+    grid = tile_grid(1000, 600, 400, 0.25)
+
+    assert grid[0] == (0, 0, 400, 400)
+    assert grid[-1] == (600, 200, 1000, 600)
+    covered = np.zeros((600, 1000), bool)
+    for x1, y1, x2, y2 in grid:
+        assert (x2 - x1, y2 - y1) == (400, 400)
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+    assert tile_grid(300, 200, 640, 0.2) == [(0, 0, 300, 200)]
+    with pytest.raises(ValueError):
+        tile_grid(100, 100, 50, 1.0)
+
+
+def test_merge_keeps_one_box_for_object_cut_by_tile_border():
+    full = Detections(np.array([[10, 10, 60, 60]], np.float32), np.array([0.9], np.float32), np.zeros(1, np.int32))
+    cut = Detections(np.array([[0, 10, 20, 60]], np.float32), np.array([0.6], np.float32), np.zeros(1, np.int32))
+
+    merged = merge_detections([full, cut], [(0, 0), (40, 0)], threshold=0.6)
+
+    assert len(merged) == 1
+    assert merged.boxes[0].tolist() == [10, 10, 60, 60]
+
+
+def test_detect_tiled_returns_boxes_in_image_coordinates():
+    calls = []
+    detections, tiles = detect_tiled(_detector(calls), BASE, tile_size=400, overlap=0.25, batch_size=4,
+                                     include_full=True, threshold=0.6)
+
+    assert tiles == 6
+    assert [len(batch) for batch in calls] == [4, 3]  # ảnh đầy đủ + 6 tile, theo batch 4
+    assert sorted(detections.boxes.tolist()) == OBJECTS.tolist()
+
+
+def test_classifier_predict_tiled_formats_merged_result(monkeypatch, fake_classifier):
+    classifier = fake_classifier(_detector([]), {0: "ripe"})
+    monkeypatch.setattr("app.services.tiling.settings.TILE_SIZE", 400)
+
+    result = classifier.predict_tiled(BASE)
+    assert result["classification"] == "ripe" and result["tiles"] == 6
+    assert "error" in classifier.predict_tiled(b"not an image")
+
+
+def test_tiling_benchmark_runs_without_model(tmp_path):
+    output = tmp_path / "tiling.json"
+    assert tiling_benchmark.main(["--no-model", "--iterations", "1", "--warmup", "0",
+                                  "--resolutions", "1280x720", "--output", str(output)]) == 0
+
+    rows = json.loads(output.read_text())["results"]
+    assert [row["case"] for row in rows] == ["single", "tiled_640_0.2"]
+    assert rows[1]["tiles"] > 1
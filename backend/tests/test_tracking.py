@@ -0,0 +1,48 @@
+import numpy as np
+from app.services.tracking import MotionGatedSession
+
+
+def _scene(offset=0):
+    rng = np.random.default_rng(0)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    patch = rng.integers(0, 255, size=(60, 60, 3), dtype=np.uint8)
+    frame[90:150, 100 + offset:160 + offset] = patch
+    return frame
+
+
+def _classify(frame):
+    return {"classification": "ripe", "confidence": 90.0, "bounding_box": [100, 90, 160, 150]}
+
+
+def _run(session, frame):
+    gray = session.prepare(frame)
+    if session.needs_inference(gray):
+        return session.on_keyframe(gray, _classify(frame))
+    return session.track(gray)
+
+
+def test_static_scene_only_runs_detector_on_keyframes():
+    session = MotionGatedSession(keyframe_interval=10, motion_threshold=0.02)
+    results = [_run(session, _scene()) for _ in range(30)]
+
+    assert session.keyframes == 3
+    assert session.keyframe_ratio == 0.1
+    assert results[1]["keyframe"] is False
+    assert results[1]["bounding_box"] == [100, 90, 160, 150]
+
+
+def test_tracker_moves_box_with_the_object():
+    session = MotionGatedSession(keyframe_interval=100, motion_threshold=1.0)
+    _run(session, _scene(0))
+    result = _run(session, _scene(4))
+
+    assert result["keyframe"] is False
+    x1 = result["bounding_box"][0]
+    assert 102 <= x1 <= 106
+
+
+def test_large_change_triggers_new_keyframe():
+    session = MotionGatedSession(keyframe_interval=100, motion_threshold=0.02)
+    _run(session, _scene())
+    result = _run(session, np.full((240, 320, 3), 200, dtype=np.uint8))
+    assert result["keyframe"] is True
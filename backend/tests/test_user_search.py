@@ -0,0 +1,81 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, text
+
+from app.api.v1.endpoints import admin
+from app.database._init_db import _init_db
+from app.database.session import SessionLocal, engine
+from app.models.user import User
+from app.services.user_search import _tier_query, search_tiers
+
+EMAIL_DOMAIN = "search-test.example"
+USERNAMES = ["ann", "Anna", "annabel", "joanne", "bob", "anton", "carl"]
+
+
+def _client():
+    _init_db()
+    with SessionLocal() as db:
+        db.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+        db.add_all([
+            User(username=name, email=f"{name.lower()}@{EMAIL_DOMAIN}", hashed_password="x", role="user")
+            for name in USERNAMES
+        ])
+        # Khớp tiền tố email nhưng không khớp username
+        db.add(User(username="zed", email=f"annie@{EMAIL_DOMAIN}", hashed_password="x", role="user"))
+        db.commit()
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+    return TestClient(app)
+
+
+def test_search_ranks_exact_then_prefix_then_email_then_substring():
+    res = _client().get("/admin/users/search", params={"search_term": "ANN"})
+
+    assert res.status_code == 200
+    assert [user["username"] for user in res.json()] == ["ann", "Anna", "annabel", "zed", "joanne"]
+    assert "x-next-cursor" not in res.headers
+
+
+def test_search_pages_with_cursor_without_duplicates():
+    client = _client()
+    seen, cursor = [], None
+    while True:
+        params = {"search_term": "ann", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        res = client.get("/admin/users/search", params=params)
+        seen += [user["username"] for user in res.json()]
+        cursor = res.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert seen == ["ann", "Anna", "annabel", "zed", "joanne"]
+
+
+def test_search_short_term_only_matches_prefixes():
+    res = _client().get("/admin/users/search", params={"search_term": "an"})
+
+    assert "joanne" not in [user["username"] for user in res.json()]
+
+
+def test_search_rejects_bad_cursor():
+    assert _client().get("/admin/users/search", params={"search_term": "a", "cursor": "!!"}).status_code == 400
+
+
+def test_prefix_tiers_use_expression_indexes():
+    _init_db()
+    tiers = search_tiers("ann", "sqlite")
+    with engine.connect() as conn:
+        for tier, index in ((tiers[1], "ix_user_username_lower"), (tiers[2], "ix_user_email_lower")):
+            query = _tier_query(tier, None, 10).compile(engine, compile_kwargs={"literal_binds": True})
+            plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {query}")))
+            assert index in plan
+
+
+def test_substring_index_follows_user_updates():
+    client = _client()
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == "carl").one()
+        user.username = "mcarlsson"
+        db.commit()
+
+    res = client.get("/admin/users/search", params={"search_term": "carls"})
+    assert [user["username"] for user in res.json()] == ["mcarlsson"]
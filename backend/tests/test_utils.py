@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+from app.services.utils import decode_image, resize_to_model
+
+
+def _encode(image, ext=".jpg"):
+    ok, buf = cv2.imencode(ext, image)
+    assert ok
+    return buf.tobytes()
+
+
+def test_decode_image_returns_contiguous_bgr_uint8():
+    image = np.zeros((120, 200, 3), dtype=np.uint8)
+    image[:, :, 2] = 255  # đỏ (BGR)
+    decoded = decode_image(_encode(image, ".png"))
+
+    assert decoded.dtype == np.uint8
+    assert decoded.shape == (120, 200, 3)
+    assert decoded.flags["C_CONTIGUOUS"]
+    assert decoded[0, 0].tolist() == [0, 0, 255]
+
+
+def test_decode_image_returns_none_for_garbage():
+    assert decode_image(b"not an image") is None
+    assert decode_image(b"") is None
+
+
+def test_resize_to_model_scales_longer_side():
+    image = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    resized, scale = resize_to_model(image, 640)
+
+    assert resized.shape == (360, 640, 3)
+    assert scale == 640 / 1920
+
+
+def test_preprocess_image_scaled_returns_scale_to_map_boxes_back():
+    from PIL import Image
+    from app.services.utils import preprocess_image_scaled
+
+    image, scale = preprocess_image_scaled(Image.new("RGB", (1280, 720)), 640)
+    assert image.size == (640, 360)
+    assert scale == 0.5
@@ -0,0 +1,62 @@
+import json
+import threading
+import cv2
+import numpy as np
+from app.services.video_processor import FramePrefetcher
+
+
+def _write_video(path, frames=20):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+
+
+def test_analyze_video_streams_ndjson_with_stride(tmp_path, classify_client):
+    client = classify_client()
+    video = tmp_path / "clip.avi"
+    _write_video(video)
+
+    with open(video, "rb") as f:
+        res = client.post(
+            "/classify/analyze_video?stride=3&batch_size=4",
+            files={"file": ("clip.avi", f, "video/x-msvideo")},
+        )
+
+    assert res.status_code == 200
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    frames = [line for line in lines if line["type"] == "frame"]
+    assert [line["frame"] for line in frames] == [0, 3, 6, 9, 12, 15, 18]
+    assert lines[-1]["type"] == "summary"
+    assert lines[-1]["frames_processed"] == 7
+    assert max(client.service.batch_sizes) <= 4
+
+
+class _StalledDecoder:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def process_video_file(self, video_path, rgb=True):
+        # Vài frame rồi treo (như video lớn đang giải mã chậm)
+        for i in range(3):
+            yield np.zeros((4, 4, 3), dtype=np.uint8), i
+        self.release.wait(timeout=10)
+
+
+def test_prefetcher_close_unblocks_waiting_consumer():
+    decoder = _StalledDecoder()
+    prefetcher = FramePrefetcher(decoder, "video.mp4", prefetch=4).start()
+    batches = []
+    consumer = threading.Thread(target=lambda: batches.append(prefetcher.next_batch(64)))
+    consumer.start()
+    consumer.join(timeout=0.3)
+    assert consumer.is_alive()  # chờ đủ 64 frame
+
+    prefetcher.stop()
+    consumer.join(timeout=1)
+    assert not consumer.is_alive()
+    assert len(batches[0]) == 3
+    assert prefetcher.next_batch(64) == []
+
+    decoder.release.set()
+    prefetcher.close()
@@ -0,0 +1,59 @@
+import asyncio
+import cv2
+import numpy as np
+import pytest
+from app.services import ws_protocol
+from app.services.camera_stream import LatestFrameSlot
+
+
+def _jpeg():
+    ok, buf = cv2.imencode(".jpg", np.zeros((48, 64, 3), dtype=np.uint8))
+    return buf.tobytes()
+
+
+def test_result_round_trip():
+    result = {"classification": "ripe", "class_id": 0, "confidence": 93.25, "bounding_box": [10, 20, 110, 220]}
+    message = ws_protocol.encode_result(7, result)
+
+    assert len(message) == ws_protocol.RESULT.size
+    decoded = ws_protocol.decode_result(message)
+    assert decoded["seq"] == 7
+    assert decoded["status"] == "ok"
+    assert decoded["class_id"] == 0
+    assert decoded["bounding_box"] == [10, 20, 110, 220]
+
+
+def test_binary_mode_end_to_end(classify_client):
+    client = classify_client(
+        lambda image, profile, options: {"classification": "unripe", "class_id": 1, "confidence": 87.5,
+                                         "bounding_box": [1, 2, 30, 40]},
+        class_names=["ripe", "unripe"],
+    )
+
+    with client.websocket_connect("/classify/ws/camera?protocol=binary") as ws:
+        hello = ws.receive_json()
+        assert hello["classes"] == ["ripe", "unripe"]
+
+        ws.send_bytes(ws_protocol.FRAME_HEADER.pack(42) + _jpeg())
+        decoded = ws_protocol.decode_result(ws.receive_bytes())
+        assert decoded["seq"] == 42
+        assert decoded["class_id"] == 1
+        assert decoded["bounding_box"] == [1, 2, 30, 40]
+
+
+@pytest.mark.asyncio
+async def test_latest_frame_slot_keeps_only_newest_frame():
+    slot = LatestFrameSlot()
+    slot.put(1)
+    slot.put(2)
+    slot.put(3)
+
+    assert await slot.get() == 3
+    assert slot.dropped == 2
+
+    # Slot rỗng: get() chờ frame tiếp theo
+    waiter = asyncio.ensure_future(slot.get())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    slot.put(4)
+    assert await waiter == 4